@@ -0,0 +1,194 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from escritura_segura import escritura_atomica
+
+# --- CACHÉ DE RESULTADOS EN DISCO ---
+# Volver a analizar los mismos archivos repite todo el trabajo: decodificar y
+# normalizar el .wav, pasar el .png a grises, las FFT del procesador... Esta
+# caché guarda cada resultado una vez y lo devuelve al instante la próxima vez.
+#
+# - Direccionada por contenido: la clave es el hash SHA-256 de los bytes de la
+#   entrada (archivo o array) más los parámetros del cálculo. Renombrar o copiar
+#   un archivo no invalida nada; cambiar un byte o un parámetro sí.
+# - Para no releer un archivo grande solo para hashearlo, el hash de cada archivo
+#   se recuerda junto a su ruta, fecha de modificación y tamaño.
+# - Cada resultado es un .npy en objetos/<2 primeros caracteres>/<clave>.npy y se
+#   devuelve mapeado en memoria (solo lectura): un acierto no copia la señal.
+# - El índice (tamaños, último uso, hashes de archivos) es una base SQLite en el
+#   propio directorio, que admite varios procesos a la vez (procesar_lote.py).
+# - Tamaño acotado: al superar tam_maximo se borran los resultados usados hace
+#   más tiempo (LRU) hasta volver por debajo del límite.
+
+DIRECTORIO_CACHE_RESULTADOS = ".cache_resultados"
+TAM_MAXIMO_CACHE = 1 << 30        # 1 GiB de resultados como mucho
+TAM_TROZO_HASH = 1 << 20          # Se hashean los archivos de 1 MiB en 1 MiB
+NOMBRE_INDICE = "indice.sqlite"
+DIRECTORIO_OBJETOS = "objetos"
+
+
+def hash_archivo(ruta, tam_trozo=TAM_TROZO_HASH):
+    """
+    SHA-256 (hex) del contenido de un archivo, leído por trozos.
+    """
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        while trozo := f.read(tam_trozo):
+            h.update(trozo)
+    return h.hexdigest()
+
+
+def hash_array(array):
+    """
+    SHA-256 (hex) de un array: tipo, forma y bytes.
+    """
+    array = np.ascontiguousarray(array)
+    h = hashlib.sha256(f"{array.dtype.str}{array.shape}".encode('ascii'))
+    h.update(memoryview(array).cast('B'))
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """
+    Caché persistente de arrays con clave por contenido y expulsión LRU por tamaño.
+    Se puede compartir entre hilos; varios procesos pueden usar el mismo directorio.
+    """
+    def __init__(self, directorio=DIRECTORIO_CACHE_RESULTADOS, tam_maximo=TAM_MAXIMO_CACHE):
+        self.directorio = directorio
+        self.tam_maximo = int(tam_maximo)
+        self.aciertos = 0
+        self.fallos = 0
+        self._candado = threading.Lock()
+        os.makedirs(os.path.join(directorio, DIRECTORIO_OBJETOS), exist_ok=True)
+        self._bd = sqlite3.connect(os.path.join(directorio, NOMBRE_INDICE), timeout=30,
+                                   check_same_thread=False, isolation_level=None)
+        self._bd.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS resultados (clave TEXT PRIMARY KEY, bytes INTEGER, ultimo_uso REAL);
+            CREATE INDEX IF NOT EXISTS resultados_uso ON resultados (ultimo_uso);
+            CREATE TABLE IF NOT EXISTS huellas (ruta TEXT PRIMARY KEY, mtime_ns INTEGER, tam INTEGER, hash TEXT);
+        """)
+
+    def _sql(self, consulta, parametros=()):
+        with self._candado:
+            return self._bd.execute(consulta, parametros).fetchall()
+
+    def _ruta_objeto(self, clave):
+        return os.path.join(self.directorio, DIRECTORIO_OBJETOS, clave[:2], clave + ".npy")
+
+    # --- Claves ---
+
+    def huella_archivo(self, ruta):
+        """
+        Hash del contenido de `ruta`; solo se relee el archivo si cambió su fecha o tamaño.
+        """
+        ruta = os.path.abspath(ruta)
+        info = os.stat(ruta)
+        filas = self._sql("SELECT hash FROM huellas WHERE ruta = ? AND mtime_ns = ? AND tam = ?",
+                          (ruta, info.st_mtime_ns, info.st_size))
+        if filas:
+            return filas[0][0]
+        huella = hash_archivo(ruta)
+        self._sql("INSERT OR REPLACE INTO huellas VALUES (?, ?, ?, ?)", (ruta, info.st_mtime_ns, info.st_size, huella))
+        return huella
+
+    @staticmethod
+    def clave(tipo, huella, **parametros):
+        """
+        Clave de un resultado: tipo de cálculo, hash de la entrada y parámetros (serializables en JSON).
+        """
+        texto = json.dumps([tipo, huella, parametros], sort_keys=True, default=str)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    # --- Lectura y escritura ---
+
+    def obtener(self, clave):
+        """
+        El array guardado con `clave`, mapeado en memoria y de solo lectura, o None.
+        """
+        ruta = self._ruta_objeto(clave)
+        try:
+            array = np.asarray(np.load(ruta, mmap_mode='r'))
+        except FileNotFoundError:
+            self.fallos += 1
+            return None
+        except (OSError, ValueError):
+            # Objeto dañado (p. ej. un disco lleno a medias): se descarta y se recalcula
+            self._borrar(clave)
+            self.fallos += 1
+            return None
+        self._sql("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)",
+                  (clave, os.path.getsize(ruta), time.time()))
+        self.aciertos += 1
+        return array
+
+    def guardar(self, clave, array):
+        """
+        Guarda `array` con `clave` (escritura atómica) y aplica el límite de tamaño.
+        """
+        ruta = self._ruta_objeto(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with escritura_atomica(ruta) as temporal:
+            np.save(temporal, np.asarray(array))
+        self._sql("INSERT OR REPLACE INTO resultados VALUES (?, ?, ?)",
+                  (clave, os.path.getsize(ruta), time.time()))
+        self.recortar()
+
+    def memorizar(self, clave, calcular):
+        """
+        Devuelve el resultado de `clave` si está en la caché; si no, llama a `calcular()`,
+        guarda lo que devuelva (salvo None) y lo devuelve.
+        """
+        array = self.obtener(clave)
+        if array is None:
+            array = calcular()
+            if array is not None:
+                self.guardar(clave, array)
+        return array
+
+    # --- Tamaño ---
+
+    @property
+    def tam_total(self):
+        return self._sql("SELECT COALESCE(SUM(bytes), 0) FROM resultados")[0][0]
+
+    def _borrar(self, clave):
+        with contextlib.suppress(OSError):  # Ya borrado, o aún mapeado por otro proceso en Windows
+            os.remove(self._ruta_objeto(clave))
+        self._sql("DELETE FROM resultados WHERE clave = ?", (clave,))
+
+    def recortar(self, tam_maximo=None):
+        """
+        Borra los resultados usados hace más tiempo hasta que la caché ocupe como mucho
+        `tam_maximo` bytes (por defecto, el de la caché). Devuelve cuántos se borraron.
+        """
+        limite = self.tam_maximo if tam_maximo is None else tam_maximo
+        exceso = self.tam_total - limite
+        borrados = 0
+        if exceso <= 0:
+            return borrados
+        for clave, tam in self._sql("SELECT clave, bytes FROM resultados ORDER BY ultimo_uso"):
+            if exceso <= 0:
+                break
+            self._borrar(clave)
+            exceso -= tam
+            borrados += 1
+        return borrados
+
+    def vaciar(self):
+        """
+        Borra todos los resultados y los hashes de archivos recordados.
+        """
+        self.recortar(0)
+        self._sql("DELETE FROM huellas")
+
+    def cerrar(self):
+        with self._candado:
+            self._bd.close()
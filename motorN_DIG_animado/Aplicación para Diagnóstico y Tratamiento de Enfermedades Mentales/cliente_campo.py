@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+
+from servidor_campo import (HOST, PUERTO, SESION_INICIAL, OP_BINARIO, OP_CIERRE, OP_PING, OP_PONG,
+                            aceptacion_websocket, codificar_trama, leer_trama, decodificar_fotograma)
+from instantanea_campo import instantanea_desde_bytes
+
+# --- CLIENTE DEL SERVIDOR DEL CAMPO N ---
+# Cliente asyncio mínimo (solo biblioteca estándar) para la API de
+# servidor_campo.py: una conexión HTTP por petición y un WebSocket por visor.
+# Sirve para pruebas locales y como ejemplo de uso de la API.
+
+
+class ErrorServidor(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(f"{estado}: {mensaje}")
+        self.estado = estado
+
+
+class ClienteCampo:
+    def __init__(self, host=HOST, puerto=PUERTO):
+        self.host = host
+        self.puerto = puerto
+
+    async def peticion(self, metodo, ruta, datos=None):
+        """
+        Hace una petición HTTP. Devuelve (estado, tipo de contenido, cuerpo en bytes).
+        """
+        cuerpo = json.dumps(datos).encode('utf-8') if datos is not None else b''
+        reader, writer = await asyncio.open_connection(self.host, self.puerto)
+        try:
+            writer.write(f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}:{self.puerto}\r\n"
+                         f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n"
+                         f"Connection: close\r\n\r\n".encode('latin-1') + cuerpo)
+            await writer.drain()
+            estado = int((await reader.readuntil(b'\r\n')).split()[1])
+            cabeceras = {}
+            while (linea := (await reader.readuntil(b'\r\n')).decode('latin-1')) != '\r\n':
+                nombre, _, valor = linea.partition(':')
+                cabeceras[nombre.strip().lower()] = valor.strip()
+            respuesta = await reader.readexactly(int(cabeceras.get('content-length', 0)))
+        finally:
+            writer.close()
+        return estado, cabeceras.get('content-type', ''), respuesta
+
+    async def json(self, metodo, ruta, datos=None):
+        """
+        Petición con respuesta JSON; lanza ErrorServidor si el estado no es 2xx.
+        """
+        estado, _, respuesta = await self.peticion(metodo, ruta, datos)
+        resultado = json.loads(respuesta) if respuesta else None
+        if not 200 <= estado < 300:
+            raise ErrorServidor(estado, resultado.get('error') if isinstance(resultado, dict) else resultado)
+        return resultado
+
+    # --- Atajos de la API ---
+
+    async def sesiones(self):
+        return await self.json('GET', '/sesiones')
+
+    async def crear_sesion(self, nombre, grid_size=None, semilla=None):
+        return await self.json('POST', f'/sesiones/{nombre}', {'grid_size': grid_size, 'semilla': semilla})
+
+    async def borrar_sesion(self, nombre):
+        return await self.json('DELETE', f'/sesiones/{nombre}')
+
+    async def paso(self, nombre=SESION_INICIAL, n=1, alpha=None):
+        datos = {'n': n} if alpha is None else {'n': n, 'alpha': alpha}
+        return await self.json('POST', f'/sesiones/{nombre}/paso', datos)
+
+    async def inyectar(self, nombre=SESION_INICIAL):
+        return await self.json('POST', f'/sesiones/{nombre}/inyectar')
+
+    async def resetear(self, nombre=SESION_INICIAL, semilla=None):
+        return await self.json('POST', f'/sesiones/{nombre}/reset', {'semilla': semilla})
+
+    async def metricas(self, nombre=SESION_INICIAL):
+        return await self.json('GET', f'/sesiones/{nombre}/metricas')
+
+    async def animar(self, nombre=SESION_INICIAL, pasos_por_segundo=None):
+        return await self.json('POST', f'/sesiones/{nombre}/animar', {'pasos_por_segundo': pasos_por_segundo})
+
+    async def pausar(self, nombre=SESION_INICIAL):
+        return await self.json('POST', f'/sesiones/{nombre}/pausar')
+
+    async def instantanea(self, nombre=SESION_INICIAL, comprimir=False):
+        """
+        Devuelve (campo, cabecera) de la instantánea actual de la sesión.
+        """
+        estado, _, respuesta = await self.peticion('GET', f'/sesiones/{nombre}/instantanea?comprimir={int(comprimir)}')
+        if estado != 200:
+            raise ErrorServidor(estado, json.loads(respuesta).get('error'))
+        return instantanea_desde_bytes(respuesta)
+
+    async def ver(self, nombre=SESION_INICIAL, formato='u1'):
+        """
+        Generador asíncrono de (paso, campo) con los fotogramas del stream de la sesión.
+        Al salir del bucle que lo recorre, la conexión se cierra.
+        """
+        reader, writer = await asyncio.open_connection(self.host, self.puerto)
+        clave = base64.b64encode(os.urandom(16)).decode('ascii')
+        writer.write(f"GET /sesiones/{nombre}/stream?formato={formato} HTTP/1.1\r\n"
+                     f"Host: {self.host}:{self.puerto}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Key: {clave}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode('latin-1'))
+        await writer.drain()
+        try:
+            estado = int((await reader.readuntil(b'\r\n')).split()[1])
+            cabeceras = {}
+            while (linea := (await reader.readuntil(b'\r\n')).decode('latin-1')) != '\r\n':
+                nombre_cab, _, valor = linea.partition(':')
+                cabeceras[nombre_cab.strip().lower()] = valor.strip()
+            if estado != 101:
+                cuerpo = await reader.readexactly(int(cabeceras.get('content-length', 0)))
+                raise ErrorServidor(estado, json.loads(cuerpo).get('error'))
+            if cabeceras.get('sec-websocket-accept') != aceptacion_websocket(clave):
+                raise ErrorServidor(estado, "Sec-WebSocket-Accept no coincide")
+            while True:
+                opcode, datos = await leer_trama(reader)
+                if opcode == OP_BINARIO:
+                    yield decodificar_fotograma(datos)
+                elif opcode == OP_PING:
+                    writer.write(codificar_trama(OP_PONG, datos, enmascarar=True))
+                elif opcode == OP_CIERRE:
+                    return
+        finally:
+            try:
+                writer.write(codificar_trama(OP_CIERRE, b'\x03\xe8', enmascarar=True))  # 1000: cierre normal
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+async def _demo(host, puerto, segundos):
+    cliente = ClienteCampo(host, puerto)
+    print(f"📡 Sesiones: {await cliente.sesiones()}")
+    await cliente.inyectar()
+    await cliente.animar()
+    inicio, recibidos, paso = time.perf_counter(), 0, None
+    async for paso, campo in cliente.ver():
+        recibidos += 1
+        if time.perf_counter() - inicio >= segundos:
+            break
+    await cliente.pausar()
+    duracion = time.perf_counter() - inicio
+    print(f"🎞️ {recibidos} fotogramas en {duracion:.1f} s ({recibidos / duracion:.1f} fps), último paso {paso}")
+    print(f"📊 Métricas: {(await cliente.metricas())['metricas']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba rápida contra un servidor_campo.py en marcha.")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--segundos", type=float, default=3.0, help="tiempo viendo el stream")
+    args = parser.parse_args()
+    asyncio.run(_demo(HOST, args.puerto, args.segundos))
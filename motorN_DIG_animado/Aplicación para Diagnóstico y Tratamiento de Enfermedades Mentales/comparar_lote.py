@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from mapa_senal import MapeadorCampo, TAM_VENTANA_MAPA, DISPOSICION_CANALES
+from procesar_lote import buscar_entradas
+from escritura_segura import escritura_atomica
+
+# --- COMPARACIÓN DE MUCHAS GRABACIONES ---
+# comparar_archivos (Tk) compara exactamente dos archivos, los vuelve a
+# codificar cada vez y abre figuras. Aquí, sin interfaz:
+#
+# - Cada archivo se codifica una sola vez con MapeadorCampo en un campo pequeño
+#   (bandas x tiempo) y se guarda en DIRECTORIO_CACHE como .npy. La clave es la
+#   ruta absoluta, la fecha de modificación, el tamaño y los parámetros del mapeo,
+#   así que un archivo modificado o un cambio de parámetros se recalcula solo.
+# - Los rasgos de toda la biblioteca forman una matriz (n, d). Las distancias se
+#   calculan por bloques de FILAS_POR_BLOQUE filas contra todas, con productos
+#   de matrices: L2 (||a||² + ||b||² - 2ab), correlación (1 - r de Pearson) y
+#   distancia entre perfiles de bandas (potencia media de cada banda en el tiempo,
+#   que no depende de cuándo ocurre cada cosa en la grabación).
+# - vecinos() devuelve los k más cercanos a una consulta con argpartition, sin
+#   ordenar la biblioteca entera.
+
+DIRECTORIO_CACHE = ".cache_comparacion"
+FORMA_RASGOS = (32, 32)           # Campo de rasgos: 32 bandas x 32 franjas de tiempo
+FILAS_POR_BLOQUE = 256            # Filas de la matriz de distancias calculadas a la vez
+VERSION_RASGOS = 1                # Cambiarla invalida la caché si cambia el cálculo
+EXTENSIONES_COMPARABLES = ('.wav', '.png', '.edf')
+
+METRICA_L2 = 'l2'
+METRICA_CORRELACION = 'correlacion'
+METRICA_BANDAS = 'bandas'
+METRICAS = (METRICA_L2, METRICA_CORRELACION, METRICA_BANDAS)
+
+
+def clave_rasgos(ruta, parametros):
+    """
+    Clave de caché de un archivo: ruta, mtime, tamaño y parámetros del mapeo.
+    """
+    info = os.stat(ruta)
+    texto = json.dumps([os.path.abspath(ruta), info.st_mtime_ns, info.st_size, parametros], sort_keys=True)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()
+
+
+def calcular_rasgos(ruta, forma=FORMA_RASGOS, tam_ventana=TAM_VENTANA_MAPA, disposicion=DISPOSICION_CANALES):
+    """
+    Campo de rasgos (float32) de un archivo.
+    """
+    mapeador = MapeadorCampo(forma, tam_ventana=tam_ventana, disposicion=disposicion)
+    return mapeador.campo_archivo(ruta).astype(np.float32)
+
+
+def _rasgos_en_cache(ruta, directorio_cache, parametros):
+    # Devuelve (campo, calculado); se ejecuta también en los procesos del pool
+    destino = os.path.join(directorio_cache, clave_rasgos(ruta, parametros) + ".npy")
+    if os.path.exists(destino):
+        return np.load(destino), False
+    campo = calcular_rasgos(ruta, parametros['forma'], parametros['tam_ventana'], parametros['disposicion'])
+    with escritura_atomica(destino) as temporal:
+        with open(temporal, 'wb') as f:
+            np.save(f, campo)
+    return campo, True
+
+
+def _filas_unidad(x):
+    # Filas centradas y de norma 1: su producto escalar es la correlación de Pearson
+    x = x - x.mean(axis=1, keepdims=True)
+    norma = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.where(norma > 0, norma, 1.0)
+
+
+def distancias_l2(a, b):
+    """
+    Distancia euclídea entre cada fila de `a` y cada fila de `b`.
+    """
+    d2 = (np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :]
+          - 2.0 * (a @ b.T))
+    return np.sqrt(np.maximum(d2, 0.0, out=d2), out=d2)
+
+
+def distancias_correlacion(a, b):
+    """
+    1 - correlación de Pearson entre cada fila de `a` y cada fila de `b` (0 = idénticas, 2 = opuestas).
+    """
+    return 1.0 - _filas_unidad(a) @ _filas_unidad(b).T
+
+
+class MotorComparacion:
+    """
+    Biblioteca de grabaciones codificadas como rasgos, con matrices de distancias y
+    búsqueda de los k vecinos más cercanos.
+    """
+    def __init__(self, forma=FORMA_RASGOS, tam_ventana=TAM_VENTANA_MAPA, disposicion=DISPOSICION_CANALES,
+                 directorio_cache=DIRECTORIO_CACHE, trabajadores=None):
+        self.parametros = {'forma': list(forma), 'tam_ventana': int(tam_ventana), 'disposicion': disposicion,
+                           'version': VERSION_RASGOS}
+        self.directorio_cache = directorio_cache
+        self.trabajadores = trabajadores
+        self.rutas = []
+        self.indices = {}     # Ruta absoluta -> fila en self.rutas / self.rasgos
+        self.rasgos = np.empty((0, forma[0] * forma[1]), dtype=np.float32)
+        self.perfiles = np.empty((0, forma[0]), dtype=np.float32)
+        self.errores = {}
+        self.calculados = 0   # Archivos codificados (el resto salió de la caché)
+        os.makedirs(directorio_cache, exist_ok=True)
+
+    def _parametros_mapeo(self):
+        return {'forma': tuple(self.parametros['forma']), 'tam_ventana': self.parametros['tam_ventana'],
+                'disposicion': self.parametros['disposicion']}
+
+    def codificar(self, rutas):
+        """
+        Rasgos de cada ruta (de la caché o calculados, en paralelo si hay varios).
+        Devuelve (rutas válidas, matriz de campos); los fallos quedan en self.errores.
+        """
+        parametros = self._parametros_mapeo()
+        clave_parametros = dict(parametros, version=VERSION_RASGOS)
+        trabajadores = max(1, min(self.trabajadores or os.cpu_count() or 1, len(rutas) or 1))
+        resultados = {}
+
+        def registrar(ruta, tarea):
+            try:
+                campo, calculado = tarea()
+                resultados[ruta] = campo
+                self.calculados += calculado
+            except Exception as e:
+                self.errores[ruta] = f"{type(e).__name__}: {e}"
+
+        if trabajadores == 1:
+            for ruta in rutas:
+                registrar(ruta, lambda r=ruta: _rasgos_en_cache(r, self.directorio_cache, clave_parametros))
+        else:
+            with ProcessPoolExecutor(max_workers=trabajadores) as pool:
+                futuros = {ruta: pool.submit(_rasgos_en_cache, ruta, self.directorio_cache, clave_parametros)
+                           for ruta in rutas}
+                for ruta, futuro in futuros.items():
+                    registrar(ruta, futuro.result)
+        validas = [ruta for ruta in rutas if ruta in resultados]
+        forma = tuple(parametros['forma'])
+        campos = np.stack([resultados[r] for r in validas]) if validas else np.empty((0,) + forma, np.float32)
+        return validas, campos
+
+    def agregar(self, rutas):
+        """
+        Añade archivos (o directorios / patrones glob) a la biblioteca. Devuelve cuántos entraron.
+        """
+        rutas = [r for r in buscar_entradas(rutas, extensiones=EXTENSIONES_COMPARABLES) if r not in self.indices]
+        validas, campos = self.codificar(rutas)
+        self.indices.update((ruta, len(self.rutas) + i) for i, ruta in enumerate(validas))
+        self.rutas.extend(validas)
+        self.rasgos = np.concatenate((self.rasgos, campos.reshape(len(validas), self.rasgos.shape[1])))
+        self.perfiles = np.concatenate((self.perfiles, campos.mean(axis=2)))
+        return len(validas)
+
+    def _matriz(self, metrica, campos=None):
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica no soportada: {metrica!r} (usa una de {METRICAS})")
+        if campos is None:
+            return self.perfiles if metrica == METRICA_BANDAS else self.rasgos
+        return campos.mean(axis=2) if metrica == METRICA_BANDAS else campos.reshape(len(campos), -1)
+
+    def _distancias(self, metrica, a, b):
+        if metrica == METRICA_CORRELACION:
+            return distancias_correlacion(a, b)
+        return distancias_l2(a, b)
+
+    def matriz_distancias(self, metrica=METRICA_L2, filas_por_bloque=FILAS_POR_BLOQUE):
+        """
+        Matriz (n, n) float32 de distancias entre todas las grabaciones de la biblioteca.
+        """
+        x = self._matriz(metrica).astype(np.float64)
+        if metrica == METRICA_CORRELACION:
+            x = _filas_unidad(x)  # Se normaliza una vez y cada bloque es solo un producto
+        n = len(x)
+        resultado = np.empty((n, n), dtype=np.float32)
+        for i in range(0, n, filas_por_bloque):
+            bloque = x[i:i + filas_por_bloque]
+            if metrica == METRICA_CORRELACION:
+                resultado[i:i + len(bloque)] = 1.0 - bloque @ x.T
+            else:
+                resultado[i:i + len(bloque)] = distancias_l2(bloque, x)
+        np.fill_diagonal(resultado, 0.0)
+        return resultado
+
+    def vecinos(self, consultas, k=5, metrica=METRICA_L2, excluir_iguales=True,
+                filas_por_bloque=FILAS_POR_BLOQUE):
+        """
+        Para cada archivo de `consultas`, las k grabaciones de la biblioteca más cercanas
+        como lista de (ruta, distancia), de menor a mayor. Una consulta que ya está en la
+        biblioteca no se devuelve a sí misma (salvo excluir_iguales=False), aunque se
+        escriba con otra ruta relativa. Las claves del resultado son rutas absolutas.
+        """
+        rutas, campos = self.codificar([os.path.abspath(c) for c in consultas])
+        a = self._matriz(metrica, campos).astype(np.float64)
+        x = self._matriz(metrica).astype(np.float64)
+        k = min(k, len(x))
+        resultado = {}
+        for i in range(0, len(a), filas_por_bloque):
+            d = self._distancias(metrica, a[i:i + filas_por_bloque], x)
+            for fila, ruta in zip(d, rutas[i:i + filas_por_bloque]):
+                if excluir_iguales and ruta in self.indices:
+                    fila[self.indices[ruta]] = np.inf
+                cercanos = np.argpartition(fila, k - 1)[:k] if k < len(fila) else np.arange(len(fila))
+                cercanos = cercanos[np.argsort(fila[cercanos])]
+                resultado[ruta] = [(self.rutas[j], float(fila[j])) for j in cercanos if np.isfinite(fila[j])]
+        return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara grabaciones contra una biblioteca (sin interfaz).")
+    parser.add_argument("biblioteca", nargs="+", help="directorios, archivos o patrones glob de la biblioteca")
+    parser.add_argument("--consulta", action="append", default=[], help="archivo a comparar (se puede repetir)")
+    parser.add_argument("--k", type=int, default=5, help="vecinos a mostrar por consulta")
+    parser.add_argument("--metrica", choices=METRICAS, default=METRICA_L2)
+    parser.add_argument("--matriz", default=None, help="guardar la matriz de distancias completa en este .npy")
+    parser.add_argument("--workers", type=int, default=None, help="procesos para codificar (por defecto, uno por CPU)")
+    parser.add_argument("--cache", default=DIRECTORIO_CACHE, help="directorio de la caché de rasgos")
+    args = parser.parse_args()
+
+    motor = MotorComparacion(directorio_cache=args.cache, trabajadores=args.workers)
+    n = motor.agregar(args.biblioteca)
+    print(f"📚 {n} grabaciones en la biblioteca ({motor.calculados} codificadas, {n - motor.calculados} de la caché)")
+    for ruta, error in motor.errores.items():
+        print(f"❌ {os.path.basename(ruta)}: {error}")
+    if args.matriz:
+        np.save(args.matriz, motor.matriz_distancias(args.metrica))
+        print(f"💾 Matriz de distancias ({args.metrica}) guardada en {args.matriz}")
+    for consulta, cercanos in motor.vecinos(args.consulta, args.k, args.metrica).items():
+        print(f"\n🔎 {os.path.basename(consulta)}:")
+        for posicion, (ruta, distancia) in enumerate(cercanos, 1):
+            print(f"  {posicion}. {os.path.basename(ruta)}  ({distancia:.4f})")
@@ -0,0 +1,92 @@
+import numpy as np
+from functools import lru_cache
+from scipy.fft import rfft, irfft
+
+# --- CONTEXTO ESPECTRAL REUTILIZABLE ---
+# Todo lo que procesador_entropico prepara antes de tocar la señal (eje de
+# frecuencias, bandas, bin del tono) depende solo de (longitud, tasa, bandas).
+# Se calcula una vez por combinación y se guarda en una caché LRU, de modo que
+# miles de clips de la misma duración se saltan la preparación entera.
+#
+# - Las bandas se guardan como slices [inicio, fin) del espectro en lugar de
+#   máscaras booleanas: el eje de frecuencias es creciente, así que cada banda
+#   es un tramo contiguo y un slice es una vista sin copia.
+# - scipy.fft (pocketfft) ya guarda internamente los planes de las longitudes
+#   usadas; el contexto fija además el número de hilos (`workers`), que se
+#   aprovecha al transformar varias señales apiladas en un array 2D.
+
+TAM_CACHE_CONTEXTOS = 32   # Combinaciones (longitud, tasa, bandas) que se conservan
+TRABAJADORES_FFT = -1      # Hilos de scipy.fft (-1: todos los núcleos; solo ayuda con lotes 2D)
+
+
+class ContextoEspectral:
+    """
+    Datos precalculados para el espectro de señales de `n_muestras` a `tasa_muestreo`.
+    Los arrays son de solo lectura porque se comparten entre llamadas.
+    """
+    def __init__(self, n_muestras, tasa_muestreo, bandas=(), freq_tono=None, trabajadores=TRABAJADORES_FFT):
+        self.n_muestras = int(n_muestras)
+        self.tasa_muestreo = tasa_muestreo
+        self.trabajadores = trabajadores
+
+        self.frecuencias = np.fft.rfftfreq(self.n_muestras, 1 / tasa_muestreo)
+        self.frecuencias.setflags(write=False)
+
+        # Mismo criterio que la máscara (f >= inicio) & (f <= fin), pero como slice.
+        self.bandas = {}
+        for banda in bandas:
+            inicio = int(np.searchsorted(self.frecuencias, banda[0], side='left'))
+            fin = int(np.searchsorted(self.frecuencias, banda[1], side='right'))
+            self.bandas[tuple(banda)] = slice(inicio, max(inicio, fin))
+
+        self.freq_tono = freq_tono
+        self.bin_tono = None
+        if freq_tono is not None and self.frecuencias.size:
+            self.bin_tono = int(np.argmin(np.abs(self.frecuencias - freq_tono)))
+
+    def banda(self, banda):
+        """
+        Slice del espectro que cubre `banda` (debe estar entre las bandas del contexto).
+        """
+        return self.bandas[tuple(banda)]
+
+    def rfft(self, señal):
+        """
+        FFT real a lo largo del último eje, con los hilos del contexto.
+        """
+        return rfft(señal, n=self.n_muestras, workers=self.trabajadores)
+
+    def irfft(self, espectro):
+        """
+        FFT inversa a lo largo del último eje, devolviendo `n_muestras` muestras.
+        """
+        return irfft(espectro, n=self.n_muestras, workers=self.trabajadores)
+
+
+@lru_cache(maxsize=TAM_CACHE_CONTEXTOS)
+def _contexto_en_cache(n_muestras, tasa_muestreo, bandas, freq_tono, trabajadores):
+    return ContextoEspectral(n_muestras, tasa_muestreo, bandas, freq_tono, trabajadores)
+
+
+def obtener_contexto(n_muestras, tasa_muestreo, bandas=(), freq_tono=None, trabajadores=TRABAJADORES_FFT):
+    """
+    Devuelve el ContextoEspectral de (longitud, tasa, bandas, tono), creándolo solo
+    la primera vez; los menos usados recientemente se descartan pasados TAM_CACHE_CONTEXTOS.
+    """
+    bandas = tuple(tuple(float(f) for f in banda) for banda in bandas)
+    freq_tono = float(freq_tono) if freq_tono is not None else None
+    return _contexto_en_cache(int(n_muestras), float(tasa_muestreo), bandas, freq_tono, trabajadores)
+
+
+def estadisticas_cache():
+    """
+    Aciertos, fallos y tamaño actual de la caché de contextos.
+    """
+    return _contexto_en_cache.cache_info()
+
+
+def vaciar_cache():
+    """
+    Descarta todos los contextos guardados.
+    """
+    _contexto_en_cache.cache_clear()
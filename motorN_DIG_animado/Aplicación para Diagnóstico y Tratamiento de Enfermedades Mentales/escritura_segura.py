@@ -0,0 +1,59 @@
+import contextlib
+import os
+import stat
+import tempfile
+
+# --- ESCRITURA ATÓMICA DE ARCHIVOS ---
+# Las salidas se escriben primero en un temporal del mismo directorio y se
+# renombran con os.replace: quien lea el destino ve el archivo anterior o el
+# nuevo completo, nunca uno a medio escribir. Además el archivo anterior no se
+# trunca en su sitio, así que puede seguir mapeado en memoria (instantáneas
+# importadas, resultados de la caché) sin que el proceso que lo mapea reciba SIGBUS.
+#
+# mkstemp crea el temporal con permisos 0600; antes de renombrarlo se le dan los
+# de un archivo creado con open() (0666 menos la umask), para que las salidas sigan
+# siendo legibles por otros usuarios o procesos como antes. La umask no se lee con
+# os.umask (que la cambia para todo el proceso, con riesgo para otros hilos): se
+# crea un archivo de prueba con modo 0666 y se mira qué permisos recibió.
+
+_modo_archivo = None   # Permisos de un archivo creado con open(); se averigua en la primera escritura
+
+
+def modo_archivo(directorio="."):
+    """
+    Permisos que recibe un archivo nuevo creado con open() (0666 menos la umask),
+    medidos una vez con un archivo de prueba en `directorio`.
+    """
+    global _modo_archivo
+    if _modo_archivo is None:
+        descriptor, prueba = tempfile.mkstemp(prefix=".modo.", dir=directorio)
+        os.close(descriptor)
+        os.remove(prueba)
+        descriptor = os.open(prueba, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            _modo_archivo = stat.S_IMODE(os.fstat(descriptor).st_mode)
+        finally:
+            os.close(descriptor)
+            os.remove(prueba)
+    return _modo_archivo
+
+
+@contextlib.contextmanager
+def escritura_atomica(destino):
+    """
+    Entrega una ruta temporal junto a `destino` y, si el bloque termina sin errores,
+    la renombra a `destino` en una sola operación (con los permisos de modo_archivo());
+    si falla, la borra.
+    """
+    directorio, nombre = os.path.split(destino)
+    base, ext = os.path.splitext(nombre)
+    descriptor, temporal = tempfile.mkstemp(prefix=f".{base}.", suffix=ext, dir=directorio or ".")
+    os.close(descriptor)
+    try:
+        yield temporal
+        os.chmod(temporal, modo_archivo(directorio or "."))
+        os.replace(temporal, destino)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporal)
+        raise
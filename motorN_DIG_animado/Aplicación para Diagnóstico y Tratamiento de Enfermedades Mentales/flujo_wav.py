@@ -0,0 +1,114 @@
+import numpy as np
+import scipy.io.wavfile as wav
+import tempfile
+import wave
+
+# --- LECTURA DE WAV POR BLOQUES ---
+# Para grabaciones largas no se carga el archivo entero: se mapea en memoria
+# (mmap=True) y se recorre en bloques de tamaño fijo, convirtiendo cada bloque
+# a mono float32. La memoria usada depende del tamaño de bloque, no de la
+# duración de la grabación.
+
+TAM_BLOQUE = 65536  # Muestras por bloque (~1.5 s a 44.1 kHz)
+
+# Modos de normalización del pico
+PICO_GLOBAL = 'global'        # Una pasada previa para hallar el pico de toda la grabación
+PICO_ACUMULADO = 'acumulado'  # Una sola pasada: cada bloque se divide por el pico visto hasta ese momento
+
+
+def abrir_wav(ruta):
+    """
+    Abre un .wav mapeado en memoria. Devuelve (tasa, datos) sin leer las muestras.
+    """
+    return wav.read(ruta, mmap=True)
+
+
+def bloque_mono(datos, inicio, fin):
+    """
+    Convierte las muestras [inicio, fin) a mono float32 (media de los canales).
+    """
+    bloque = datos[inicio:fin]
+    if bloque.ndim > 1:
+        return bloque.mean(axis=1, dtype=np.float32)
+    return bloque.astype(np.float32)
+
+
+def recorrer_bloques(datos, tam_bloque=TAM_BLOQUE):
+    """
+    Genera bloques mono float32 consecutivos de `datos` (el último puede ser más corto).
+    """
+    for inicio in range(0, len(datos), tam_bloque):
+        yield bloque_mono(datos, inicio, inicio + tam_bloque)
+
+
+def pico_mono(datos, tam_bloque=TAM_BLOQUE):
+    """
+    Pico absoluto de la mezcla mono, calculado en una pasada por bloques.
+    """
+    pico = 0.0
+    for bloque in recorrer_bloques(datos, tam_bloque):
+        if bloque.size:
+            pico = max(pico, float(np.max(np.abs(bloque))))
+    return pico
+
+
+def bloques_normalizados(datos, tam_bloque=TAM_BLOQUE, modo_pico=PICO_GLOBAL):
+    """
+    Genera bloques mono float32 normalizados a [-1, 1].
+    Con PICO_GLOBAL el resultado concatenado coincide con la normalización de la
+    señal completa; con PICO_ACUMULADO se lee el archivo una sola vez a costa de
+    que los bloques anteriores al pico queden amplificados respecto a la versión global.
+    """
+    if modo_pico == PICO_GLOBAL:
+        pico = pico_mono(datos, tam_bloque)
+        escala = np.float32(1.0 / pico) if pico > 0 else np.float32(1.0)
+        for bloque in recorrer_bloques(datos, tam_bloque):
+            bloque *= escala
+            yield bloque
+    elif modo_pico == PICO_ACUMULADO:
+        pico = 0.0
+        for bloque in recorrer_bloques(datos, tam_bloque):
+            if bloque.size:
+                pico = max(pico, float(np.max(np.abs(bloque))))
+            if pico > 0:
+                bloque *= np.float32(1.0 / pico)
+            yield bloque
+    else:
+        raise ValueError(f"Modo de pico no soportado: {modo_pico!r} (usa '{PICO_GLOBAL}' o '{PICO_ACUMULADO}')")
+
+
+def escribir_wav_por_bloques(ruta, tasa_muestreo, bloques, tam_bloque=TAM_BLOQUE):
+    """
+    Escribe bloques de señal en un .wav mono int16 normalizado al pico global, como decoder.
+    Los bloques se vuelcan primero a un archivo temporal mientras se busca el pico, y
+    después se convierten a int16 bloque a bloque: la memoria usada es constante.
+    Devuelve el número de muestras escritas.
+    """
+    with tempfile.TemporaryFile() as temporal:
+        pico = 0.0
+        dtype = None
+        for bloque in bloques:
+            bloque = np.asarray(bloque)
+            if dtype is None:
+                dtype = np.result_type(bloque.dtype, np.float32)
+            bloque = bloque.astype(dtype, copy=False)
+            if bloque.size:
+                pico = max(pico, float(np.max(np.abs(bloque))))
+            temporal.write(bloque.tobytes())
+        temporal.seek(0)
+
+        amplitud_maxima = np.iinfo(np.int16).max
+        n_muestras = 0
+        with wave.open(ruta, 'wb') as salida:
+            salida.setnchannels(1)
+            salida.setsampwidth(2)
+            salida.setframerate(int(tasa_muestreo))
+            while dtype is not None:
+                datos = np.fromfile(temporal, dtype=dtype, count=tam_bloque)
+                if datos.size == 0:
+                    break
+                if pico > 0:
+                    datos = datos / pico
+                salida.writeframes((datos * amplitud_maxima).astype('<i2').tobytes())
+                n_muestras += datos.size
+    return n_muestras
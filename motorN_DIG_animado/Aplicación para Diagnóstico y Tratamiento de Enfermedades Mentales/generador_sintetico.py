@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import json
+import os
+import wave
+
+import numpy as np
+
+from laboratorio_n import TASA_MUESTREO
+from flujo_wav import TAM_BLOQUE
+from escritura_segura import escritura_atomica
+
+# --- GENERADOR DE SEÑALES SINTÉTICAS ---
+# crear_sonidos.py y generar_input.py escriben una sola señal con duración y
+# frecuencias fijas. Para pruebas de carga hacen falta miles: aquí se generan
+# lotes de señales (n, muestras) de depresión, ansiedad o calma, y lotes de
+# patrones (n, lado, lado) para inyectar en el campo.
+#
+# - Cada señal es la suma de un seno por banda del perfil (frecuencia y fase al
+#   azar dentro de la banda), con modulación de amplitud opcional y ruido
+#   gaussiano, recortada a [-1, 1] como en crear_sonidos.py.
+# - Todo el lote se calcula a la vez, bloque a bloque en el tiempo: la memoria
+#   depende de n x tam_bloque, no de la duración.
+# - Reproducible: la señal i sale de SeedSequence(semilla, spawn_key=(i,)), así
+#   que es la misma con cualquier tamaño de lote o de bloque, y un conjunto
+#   grande se puede generar por partes (inicio) en varios procesos.
+# - Salida en streaming a un .wav por señal o a shards .npy (n, muestras) con
+#   un manifiesto JSON; ambos se escriben con escritura atómica.
+
+DEPRESION = 'depresion'
+ANSIEDAD = 'ansiedad'
+CALMA = 'calma'
+TIPOS = (DEPRESION, ANSIEDAD, CALMA)
+
+# Parámetros de cada tipo de señal:
+#   bandas: (Hz mín, Hz máx) de cada componente senoidal
+#   amplitudes: amplitud de cada componente
+#   ruido: desviación típica del ruido gaussiano
+#   modulacion: ((Hz mín, Hz máx), profundidad) de la modulación de amplitud, o None
+PERFILES = {
+    DEPRESION: {'bandas': ((2.5, 3.5), (5.5, 6.5)), 'amplitudes': (0.7, 0.5), 'ruido': 0.1, 'modulacion': None},
+    ANSIEDAD: {'bandas': ((18.0, 30.0), (30.0, 60.0)), 'amplitudes': (0.4, 0.3), 'ruido': 0.3,
+               'modulacion': ((0.5, 4.0), 0.7)},
+    CALMA: {'bandas': ((8.0, 12.0),), 'amplitudes': (0.6,), 'ruido': 0.05, 'modulacion': ((0.05, 0.2), 0.3)},
+}
+
+LADO_PATRON = 7           # Lado de los patrones inyectados (como PATTERN_SIZE en convert_edf_to_pattern.py)
+SEÑALES_POR_SHARD = 256   # Señales por archivo .npy
+NOMBRE_MANIFIESTO = "manifiesto_sinteticos.json"
+
+
+def perfil(tipo, **cambios):
+    """
+    Copia del perfil de `tipo` con los parámetros de `cambios` sustituidos.
+    """
+    if tipo not in PERFILES:
+        raise ValueError(f"Tipo de señal no soportado: {tipo!r} (usa uno de {TIPOS})")
+    desconocidos = set(cambios) - set(PERFILES[tipo])
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos: {sorted(desconocidos)} (admitidos: {sorted(PERFILES[tipo])})")
+    resultado = dict(PERFILES[tipo], **cambios)
+    if len(resultado['bandas']) != len(resultado['amplitudes']):
+        raise ValueError("Hace falta una amplitud por banda")
+    return resultado
+
+
+class GeneradorSintetico:
+    """
+    Lotes reproducibles de señales sintéticas de un tipo (ver PERFILES).
+    """
+    def __init__(self, tipo, tasa_muestreo=TASA_MUESTREO, semilla=None, dtype=np.float32, **parametros):
+        self.tipo = tipo
+        self.perfil = perfil(tipo, **parametros)
+        self.tasa_muestreo = int(tasa_muestreo)
+        self.semilla = int(semilla) if semilla is not None else int(np.random.SeedSequence().entropy)
+        self.dtype = np.dtype(dtype)
+
+    def _generadores(self, inicio, n):
+        return [np.random.default_rng(np.random.SeedSequence(self.semilla, spawn_key=(i,)))
+                for i in range(inicio, inicio + n)]
+
+    def _sorteo(self, generadores):
+        # Frecuencias y fases de cada componente y de la modulación, una fila por señal
+        bandas = np.asarray(self.perfil['bandas'], dtype=np.float64)
+        frecuencias = np.empty((len(generadores), len(bandas)))
+        fases = np.empty_like(frecuencias)
+        modulacion = np.zeros((len(generadores), 2))
+        for fila, rng in enumerate(generadores):
+            frecuencias[fila] = rng.uniform(bandas[:, 0], bandas[:, 1])
+            fases[fila] = rng.uniform(0, 2 * np.pi, len(bandas))
+            if self.perfil['modulacion'] is not None:
+                (f_min, f_max), _ = self.perfil['modulacion']
+                modulacion[fila] = rng.uniform(f_min, f_max), rng.uniform(0, 2 * np.pi)
+        return frecuencias, fases, modulacion
+
+    def n_muestras(self, segundos):
+        return int(round(segundos * self.tasa_muestreo))
+
+    def bloques(self, n, segundos, inicio=0, tam_bloque=TAM_BLOQUE):
+        """
+        Genera las señales inicio..inicio+n-1 como bloques (n, ≤tam_bloque) consecutivos en el tiempo.
+        """
+        generadores = self._generadores(inicio, n)
+        frecuencias, fases, modulacion = self._sorteo(generadores)
+        amplitudes = np.asarray(self.perfil['amplitudes'], dtype=np.float64)
+        profundidad = self.perfil['modulacion'][1] if self.perfil['modulacion'] is not None else 0.0
+        omegas = 2 * np.pi * frecuencias[:, :, None]
+        total = self.n_muestras(segundos)
+        for desde in range(0, total, tam_bloque):
+            t = np.arange(desde, min(desde + tam_bloque, total)) / self.tasa_muestreo
+            # Componentes: (n, bandas, muestras) -> suma ponderada (n, muestras)
+            bloque = np.einsum('b,nbt->nt', amplitudes, np.sin(omegas * t + fases[:, :, None]))
+            if profundidad:
+                # Envolvente entre 1 - profundidad y 1
+                envolvente = np.sin(2 * np.pi * modulacion[:, :1] * t + modulacion[:, 1:])
+                bloque *= 1.0 - profundidad * 0.5 * (1.0 - envolvente)
+            if self.perfil['ruido']:
+                ruido = np.stack([rng.standard_normal(t.size) for rng in generadores])
+                bloque += self.perfil['ruido'] * ruido
+            np.clip(bloque, -1.0, 1.0, out=bloque)
+            yield bloque.astype(self.dtype, copy=False)
+
+    def lote(self, n, segundos, inicio=0, tam_bloque=TAM_BLOQUE):
+        """
+        Las señales inicio..inicio+n-1 completas, como un array (n, muestras).
+        """
+        resultado = np.empty((n, self.n_muestras(segundos)), dtype=self.dtype)
+        desde = 0
+        for bloque in self.bloques(n, segundos, inicio, tam_bloque):
+            resultado[:, desde:desde + bloque.shape[1]] = bloque
+            desde += bloque.shape[1]
+        return resultado
+
+    def escribir_wavs(self, directorio, n, segundos, inicio=0, señales_por_lote=64, tam_bloque=TAM_BLOQUE):
+        """
+        Escribe un .wav mono int16 por señal en `directorio` (<tipo>_<índice>.wav),
+        generando `señales_por_lote` a la vez. Devuelve las rutas escritas.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        rutas = []
+        amplitud_maxima = np.iinfo(np.int16).max
+        for lote_inicio in range(inicio, inicio + n, señales_por_lote):
+            tam_lote = min(señales_por_lote, inicio + n - lote_inicio)
+            destinos = [os.path.join(directorio, f"{self.tipo}_{i:06d}.wav")
+                        for i in range(lote_inicio, lote_inicio + tam_lote)]
+            with contextlib.ExitStack() as pila:
+                # Cada .wav se cierra y después se renombra a su destino (orden inverso de entrada)
+                salidas = []
+                for destino in destinos:
+                    salida = pila.enter_context(wave.open(pila.enter_context(escritura_atomica(destino)), 'wb'))
+                    salida.setnchannels(1)
+                    salida.setsampwidth(2)
+                    salida.setframerate(self.tasa_muestreo)
+                    salidas.append(salida)
+                for bloque in self.bloques(tam_lote, segundos, lote_inicio, tam_bloque):
+                    enteros = (bloque * amplitud_maxima).astype('<i2')
+                    for salida, fila in zip(salidas, enteros):
+                        salida.writeframes(fila.tobytes())
+            rutas.extend(destinos)
+        return rutas
+
+    def escribir_shards(self, directorio, n, segundos, inicio=0, señales_por_shard=SEÑALES_POR_SHARD,
+                        tam_bloque=TAM_BLOQUE):
+        """
+        Escribe las señales en shards .npy de (≤señales_por_shard, muestras) que se
+        pueden abrir con np.load(mmap_mode='r'), y un manifiesto JSON con el perfil,
+        la semilla y el rango de señales de cada shard. Devuelve el manifiesto.
+        """
+        os.makedirs(directorio, exist_ok=True)
+        muestras = self.n_muestras(segundos)
+        shards = []
+        for shard_inicio in range(inicio, inicio + n, señales_por_shard):
+            tam_shard = min(señales_por_shard, inicio + n - shard_inicio)
+            nombre = f"{self.tipo}_{shard_inicio:06d}.npy"
+            with escritura_atomica(os.path.join(directorio, nombre)) as temporal:
+                destino = np.lib.format.open_memmap(temporal, mode='w+', dtype=self.dtype,
+                                                    shape=(tam_shard, muestras))
+                desde = 0
+                for bloque in self.bloques(tam_shard, segundos, shard_inicio, tam_bloque):
+                    destino[:, desde:desde + bloque.shape[1]] = bloque
+                    desde += bloque.shape[1]
+                destino.flush()
+                del destino
+            shards.append({'archivo': nombre, 'inicio': shard_inicio, 'n': tam_shard})
+        manifiesto = {
+            'tipo': self.tipo,
+            'perfil': self.perfil,
+            'semilla': self.semilla,
+            'tasa_muestreo': self.tasa_muestreo,
+            'muestras': muestras,
+            'dtype': self.dtype.str,
+            'shards': shards,
+        }
+        with escritura_atomica(os.path.join(directorio, NOMBRE_MANIFIESTO)) as temporal:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        return manifiesto
+
+
+def patrones(tipo, n, lado=LADO_PATRON, semilla=None, ruido=0.0):
+    """
+    Lote (n, lado, lado) de patrones para inyectar en el campo, con valores en [0, 1]:
+    - ansiedad: uniforme al azar (como generate_anxiety_pattern);
+    - calma: 0.5 + 0.1 sin((fila + columna) / 2), suave (como generate_calm_pattern);
+    - depresion: plano y bajo (0.1), sin variabilidad.
+    Con `ruido` se suma ruido gaussiano de esa desviación típica a cada patrón.
+    """
+    if tipo not in PERFILES:
+        raise ValueError(f"Tipo de patrón no soportado: {tipo!r} (usa uno de {TIPOS})")
+    rng = np.random.default_rng(semilla)
+    if tipo == ANSIEDAD:
+        resultado = rng.random((n, lado, lado))
+    else:
+        if tipo == CALMA:
+            base = 0.5 + 0.1 * np.sin(np.add.outer(np.arange(lado), np.arange(lado)) / 2)
+        else:
+            base = np.full((lado, lado), 0.1)
+        resultado = np.repeat(base[None], n, axis=0)
+    if ruido:
+        resultado += ruido * rng.standard_normal(resultado.shape)
+        np.clip(resultado, 0.0, 1.0, out=resultado)
+    return resultado
+
+
+def _pares(texto):
+    # "2.5-3.5,5.5-6.5" -> ((2.5, 3.5), (5.5, 6.5))
+    return tuple(tuple(float(x) for x in par.split('-')) for par in texto.split(','))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera lotes de señales sintéticas de depresión, ansiedad o calma.")
+    parser.add_argument("tipo", choices=TIPOS)
+    parser.add_argument("destino", help="directorio de salida")
+    parser.add_argument("--n", type=int, default=16, help="número de señales")
+    parser.add_argument("--inicio", type=int, default=0, help="índice de la primera señal (para generar por partes)")
+    parser.add_argument("--segundos", type=float, default=5.0, help="duración de cada señal")
+    parser.add_argument("--semilla", type=int, default=None)
+    parser.add_argument("--tasa", type=int, default=TASA_MUESTREO, help="tasa de muestreo (Hz)")
+    parser.add_argument("--formato", choices=('wav', 'shards'), default='wav')
+    parser.add_argument("--por-shard", type=int, default=SEÑALES_POR_SHARD, help="señales por shard .npy")
+    parser.add_argument("--bandas", type=_pares, default=None, help="bandas de los componentes, p. ej. '2.5-3.5,5.5-6.5'")
+    parser.add_argument("--amplitudes", type=lambda t: tuple(float(x) for x in t.split(',')), default=None,
+                        help="amplitud de cada banda, p. ej. '0.7,0.5'")
+    parser.add_argument("--ruido", type=float, default=None, help="desviación típica del ruido")
+    parser.add_argument("--modulacion", default=None,
+                        help="'fmin-fmax:profundidad' de la modulación de amplitud, o 'no'")
+    args = parser.parse_args()
+
+    cambios = {nombre: valor for nombre, valor in
+               (('bandas', args.bandas), ('amplitudes', args.amplitudes), ('ruido', args.ruido)) if valor is not None}
+    if args.modulacion is not None:
+        rango, _, profundidad = args.modulacion.partition(':')
+        cambios['modulacion'] = None if args.modulacion == 'no' else (_pares(rango)[0], float(profundidad))
+    generador = GeneradorSintetico(args.tipo, args.tasa, args.semilla, **cambios)
+    if args.formato == 'wav':
+        rutas = generador.escribir_wavs(args.destino, args.n, args.segundos, args.inicio)
+        print(f"🎵 {len(rutas)} archivos .wav de {args.tipo} en {args.destino} (semilla {generador.semilla})")
+    else:
+        manifiesto = generador.escribir_shards(args.destino, args.n, args.segundos, args.inicio, args.por_shard)
+        print(f"📦 {len(manifiesto['shards'])} shards de {args.tipo} en {args.destino} (semilla {generador.semilla})")
@@ -0,0 +1,108 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# --- GRÁFICOS DEL ANÁLISIS ESPECTRAL ---
+# El espectro de una grabación tiene cientos de miles de bins, pero el gráfico
+# solo muestra 0-500 Hz en unos 1200 píxeles de ancho. Antes de
+# dibujar se recorta al rango visible y se reduce a un mínimo y un máximo por
+# columna de píxeles: los picos (como el tono de 440 Hz) se conservan y matplotlib
+# dibuja miles de puntos en lugar de cientos de miles.
+#
+# Los gráficos se generan con la API orientada a objetos (Figure + lienzo Agg),
+# sin pyplot, para poder dibujarlos en un hilo de fondo sin tocar el estado
+# global de matplotlib ni la interfaz Tk.
+
+FREQ_MAX_GRAFICO = 500   # Hz, límite derecho del eje de frecuencias
+TAM_FIGURA = (12, 8)     # Pulgadas
+DPI_FIGURA = 100         # Con TAM_FIGURA, ~1200 píxeles de ancho
+COLUMNAS_GRAFICO = TAM_FIGURA[0] * DPI_FIGURA  # Parejas (mínimo, máximo) por curva
+
+
+def recortar_visible(freqs, *espectros, freq_max=FREQ_MAX_GRAFICO):
+    """
+    Devuelve las vistas de `freqs` y de cada espectro hasta `freq_max` (incluida).
+    """
+    fin = int(np.searchsorted(freqs, freq_max, side='right'))
+    return (freqs[:fin],) + tuple(espectro[:fin] for espectro in espectros)
+
+
+def decimar_min_max(freqs, valores, columnas=COLUMNAS_GRAFICO):
+    """
+    Reduce una curva a un mínimo y un máximo por columna. Devuelve (x, y) con dos
+    puntos por columna (en la frecuencia de inicio de la columna), de modo que la
+    línea trazada cubre la misma envolvente que la original. Si la curva ya cabe,
+    se devuelve sin cambios.
+    """
+    n = valores.size
+    if n <= 2 * columnas:
+        return freqs, valores
+    bordes = np.linspace(0, n, columnas, endpoint=False).astype(np.intp)
+    x = np.repeat(freqs[bordes], 2)
+    y = np.column_stack((np.minimum.reduceat(valores, bordes),
+                         np.maximum.reduceat(valores, bordes))).ravel()
+    return x, y
+
+
+def dibujar_espectros(freqs, espectro_original, espectro_procesado, nombre_archivo,
+                      banda_depresion, banda_activacion, freq_max=FREQ_MAX_GRAFICO):
+    """
+    Genera y guarda el gráfico comparando el espectro original y el procesado.
+    Los espectros pueden ser complejos; se dibuja su módulo, decimado al rango visible.
+    """
+    freqs, espectro_original, espectro_procesado = recortar_visible(
+        freqs, espectro_original, espectro_procesado, freq_max=freq_max)
+
+    fig = Figure(figsize=TAM_FIGURA, dpi=DPI_FIGURA)
+    FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(2, 1, sharex=True)
+
+    # Gráfico del espectro original
+    ax1.plot(*decimar_min_max(freqs, np.abs(espectro_original)))
+    ax1.set_title("Espectro de la Señal Original (Entrada)")
+    ax1.set_ylabel("Amplitud")
+    ax1.axvspan(banda_depresion[0], banda_depresion[1], color='blue', alpha=0.2, label=f'Banda Depresión ({banda_depresion[0]}-{banda_depresion[1]} Hz)')
+    ax1.axvspan(banda_activacion[0], banda_activacion[1], color='orange', alpha=0.3, label=f'Banda Activación ({banda_activacion[0]}-{banda_activacion[1]} Hz)')
+    ax1.legend()
+    ax1.grid(True, alpha=0.5)
+
+    # Gráfico del espectro de la contraonda
+    ax2.plot(*decimar_min_max(freqs, np.abs(espectro_procesado)))
+    ax2.set_title("Espectro de la Contraonda Espejo (Salida)")
+    ax2.set_xlabel("Frecuencia (Hz)")
+    ax2.set_ylabel("Amplitud")
+    ax2.axvspan(banda_activacion[0], banda_activacion[1], color='orange', alpha=0.3, label='Energía Concentrada en Activación')
+    ax2.legend()
+    ax2.grid(True, alpha=0.5)
+
+    ax2.set_xlim(0, freq_max)  # Limita la vista a las frecuencias más relevantes para EEG/Audio bajo
+    fig.tight_layout()
+    fig.savefig(nombre_archivo)
+    return nombre_archivo
+
+
+class TrazadorAsincrono:
+    """
+    Dibuja gráficos en un único hilo de fondo, en el orden en que se piden.
+    `encolar` devuelve enseguida un Future; `esperar` bloquea hasta que todos
+    los gráficos pendientes estén guardados y relanza el primer error.
+    """
+    def __init__(self):
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="graficos")
+        self._pendientes = []
+
+    def encolar(self, funcion, *args, **kwargs):
+        self._pendientes = [f for f in self._pendientes if not f.done() or f.exception() is not None]
+        futuro = self._ejecutor.submit(funcion, *args, **kwargs)
+        self._pendientes.append(futuro)
+        return futuro
+
+    def esperar(self):
+        pendientes, self._pendientes = self._pendientes, []
+        for futuro in pendientes:
+            futuro.result()
+
+    def cerrar(self):
+        self.esperar()
+        self._ejecutor.shutdown()
@@ -0,0 +1,223 @@
+import numpy as np
+
+# --- HISTORIAL DE MÉTRICAS PARA LAS GRÁFICAS EN VIVO ---
+# El historial crecía sin límite en listas de Python y cada fotograma volvía a
+# pasar la serie entera a matplotlib y a redibujar la figura completa: tras una
+# sesión larga, cada fotograma costaba O(historial).
+#
+# HistorialMetricas guarda cada serie en una pirámide de anillos preasignados:
+# el nivel 0 tiene las muestras tal cual y cada nivel k > 0 el mínimo y el máximo
+# de bloques de FACTOR_NIVEL**k muestras. Añadir una muestra cuesta O(niveles) y
+# la memoria es fija. Para dibujar se elige el nivel más fino cuyo contenido
+# cabe en PUNTOS_GRAFICO puntos, y cada bloque se traza como la pareja
+# (mínimo, máximo), con lo que los picos nunca desaparecen al reducir.
+#
+# GraficoBlit redibuja solo las líneas sobre un fondo guardado (blitting); la
+# figura completa solo se vuelve a dibujar cuando los datos se salen de los ejes,
+# que se amplían con margen para que eso ocurra pocas veces.
+
+CAPACIDAD_NIVEL = 1024    # Entradas por anillo y nivel
+FACTOR_NIVEL = 4          # Muestras de un nivel que resume cada entrada del siguiente
+NIVELES = 8               # El último nivel cubre CAPACIDAD_NIVEL * FACTOR_NIVEL**7 ≈ 16 M pasos
+PUNTOS_GRAFICO = 400      # Entradas máximas por serie en la vista (dos puntos por bloque)
+MARGEN_EJES = 0.1         # Fracción añadida al ampliar el eje Y
+
+
+class _Nivel:
+    """
+    Anillo de bloques (inicio, mínimo, máximo) más el bloque que se está llenando.
+    """
+    def __init__(self, capacidad, n_series):
+        self.capacidad = capacidad
+        self.inicio = np.zeros(capacidad, dtype=np.int64)
+        self.minimo = np.zeros((n_series, capacidad))
+        self.maximo = np.zeros((n_series, capacidad))
+        self.n = 0  # Bloques completos escritos (el anillo guarda los últimos `capacidad`)
+        self.pendiente_min = np.full(n_series, np.inf)
+        self.pendiente_max = np.full(n_series, -np.inf)
+        self.pendiente_inicio = 0
+        self.pendiente_n = 0
+
+    def acumular(self, inicio, minimo, maximo):
+        if self.pendiente_n == 0:
+            self.pendiente_inicio = inicio
+        np.minimum(self.pendiente_min, minimo, out=self.pendiente_min)
+        np.maximum(self.pendiente_max, maximo, out=self.pendiente_max)
+        self.pendiente_n += 1
+
+    def cerrar_bloque(self):
+        i = self.n % self.capacidad
+        self.inicio[i] = self.pendiente_inicio
+        self.minimo[:, i] = self.pendiente_min
+        self.maximo[:, i] = self.pendiente_max
+        self.n += 1
+        self.pendiente_min.fill(np.inf)
+        self.pendiente_max.fill(-np.inf)
+        self.pendiente_n = 0
+        return self.inicio[i], self.minimo[:, i], self.maximo[:, i]
+
+    def guardados(self):
+        return min(self.n, self.capacidad)
+
+    def ordenados(self, datos):
+        """
+        Vista cronológica del anillo (copia solo si ha dado la vuelta).
+        """
+        n = self.guardados()
+        if self.n <= self.capacidad:
+            return datos[..., :n]
+        corte = self.n % self.capacidad
+        return np.concatenate((datos[..., corte:], datos[..., :corte]), axis=-1)
+
+
+class HistorialMetricas:
+    """
+    Historial acotado de varias series (una por métrica) con vistas reducidas
+    por mínimo/máximo. `agregar(metricas, paso)` añade un punto; `vista()` devuelve
+    lo que hay que trazar. Los pasos deben ser crecientes: si el contador vuelve
+    atrás (reset, importación), hay que vaciar() antes.
+    """
+    def __init__(self, nombres, capacidad=CAPACIDAD_NIVEL, factor=FACTOR_NIVEL, niveles=NIVELES,
+                 puntos=PUNTOS_GRAFICO):
+        self.nombres = list(nombres)
+        self._indice = {nombre: i for i, nombre in enumerate(self.nombres)}
+        self.capacidad = capacidad
+        self.factor = factor
+        self.puntos = puntos
+        self._niveles = [_Nivel(capacidad, len(self.nombres)) for _ in range(niveles)]
+        self._muestra = np.empty(len(self.nombres))
+        self.n = 0  # Pasos añadidos en total
+
+    def __len__(self):
+        return self.n
+
+    def agregar(self, metricas, paso=None):
+        """
+        Añade los valores de `metricas` (diccionario con todas las series) en el eje X
+        `paso`, el paso de la simulación al que corresponden (por defecto, el número de
+        puntos ya añadidos).
+        """
+        for nombre, i in self._indice.items():
+            self._muestra[i] = metricas[nombre]
+        inicio, minimo, maximo = self.n if paso is None else int(paso), self._muestra, self._muestra
+        self.n += 1
+        for k, nivel in enumerate(self._niveles):
+            nivel.acumular(inicio, minimo, maximo)
+            # El nivel 0 guarda cada muestra; los demás cierran bloque cada `factor` entradas
+            if nivel.pendiente_n < (1 if k == 0 else self.factor):
+                break
+            inicio, minimo, maximo = nivel.cerrar_bloque()
+
+    def ultimo(self, nombre):
+        nivel = self._niveles[0]
+        return nivel.minimo[self._indice[nombre], (nivel.n - 1) % self.capacidad] if nivel.n else None
+
+    def vaciar(self):
+        self.__init__(self.nombres, self.capacidad, self.factor, len(self._niveles), self.puntos)
+
+    def _elegir_nivel(self):
+        # Nivel más fino que conserva todo lo grabado y cabe en `puntos` entradas;
+        # si ninguno lo conserva todo (sesiones muy largas), el más grueso.
+        for k, nivel in enumerate(self._niveles):
+            if nivel.n <= min(self.capacidad, self.puntos):
+                return k
+        return len(self._niveles) - 1
+
+    def vista(self, nombres=None):
+        """
+        Devuelve (x, {nombre: y}) con la historia reducida al nivel elegido: las
+        muestras tal cual en el nivel 0 o, en los demás, un mínimo y un máximo por
+        bloque (en el paso de inicio del bloque). El último bloque, incompleto, se
+        completa con lo pendiente de los niveles inferiores.
+        """
+        nombres = self.nombres if nombres is None else nombres
+        filas = [self._indice[nombre] for nombre in nombres]
+        k = self._elegir_nivel()
+        nivel = self._niveles[k]
+        inicio = nivel.ordenados(nivel.inicio)
+        minimo = nivel.ordenados(nivel.minimo[filas])
+        maximo = nivel.ordenados(nivel.maximo[filas])
+
+        # Cola: bloques pendientes de este nivel y de los inferiores, aún sin cerrar
+        pendientes = [n for n in self._niveles[:k + 1] if n.pendiente_n]
+        if pendientes:
+            cola_inicio = min(n.pendiente_inicio for n in pendientes)
+            cola_min = np.min([n.pendiente_min[filas] for n in pendientes], axis=0)
+            cola_max = np.max([n.pendiente_max[filas] for n in pendientes], axis=0)
+            inicio = np.append(inicio, cola_inicio)
+            minimo = np.column_stack((minimo, cola_min))
+            maximo = np.column_stack((maximo, cola_max))
+
+        if k == 0:
+            return inicio, {nombre: minimo[j] for j, nombre in enumerate(nombres)}
+        x = np.repeat(inicio, 2)
+        return x, {nombre: np.column_stack((minimo[j], maximo[j])).ravel()
+                   for j, nombre in enumerate(nombres)}
+
+
+class GraficoBlit:
+    """
+    Actualiza las líneas de unos ejes por blitting: se guarda el fondo de la figura
+    (ejes, etiquetas, leyenda) tras cada dibujado completo y cada actualización
+    solo restaura ese fondo y pinta las líneas encima. Si los datos se salen de los
+    límites, se amplían y se redibuja la figura entera una vez.
+    """
+    def __init__(self, canvas, ax, lineas):
+        self.canvas = canvas
+        self.ax = ax
+        self.lineas = list(lineas)
+        self._fondo = None
+        for linea in self.lineas:
+            linea.set_animated(True)
+        self.ax.set_xlim(0, 1)
+        self.canvas.mpl_connect('draw_event', self._al_dibujar)
+
+    def _al_dibujar(self, evento):
+        self._fondo = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._pintar_lineas()
+
+    def _pintar_lineas(self):
+        for linea in self.lineas:
+            self.ax.draw_artist(linea)
+
+    def _ajustar_limites(self, x, ys):
+        # Amplía (nunca reduce) los ejes: X al doble de lo necesario e Y con margen,
+        # para que los redibujados completos sean raros.
+        cambiado = False
+        x_max = float(x[-1]) if len(x) else 0.0
+        izq, der = self.ax.get_xlim()
+        if x_max > der:
+            self.ax.set_xlim(0, max(2 * x_max, 1))
+            cambiado = True
+        valores = [y[np.isfinite(y)] for y in ys if len(y)]
+        valores = [v for v in valores if v.size]
+        if valores:
+            y_min = min(float(v.min()) for v in valores)
+            y_max = max(float(v.max()) for v in valores)
+            abajo, arriba = self.ax.get_ylim()
+            if y_min < abajo or y_max > arriba:
+                margen = MARGEN_EJES * max(y_max - y_min, abs(y_max), 1e-9)
+                self.ax.set_ylim(min(abajo, y_min - margen), max(arriba, y_max + margen))
+                cambiado = True
+        return cambiado
+
+    def reiniciar_limites(self):
+        """
+        Vuelve a ajustar los ejes desde cero (tras vaciar el historial).
+        """
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(0, 1)
+        self.canvas.draw_idle()
+
+    def actualizar(self, x, ys):
+        """
+        Pone los datos `ys` (uno por línea) sobre `x` y refresca la figura.
+        """
+        for linea, y in zip(self.lineas, ys):
+            linea.set_data(x, y)
+        if self._ajustar_limites(x, ys) or self._fondo is None:
+            self.canvas.draw()  # Dispara _al_dibujar, que guarda el fondo y pinta las líneas
+        else:
+            self.canvas.restore_region(self._fondo)
+            self._pintar_lineas()
+        self.canvas.blit(self.canvas.figure.bbox)
@@ -0,0 +1,188 @@
+import json
+import os
+import zlib
+import numpy as np
+
+from escritura_segura import escritura_atomica
+
+# --- INSTANTÁNEAS BINARIAS DEL CAMPO N ---
+# Sustituye al JSON de exportar_estado para campos grandes. Estructura del archivo:
+#
+#   MAGIA (8 bytes) | longitud de la cabecera (uint32 little-endian) | cabecera JSON | datos
+#
+# - La cabecera (UTF-8) guarda forma, dtype, compresión, métricas, paso y semilla.
+#   Se rellena con espacios para que los datos empiecen en un múltiplo de
+#   ALINEACION bytes.
+# - Los datos son el campo en float32 little-endian, orden C. Sin compresión se
+#   pueden mapear con np.memmap sin copiarlos a memoria; con compresión (zlib)
+#   ocupan menos pero hay que descomprimirlos al cargar.
+#
+# Un campo de 50x50 ocupa ~10 KB sin comprimir, frente a ~69 KB en JSON; uno de
+# 2048x2048, 16 MB en lugar de cientos de MB de texto.
+
+MAGIA = b"CAMPON\x00\x01"     # Identificador del formato (los dos últimos bytes: versión 1)
+EXTENSION_INSTANTANEA = ".campon"
+ALINEACION = 64                # Bytes; inicio de los datos alineado para memmap
+DTYPE_INSTANTANEA = np.dtype('<f4')
+NIVEL_ZLIB = 6
+
+COMPRESION_ZLIB = 'zlib'
+
+
+def es_instantanea(ruta):
+    """
+    True si el archivo empieza por la firma del formato binario.
+    """
+    try:
+        with open(ruta, 'rb') as f:
+            return f.read(len(MAGIA)) == MAGIA
+    except OSError:
+        return False
+
+
+def serializar_instantanea(campo, metricas=None, paso=0, semilla=None, comprimir=False):
+    """
+    Devuelve los bytes de una instantánea de `campo` (2D) en float32, con sus
+    métricas, el paso de simulación y la semilla.
+    """
+    datos = np.ascontiguousarray(campo, dtype=DTYPE_INSTANTANEA)
+    carga = datos.tobytes()
+    if comprimir:
+        carga = zlib.compress(carga, NIVEL_ZLIB)
+    cabecera = {
+        'forma': list(datos.shape),
+        'dtype': DTYPE_INSTANTANEA.str,
+        'compresion': COMPRESION_ZLIB if comprimir else None,
+        'bytes_datos': len(carga),
+        'metricas': metricas or {},
+        'paso': int(paso),
+        'semilla': semilla,
+    }
+    texto = json.dumps(cabecera, ensure_ascii=False).encode('utf-8')
+    inicio = len(MAGIA) + 4 + len(texto)
+    texto += b' ' * (-inicio % ALINEACION)
+    return b''.join((MAGIA, np.array(len(texto), dtype='<u4').tobytes(), texto, carga))
+
+
+def guardar_instantanea(ruta, campo, metricas=None, paso=0, semilla=None, comprimir=False):
+    """
+    Guarda `campo` (2D) como instantánea binaria float32, con sus métricas, el paso
+    de simulación y la semilla. Devuelve el número de bytes escritos.
+    """
+    datos = serializar_instantanea(campo, metricas, paso, semilla, comprimir)
+    # Nunca se trunca el archivo en su sitio: puede estar mapeado en memoria (leer_estado)
+    with escritura_atomica(ruta) as temporal:
+        with open(temporal, 'wb') as f:
+            f.write(datos)
+    return len(datos)
+
+
+def _interpretar_cabecera(inicio):
+    # `inicio`: los primeros bytes del archivo (al menos hasta el final de la cabecera)
+    if inicio[:len(MAGIA)] != MAGIA:
+        raise ValueError("No es una instantánea del campo N")
+    longitud = int(np.frombuffer(inicio[len(MAGIA):len(MAGIA) + 4], dtype='<u4')[0])
+    desplazamiento = len(MAGIA) + 4 + longitud
+    cabecera = json.loads(bytes(inicio[len(MAGIA) + 4:desplazamiento]).decode('utf-8'))
+    return cabecera, desplazamiento
+
+
+def leer_cabecera(ruta):
+    """
+    Lee solo la cabecera. Devuelve (cabecera, desplazamiento de los datos en bytes).
+    """
+    with open(ruta, 'rb') as f:
+        if f.read(len(MAGIA)) != MAGIA:
+            raise ValueError(f"'{ruta}' no es una instantánea del campo N")
+        longitud = f.read(4)
+        texto = f.read(int(np.frombuffer(longitud, dtype='<u4')[0]))
+    return _interpretar_cabecera(MAGIA + longitud + texto)
+
+
+def instantanea_desde_bytes(datos):
+    """
+    Interpreta una instantánea recibida en memoria (p. ej. del servidor del campo).
+    Devuelve (campo, cabecera).
+    """
+    cabecera, desplazamiento = _interpretar_cabecera(datos)
+    carga = datos[desplazamiento:desplazamiento + cabecera['bytes_datos']]
+    if cabecera.get('compresion') == COMPRESION_ZLIB:
+        carga = zlib.decompress(carga)
+    elif cabecera.get('compresion') is not None:
+        raise ValueError(f"Compresión no soportada: {cabecera['compresion']!r}")
+    campo = np.frombuffer(bytearray(carga), dtype=np.dtype(cabecera['dtype'])).reshape(cabecera['forma'])
+    return campo, cabecera
+
+
+def cargar_instantanea(ruta, modo='r'):
+    """
+    Carga una instantánea. Devuelve (campo, cabecera).
+    Sin compresión, el campo es un np.memmap sobre el archivo (sin copia): `modo`
+    es el de np.memmap ('r' solo lectura, 'c' copia al escribir, 'r+' escribe en
+    el archivo). Con compresión se devuelve un array en memoria.
+    """
+    cabecera, desplazamiento = leer_cabecera(ruta)
+    forma = tuple(cabecera['forma'])
+    dtype = np.dtype(cabecera['dtype'])
+    if cabecera.get('compresion') is None:
+        campo = np.memmap(ruta, dtype=dtype, mode=modo, offset=desplazamiento, shape=forma)
+    elif cabecera['compresion'] == COMPRESION_ZLIB:
+        with open(ruta, 'rb') as f:
+            f.seek(desplazamiento)
+            carga = zlib.decompress(f.read(cabecera['bytes_datos']))
+        campo = np.frombuffer(bytearray(carga), dtype=dtype).reshape(forma)
+    else:
+        raise ValueError(f"Compresión no soportada: {cabecera['compresion']!r}")
+    return campo, cabecera
+
+
+def leer_json(ruta):
+    """
+    Lee un estado exportado en el formato JSON anterior. Devuelve (campo, cabecera)
+    con la misma cabecera que una instantánea (paso y semilla si el JSON los tiene).
+    """
+    with open(ruta, 'r') as f:
+        data = json.load(f)
+    campo = np.array(data['campo'], dtype=float) if 'campo' in data else None
+    cabecera = {
+        'forma': list(campo.shape) if campo is not None else None,
+        'metricas': data.get('metricas', {}),
+        'paso': data.get('paso', 0),
+        'semilla': data.get('semilla'),
+    }
+    return campo, cabecera
+
+
+def leer_estado(ruta, modo='r'):
+    """
+    Lee un estado en cualquiera de los dos formatos, detectándolo por su contenido
+    (no por la extensión). Devuelve (campo, cabecera).
+    """
+    if es_instantanea(ruta):
+        return cargar_instantanea(ruta, modo)
+    return leer_json(ruta)
+
+
+def convertir_json(ruta_json, ruta_salida=None, comprimir=False):
+    """
+    Convierte un estado JSON a instantánea binaria. Por defecto, junto al original
+    con extensión EXTENSION_INSTANTANEA. Devuelve la ruta escrita.
+    """
+    campo, cabecera = leer_json(ruta_json)
+    if campo is None:
+        raise ValueError(f"'{ruta_json}' no contiene un campo")
+    ruta_salida = ruta_salida or os.path.splitext(ruta_json)[0] + EXTENSION_INSTANTANEA
+    guardar_instantanea(ruta_salida, campo, cabecera['metricas'], cabecera['paso'],
+                        cabecera['semilla'], comprimir)
+    return ruta_salida
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Convierte estados JSON del campo N a instantáneas binarias.")
+    parser.add_argument("archivos", nargs="+", help="archivos .json exportados con exportar_estado")
+    parser.add_argument("--comprimir", action="store_true", help="comprimir los datos con zlib (no permite memmap)")
+    args = parser.parse_args()
+    for ruta in args.archivos:
+        salida = convertir_json(ruta, comprimir=args.comprimir)
+        print(f"✅ {ruta} ({os.path.getsize(ruta)} bytes) -> {salida} ({os.path.getsize(salida)} bytes)")
@@ -1,7 +1,16 @@
 import numpy as np
 import scipy.io.wavfile as wav
-from scipy.fft import rfft, irfft
-import matplotlib.pyplot as plt
+
+from motor_difusion import MotorDifusion, DifusionPorTeselas, TAM_TESELA, EPSILON_TESELA
+from metricas_campo import mapa_varianza_local, MotorMetricas
+from flujo_wav import TAM_BLOQUE, PICO_GLOBAL, abrir_wav, bloques_normalizados, escribir_wav_por_bloques
+from procesador_bloques import ProcesadorBloques
+from contexto_espectral import obtener_contexto
+from graficos_espectro import TrazadorAsincrono, dibujar_espectros, recortar_visible
+from instantanea_campo import guardar_instantanea, leer_estado
+from trayectoria_campo import EscritorTrayectoria, FRAMES_POR_BLOQUE
+from lector_edf import LectorEDF
+from cache_resultados import CacheResultados, hash_array, DIRECTORIO_CACHE_RESULTADOS, TAM_MAXIMO_CACHE
 
 # --- PARÁMETROS GLOBALES DEL LABORATORIO ---
 # Define las bandas de frecuencia de interés (en Hz)
@@ -9,31 +18,211 @@ import matplotlib.pyplot as plt
 BANDA_DEPRESION = (1, 8)    # Frecuencias Delta/Theta (asociadas a depresión)
 BANDA_ACTIVACION = (15, 60) # Frecuencias Beta/Gamma (asociadas a activación/flexibilidad)
 TASA_MUESTREO = 44100       # Estándar para audio de calidad CD
+TAMANO_CAMPO = 50           # Lado del campo 2D del Motor N (en celdas)
+GANANCIA_ACTIVACION = 5     # Amplificación de la banda de activación en la contraonda
+FREQ_TONO_AUDIBLE = 440     # Hz, tono puro (La 4) que asegura la audibilidad de la contraonda
+GANANCIA_TONO = 2.0         # Amplitud del tono relativa al pico del espectro de entrada
+PRECISION_DOBLE = np.float64  # Política de precisión por defecto (la de siempre)
+PRECISION_SIMPLE = np.float32  # Mitad de memoria y ancho de banda; espectros en complex64
+VERSION_CACHE = 1           # Cambiarla invalida los resultados guardados si cambia el encoder o el procesador
 
 class LaboratorioN:
     """
     Un laboratorio para procesar señales de onda basado en principios
     de entropía y teoría de la información.
     """
-    def __init__(self, tasa_muestreo=TASA_MUESTREO):
+    def __init__(self, tasa_muestreo=TASA_MUESTREO, grid_size=TAMANO_CAMPO, semilla=None, dtype=PRECISION_DOBLE):
+        """
+        `dtype` es la política de precisión: con float32 el campo, las señales del encoder,
+        los espectros (complex64) y la contraonda se mantienen en precisión simple de
+        principio a fin; con float64, todo en precisión doble (ver _en_precision).
+        """
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(PRECISION_DOBLE), np.dtype(PRECISION_SIMPLE)):
+            raise ValueError(f"Precisión no soportada: {self.dtype} (usa float32 o float64)")
         self.tasa_muestreo = tasa_muestreo
         print("🔬 Laboratorio N inicializado.")
         print(f"Tasa de muestreo configurada a {tasa_muestreo} Hz.")
+        if self.dtype == PRECISION_SIMPLE:
+            print("Precisión simple (float32) activada.")
         # --- Motor N: campo 2D ---
-        self.grid_size = 50
-        self.resetear_campo()
+        self.grid_size = int(grid_size)
+        self.motor_difusion = None
+        self.difusion_teselas = None
+        self.trazador = None
+        self.grabador = None
+        self.motor_metricas = None
+        self._campo_metricas = None
+        self.cache = None
+        self.resetear_campo(semilla)
 
     def evolucionar_campo(self, alpha=0.05):
         """
         Aplica una regla de difusión discreta: cada celda evoluciona hacia el promedio de su vecindario 3x3.
+        El cálculo se hace sobre todo el campo a la vez con el MotorDifusion.
+        """
+        self._comprobar_grabacion(self.campo.shape)
+        self.campo = self._en_precision(self.campo)
+        if self.difusion_teselas is not None:
+            teselas = self._teselas_para(self.campo)
+            teselas.paso(self.campo, alpha)
+            self._marcar_metricas(teselas)
+        else:
+            self.campo = self._motor_para(self.campo).paso(self.campo, alpha)
+            self._marcar_metricas()
+        self.pasos += 1
+        if self.grabador is not None:
+            self.grabador.agregar(self.campo)
+
+    def evolve(self, n_steps, alpha=0.05, tol=None):
+        """
+        Evoluciona el campo hasta `n_steps` pasos seguidos reutilizando los buffers del motor.
+        Si se indica `tol`, se detiene en cuanto el cambio máximo de un paso es menor que `tol`
+        (tiempo de disolución medido). Devuelve el número de pasos realizados.
+        """
+        self.campo = self._en_precision(self.campo)
+        if self.grabador is not None:
+            # Grabando hace falta cada paso intermedio: se evoluciona paso a paso.
+            return self._evolve_grabando(n_steps, alpha, tol)
+        if self.difusion_teselas is None:
+            self.campo, pasos = self._motor_para(self.campo).evolucionar(self.campo, n_steps, alpha, tol)
+            self._marcar_metricas()
+            self.pasos += pasos
+            return pasos
+        teselas = self._teselas_para(self.campo)
+        pasos = 0
+        while pasos < n_steps:
+            pasos += 1
+            cambio = teselas.paso(self.campo, alpha)
+            self._marcar_metricas(teselas)
+            if (tol is not None and cambio < tol) or not teselas.hay_actividad():
+                break
+        self.pasos += pasos
+        return pasos
+
+    def _en_precision(self, array):
+        """
+        Lleva `array` exactamente a self.dtype: en precisión simple los float64 bajan a
+        float32 y en doble los float32 (p. ej. las ventanas de encoder_edf) suben a float64,
+        así el campo y los espectros no cambian de tipo según de dónde vengan.
+        Si ya está en self.dtype se devuelve el mismo objeto, sin copia.
+        """
+        return np.asarray(array).astype(self.dtype, copy=False)
+
+    def _evolve_grabando(self, n_steps, alpha, tol):
+        pasos = 0
+        while pasos < n_steps:
+            anterior = self.campo.copy() if tol is not None else None
+            self.evolucionar_campo(alpha)
+            pasos += 1
+            if tol is not None and np.max(np.abs(self.campo - anterior)) < tol:
+                break
+        return pasos
+
+    def iniciar_grabacion(self, ruta, frames_por_bloque=FRAMES_POR_BLOQUE):
+        """
+        Empieza a grabar la trayectoria del campo en `ruta` (ver trayectoria_campo.py):
+        se guarda el campo actual y después cada paso de evolucionar_campo o evolve.
+        """
+        self.detener_grabacion()
+        self.grabador = EscritorTrayectoria(ruta, self.campo.shape, frames_por_bloque,
+                                            paso_inicial=self.pasos, semilla=self.semilla)
+        self.grabador.agregar(self.campo)
+        return self.grabador
+
+    def _comprobar_grabacion(self, forma):
+        # Una trayectoria tiene una sola forma: se comprueba antes de tocar el campo,
+        # para no dejar un paso dado (o un campo importado) que ya no se puede grabar.
+        if self.grabador is not None and tuple(forma) != self.grabador.forma:
+            raise ValueError(f"Se está grabando una trayectoria de forma {self.grabador.forma} y el campo "
+                             f"tiene forma {tuple(forma)}; detén la grabación antes de cambiar de tamaño.")
+
+    def detener_grabacion(self):
+        """
+        Cierra la trayectoria en curso, si la hay. Devuelve el número de pasos grabados.
+        """
+        if self.grabador is None:
+            return 0
+        self.grabador.cerrar()
+        n_frames, self.grabador = self.grabador.n_frames, None
+        return n_frames
+
+    def _motor_para(self, campo):
         """
-        nuevo = self.campo.copy()
-        for r in range(self.grid_size):
-            for c in range(self.grid_size):
-                sub = self.campo[max(0, r - 1):min(self.grid_size, r + 2), max(0, c - 1):min(self.grid_size, c + 2)]
-                avg = np.mean(sub)
-                nuevo[r, c] += alpha * (avg - self.campo[r, c])
-        self.campo = np.clip(nuevo, 0, 1)
+        Devuelve el motor de difusión adecuado para la forma y el tipo del campo,
+        creándolo de nuevo solo si el campo ha cambiado de forma o de dtype.
+        """
+        if self.motor_difusion is None or not self.motor_difusion.admite(campo):
+            self.motor_difusion = MotorDifusion(campo.shape, campo.dtype)
+        return self.motor_difusion
+
+    def activar_modo_incremental(self, tam_tesela=TAM_TESELA, epsilon=EPSILON_TESELA):
+        """
+        Activa el modo incremental: evolucionar_campo solo recalcula las teselas que han
+        cambiado más de `epsilon` (y su halo), actualizando el campo en su sitio.
+        Pensado para campos grandes casi asentados en los que se inyectan patrones pequeños.
+        Es aproximado: el resultado se separa del paso completo en un orden que crece con `epsilon`.
+        """
+        self.difusion_teselas = DifusionPorTeselas(self.campo.shape, tam_tesela, epsilon)
+        self.difusion_teselas.marcar_todo()
+        self._campo_teselas = self.campo
+
+    def activar_cache(self, directorio=DIRECTORIO_CACHE_RESULTADOS, tam_maximo=TAM_MAXIMO_CACHE):
+        """
+        Guarda en disco los resultados del encoder y del procesador entrópico (ver
+        cache_resultados.py): repetir un análisis con la misma entrada y los mismos
+        parámetros los lee de la caché en lugar de recalcularlos.
+        """
+        self.cache = CacheResultados(directorio, tam_maximo)
+        return self.cache
+
+    def desactivar_cache(self):
+        if self.cache is not None:
+            self.cache.cerrar()
+        self.cache = None
+
+    def desactivar_modo_incremental(self):
+        """
+        Vuelve al modo de actualización completa del campo.
+        """
+        self.difusion_teselas = None
+        self._campo_teselas = None
+
+    def _teselas_para(self, campo):
+        """
+        Devuelve el mapa de teselas activas del campo. Si el campo se ha sustituido
+        desde fuera (reset, importación, análisis...), se vuelve a marcar entero.
+        """
+        teselas = self.difusion_teselas
+        if campo is not self._campo_teselas:
+            if campo.shape != teselas.forma:
+                teselas = DifusionPorTeselas(campo.shape, teselas.tam_tesela, teselas.epsilon)
+                self.difusion_teselas = teselas
+            teselas.marcar_todo()
+            self._campo_teselas = campo
+        return teselas
+
+    def _notificar_cambio(self, r0, r1, c0, c1):
+        """
+        Registra que la región [r0, r1) x [c0, c1) del campo se ha modificado en su sitio.
+        """
+        if self.difusion_teselas is not None:
+            self._teselas_para(self.campo).marcar_region(r0, r1, c0, c1)
+        if self.motor_metricas is not None and self._campo_metricas is self.campo:
+            self.motor_metricas.marcar_region(r0, r1, c0, c1)
+
+    def _marcar_metricas(self, teselas=None):
+        """
+        Marca para las métricas lo que ha cambiado en un paso: todo el campo tras un paso
+        completo (los buffers ping-pong se reutilizan, así que no basta comparar objetos)
+        o solo las teselas reescritas tras un paso por teselas.
+        """
+        if self.motor_metricas is None:
+            return
+        if teselas is None:
+            self.motor_metricas.marcar_todo()
+        elif self._campo_metricas is self.campo:
+            self.motor_metricas.marcar_teselas(teselas.escritas, teselas.tam_tesela)
 
     def calcular_varianza_local(self, r, c):
         """
@@ -44,17 +233,30 @@ class LaboratorioN:
         varianza = np.mean((sub - avg) ** 2)
         return varianza
 
+    def mapa_varianza_local(self, radio=1):
+        """
+        Calcula la varianza local de todas las celdas a la vez (mismo recorte de bordes
+        que calcular_varianza_local) mediante imágenes integrales.
+        """
+        return mapa_varianza_local(self.campo, radio)
+
     def get_campo(self):
         """
         Devuelve una copia del campo actual (para visualización).
         """
         return self.campo.copy()
 
-    def resetear_campo(self):
+    def resetear_campo(self, semilla=None):
         """
-        Reinicia el campo con valores aleatorios bajos.
+        Reinicia el campo con valores aleatorios bajos y pone a cero el contador de pasos.
+        La semilla usada (la indicada o una nueva) queda en self.semilla para poder
+        reproducir el campo inicial.
         """
-        self.campo = np.random.rand(self.grid_size, self.grid_size) * 0.15
+        self.semilla = int(semilla) if semilla is not None else int(np.random.SeedSequence().entropy)
+        rng = np.random.default_rng(self.semilla)
+        # Se sortea siempre en float64: la misma semilla da el mismo campo en ambas precisiones
+        self.campo = (rng.random((self.grid_size, self.grid_size)) * 0.15).astype(self.dtype, copy=False)
+        self.pasos = 0
 
     def inyectar_patron_ansiedad(self):
         """
@@ -63,53 +265,77 @@ class LaboratorioN:
         centro = self.grid_size // 2
         radio = 5
         self.campo[centro-radio:centro+radio, centro-radio:centro+radio] = 1.0
+        self._notificar_cambio(centro - radio, centro + radio, centro - radio, centro + radio)
 
     def calcular_metricas(self):
         """
-        Calcula entropía, varianza y valor máximo del campo.
+        Calcula entropía, varianza y valor máximo del campo con el MotorMetricas:
+        un solo recorrido por teselas, y solo de las teselas modificadas si el campo
+        se ha cambiado en su sitio (inyección, modo incremental).
         Guarda el resultado en self.metricas_ultimas.
         """
-        import numpy as np
-        campo = self.campo
-        # Entropía de Shannon
-        hist, _ = np.histogram(campo, bins=20, range=(0,1), density=True)
-        hist = hist[hist>0]
-        entropia = -np.sum(hist * np.log2(hist)) if len(hist)>0 else 0.0
-        varianza = np.var(campo)
-        maximo = np.max(campo)
-        self.metricas_ultimas = {
-            'entropia': float(entropia),
-            'varianza': float(varianza),
-            'maximo': float(maximo)
-        }
+        self.metricas_ultimas = self._metricas_para(self.campo).calcular(self.campo)
         return self.metricas_ultimas
 
-    def exportar_estado(self, ruta):
+    def _metricas_para(self, campo):
+        """
+        Devuelve el motor de métricas del campo. Si el campo es otro objeto que en el
+        cálculo anterior (reset, importación, asignación desde fuera...), se recorre entero.
+        """
+        if self.motor_metricas is None or not self.motor_metricas.admite(campo):
+            extra = self.motor_metricas._extra if self.motor_metricas is not None else {}
+            self.motor_metricas = MotorMetricas(campo.shape)
+            for nombre, funcion in extra.items():
+                self.motor_metricas.registrar_metrica(nombre, funcion)
+        elif campo is not self._campo_metricas:
+            self.motor_metricas.marcar_todo()
+        self._campo_metricas = campo
+        return self.motor_metricas
+
+    def registrar_metrica(self, nombre, funcion):
+        """
+        Añade una métrica a calcular_metricas (ver MotorMetricas.registrar_metrica),
+        p. ej. metricas_campo.entropia_espacial.
+        """
+        self._metricas_para(self.campo).registrar_metrica(nombre, funcion)
+
+    def exportar_estado(self, ruta, comprimir=False):
         """
-        Exporta el campo y métricas actuales a un archivo JSON.
+        Exporta el campo, las métricas actuales, el paso y la semilla.
+        Con extensión .json se usa el formato JSON de siempre; con cualquier otra, una
+        instantánea binaria float32 (ver instantanea_campo.py), opcionalmente comprimida.
         """
-        import json
         self.calcular_metricas()
-        data = {
-            'campo': self.campo.tolist(),
-            'metricas': self.metricas_ultimas
-        }
-        with open(ruta, 'w') as f:
-            json.dump(data, f, indent=2)
+        if ruta.lower().endswith('.json'):
+            import json
+            data = {
+                'campo': self.campo.tolist(),
+                'metricas': self.metricas_ultimas,
+                'paso': self.pasos,
+                'semilla': self.semilla
+            }
+            with open(ruta, 'w') as f:
+                json.dump(data, f, indent=2)
+        else:
+            guardar_instantanea(ruta, self.campo, self.metricas_ultimas, self.pasos, self.semilla, comprimir)
 
     def importar_estado(self, ruta):
         """
-        Importa el campo y métricas desde un archivo JSON.
+        Importa el campo, las métricas, el paso y la semilla desde un JSON o una
+        instantánea binaria; el formato se detecta por el contenido del archivo.
+        El campo se copia a memoria: así el archivo se puede volver a exportar
+        (o borrar) sin afectar al campo en uso. Mientras se graba, un campo de otra
+        forma se rechaza sin cambiar nada.
         """
-        import json
-        with open(ruta, 'r') as f:
-            data = json.load(f)
-        if 'campo' in data:
-            import numpy as np
-            self.campo = np.array(data['campo'], dtype=float)
-        if 'metricas' in data:
-            self.metricas_ultimas = data['metricas']
-
+        campo, cabecera = leer_estado(ruta, modo='r')
+        if campo is not None:
+            self._comprobar_grabacion(campo.shape)
+            self.campo = np.array(campo, dtype=self.dtype)
+            self.grid_size = campo.shape[0]
+        if cabecera.get('metricas'):
+            self.metricas_ultimas = cabecera['metricas']
+        self.pasos = int(cabecera.get('paso') or 0)
+        self.semilla = cabecera.get('semilla')
 
     def encoder(self, nombre_archivo):
         """
@@ -117,36 +343,18 @@ class LaboratorioN:
         en un formato que el campo N puede entender (un array de numpy).
         """
         print(f"\n[1. ENCODER] Cargando señal desde '{nombre_archivo}'...")
-        import os
         try:
-            ext = os.path.splitext(nombre_archivo)[1].lower()
-            if ext == '.wav':
-                # Lee la frecuencia y los datos del archivo wav
-                tasa_leida, datos_onda = wav.read(nombre_archivo)
-                if tasa_leida != self.tasa_muestreo:
-                    print(f"Advertencia: La tasa de muestreo del archivo es {tasa_leida} Hz, se esperaba {self.tasa_muestreo} Hz.")
-                # Si es estéreo, convierte a mono
-                if len(datos_onda.shape) > 1:
-                    datos_onda = datos_onda.mean(axis=1)
-                # Normaliza la señal al rango [-1, 1]
-                datos_normalizados = datos_onda / np.max(np.abs(datos_onda)) if np.max(np.abs(datos_onda)) > 0 else datos_onda
-                print("Señal cargada y normalizada con éxito.")
-                return datos_normalizados
-            elif ext == '.png':
-                import matplotlib.pyplot as plt
-                img = plt.imread(nombre_archivo)
-                # Si tiene canal alfa, descártalo
-                if img.ndim == 3:
-                    img = img[..., :3]
-                    # Convierte a escala de grises si es RGB
-                    img = np.dot(img[..., :3], [0.2989, 0.5870, 0.1140])
-                img_flat = img.flatten()
-                # Normaliza a [0, 1]
-                img_flat = (img_flat - img_flat.min()) / (img_flat.max() - img_flat.min() + 1e-8)
-                print("Imagen PNG cargada y normalizada con éxito.")
-                return img_flat
-            else:
-                raise ValueError("Formato de archivo no soportado (solo .wav y .png)")
+            if self.cache is None:
+                return self._decodificar_archivo(nombre_archivo)
+            clave = self.cache.clave('encoder', self.cache.huella_archivo(nombre_archivo), dtype=self.dtype.str,
+                                     version=VERSION_CACHE)
+            datos = self.cache.obtener(clave)
+            if datos is not None:
+                print("Señal recuperada de la caché.")
+                return datos
+            datos = self._decodificar_archivo(nombre_archivo)
+            self.cache.guardar(clave, datos)
+            return datos
         except FileNotFoundError:
             print(f"Error: El archivo '{nombre_archivo}' no fue encontrado.")
             return None
@@ -154,45 +362,161 @@ class LaboratorioN:
             print(f"Error al leer el archivo: {e}")
             return None
 
-    def procesador_entropico(self, señal, nombre_grafico="analisis_espectral_depresion.png"):
+    def _decodificar_archivo(self, nombre_archivo):
+        # Lectura y normalización del encoder, sin caché ni gestión de errores
+        import os
+        ext = os.path.splitext(nombre_archivo)[1].lower()
+        if ext == '.wav':
+            # Lee la frecuencia y los datos del archivo wav
+            tasa_leida, datos_onda = wav.read(nombre_archivo)
+            if tasa_leida != self.tasa_muestreo:
+                print(f"Advertencia: La tasa de muestreo del archivo es {tasa_leida} Hz, se esperaba {self.tasa_muestreo} Hz.")
+            # Si es estéreo, convierte a mono
+            if len(datos_onda.shape) > 1:
+                datos_onda = datos_onda.mean(axis=1, dtype=self.dtype)
+            # Normaliza la señal al rango [-1, 1] (en la precisión del laboratorio)
+            datos_onda = self._en_precision(datos_onda)
+            pico = np.max(np.abs(datos_onda))
+            datos_normalizados = datos_onda / pico if pico > 0 else datos_onda
+            print("Señal cargada y normalizada con éxito.")
+            return datos_normalizados
+        elif ext == '.png':
+            import matplotlib.pyplot as plt
+            img = plt.imread(nombre_archivo)
+            # Si tiene canal alfa, descártalo
+            if img.ndim == 3:
+                img = img[..., :3]
+                # Convierte a escala de grises si es RGB
+                img = np.dot(img[..., :3], np.array([0.2989, 0.5870, 0.1140], dtype=self.dtype))
+            img_flat = self._en_precision(img.flatten())
+            # Normaliza a [0, 1]
+            img_flat = (img_flat - img_flat.min()) / (img_flat.max() - img_flat.min() + 1e-8)
+            print("Imagen PNG cargada y normalizada con éxito.")
+            return img_flat
+        else:
+            raise ValueError("Formato de archivo no soportado (solo .wav y .png)")
+
+    def encoder_por_bloques(self, nombre_archivo, tam_bloque=TAM_BLOQUE, modo_pico=PICO_GLOBAL):
+        """
+        Codificador en streaming para grabaciones largas: mapea el .wav en memoria y
+        genera bloques mono float32 de `tam_bloque` muestras normalizados a [-1, 1].
+        `modo_pico` elige entre el pico global (una pasada previa) o el pico acumulado
+        (una sola pasada). La memoria usada no depende de la duración del archivo.
+        """
+        print(f"\n[1. ENCODER] Leyendo '{nombre_archivo}' por bloques de {tam_bloque} muestras...")
+        tasa_leida, datos_onda = abrir_wav(nombre_archivo)
+        if tasa_leida != self.tasa_muestreo:
+            print(f"Advertencia: La tasa de muestreo del archivo es {tasa_leida} Hz, se esperaba {self.tasa_muestreo} Hz.")
+        yield from bloques_normalizados(datos_onda, tam_bloque, modo_pico)
+
+    def encoder_edf(self, nombre_archivo, canales=None, segundos_ventana=1.0, salto=None):
+        """
+        Codificador para EEG en EDF/EDF+: recorre el archivo mapeado en memoria por
+        ventanas de `segundos_ventana` y genera (canal, t_inicio, ventana) para cada
+        canal pedido (por defecto, todos los de datos). Cada ventana va en float32
+        normalizada a [-1, 1] con el rango físico del canal, sin leer la grabación
+        entera. La tasa de cada canal está en canal.tasa y suele no ser la del
+        laboratorio: hay que pasarla al procesador,
+        procesador_entropico(ventana, tasa_muestreo=canal.tasa).
+        """
+        print(f"\n[1. ENCODER] Leyendo EEG '{nombre_archivo}' por ventanas de {segundos_ventana} s...")
+        with LectorEDF(nombre_archivo) as lector:
+            for canal, inicio, ventana in lector.ventanas(canales, segundos_ventana, salto):
+                ventana /= np.float32(canal.pico_fisico or 1.0)
+                yield canal, inicio, ventana
+
+    def procesador_entropico(self, señal, nombre_grafico="analisis_espectral_depresion.png", grafico_asincrono=False,
+                             tasa_muestreo=None):
         """
         Procesador Entrópico: Analiza la señal, identifica la entropía (rigidez/baja complejidad)
         y genera una \'contraonda espejo\' de alta entropía funcional controlada.
+        Con `nombre_grafico=None` no se genera el gráfico espectral. Si se genera, el archivo
+        está escrito al volver; con `grafico_asincrono=True` se dibuja en un hilo de fondo y la
+        contraonda se devuelve sin esperarlo (ver esperar_graficos).
+        Con la caché activada (activar_cache), una señal ya procesada con los mismos parámetros
+        se devuelve sin recalcular, salvo que se pida el gráfico (que necesita los espectros;
+        entonces la caché ni se consulta ni se escribe).
+        `tasa_muestreo` es la de la señal si no es la del laboratorio (p. ej. un canal de
+        encoder_edf): las bandas y el tono se sitúan en Hz reales de esa señal.
         """
         print("\n[2. PROCESADOR] Analizando la entropía de la señal...")
+        tasa = self.tasa_muestreo if tasa_muestreo is None else tasa_muestreo
+        # En precisión simple la FFT de una señal float32 ya es complex64 y la inversa float32
+        señal = self._en_precision(señal)
+        clave = None
+        # Con gráfico la caché ni se lee ni se escribe: no se hashea la señal ni se guarda
+        # una entrada que el mismo camino nunca volvería a leer.
+        if self.cache is not None and nombre_grafico is None:
+            clave = self.cache.clave('procesador', hash_array(señal), tasa=tasa, dtype=self.dtype.str,
+                                     banda=BANDA_ACTIVACION, ganancia=GANANCIA_ACTIVACION,
+                                     tono=FREQ_TONO_AUDIBLE, ganancia_tono=GANANCIA_TONO, version=VERSION_CACHE)
+            contraonda = self.cache.obtener(clave)
+            if contraonda is not None:
+                print("Contraonda recuperada de la caché.")
+                return contraonda
         
+        # Eje de frecuencias, tramo de la banda y bin del tono: se reutilizan entre
+        # llamadas con la misma longitud y tasa (ver contexto_espectral.py)
+        contexto = obtener_contexto(len(señal), tasa, (BANDA_ACTIVACION,), FREQ_TONO_AUDIBLE)
+        frecuencias = contexto.frecuencias
+
         # Aplica la Transformada Rápida de Fourier (FFT) para pasar al dominio de la frecuencia
-        espectro = rfft(señal)
-        frecuencias = np.fft.rfftfreq(len(señal), 1 / self.tasa_muestreo)
+        espectro = contexto.rfft(señal)
         
         # Crea el espectro de la contraonda (inicialmente vacío)
         espectro_contraonda = np.zeros_like(espectro)
 
-        # Define las máscaras booleanas para las bandas de frecuencia
-        mascara_activacion = (frecuencias >= BANDA_ACTIVACION[0]) & (frecuencias <= BANDA_ACTIVACION[1])
+        # Tramo del espectro que ocupa la banda de activación
+        tramo_activacion = contexto.banda(BANDA_ACTIVACION)
         
         print(f"Creando contraonda... Acentuando la banda de activación ({BANDA_ACTIVACION[0]}-{BANDA_ACTIVACION[1]} Hz).")
         
         # Copia y amplifica la energía de la banda de activación de la señal original a la contraonda
         # Esto hace que la contraonda "resuene" con la activación ya presente (aunque sea mínima)
-        espectro_contraonda[mascara_activacion] = espectro[mascara_activacion] * 5 # Mayor amplificación
+        espectro_contraonda[tramo_activacion] = espectro[tramo_activacion] * GANANCIA_ACTIVACION # Mayor amplificación
         
         # Añadir un tono puro y muy audible (ej. 440 Hz - La 4) para asegurar la audibilidad
         # Esto asegura que la contraonda sea siempre audible y clara, independientemente de la señal de entrada
-        freq_tono_audible = 440 # Hz
-        idx_tono_audible = np.argmin(np.abs(frecuencias - freq_tono_audible))
+        idx_tono_audible = contexto.bin_tono
         # Asegurarse de que el tono se añada con una amplitud considerable
-        espectro_contraonda[idx_tono_audible] += np.max(np.abs(espectro)) * 2.0 # Aumentar amplitud del tono
+        espectro_contraonda[idx_tono_audible] += np.max(np.abs(espectro)) * GANANCIA_TONO # Aumentar amplitud del tono
 
         # Visualiza los espectros para el análisis
-        self.visualizar_espectros(frecuencias, espectro, espectro_contraonda, nombre_grafico)
+        if nombre_grafico is not None:
+            if grafico_asincrono:
+                self.visualizar_espectros_en_fondo(frecuencias, espectro, espectro_contraonda, nombre_grafico)
+            else:
+                self.visualizar_espectros(frecuencias, espectro, espectro_contraonda, nombre_grafico)
         
         print("Generando la señal de la contraonda desde el espectro modificado...")
         # Aplica la Transformada Inversa para volver al dominio del tiempo
-        contraonda = irfft(espectro_contraonda, n=len(señal))
+        contraonda = contexto.irfft(espectro_contraonda)
+        if clave is not None:
+            self.cache.guardar(clave, contraonda)
         
         return contraonda
 
+    def procesador_entropico_por_bloques(self, bloques, amplitud_tono=None):
+        """
+        Procesador Entrópico en streaming (overlap-add): genera la contraonda bloque a bloque
+        con memoria constante, a partir de cualquier iterable de bloques (p. ej. encoder_por_bloques).
+        La banda de activación se amplifica con un FIR equivalente a la máscara espectral y el tono
+        se genera en el tiempo; su amplitud se estima sobre la marcha salvo que se indique
+        `amplitud_tono`. Ver procesador_bloques.py para la tolerancia frente a procesador_entropico.
+        """
+        print(f"\n[2. PROCESADOR] Generando la contraonda por bloques (banda {BANDA_ACTIVACION[0]}-{BANDA_ACTIVACION[1]} Hz)...")
+        procesador = None
+        for bloque in bloques:
+            if procesador is None:
+                procesador = ProcesadorBloques(self.tasa_muestreo, BANDA_ACTIVACION, GANANCIA_ACTIVACION,
+                                               FREQ_TONO_AUDIBLE, GANANCIA_TONO, amplitud_tono,
+                                               dtype=np.result_type(bloque.dtype, np.float32))
+            salida = procesador.procesar(bloque)
+            if salida.size:
+                yield salida
+        if procesador is not None:
+            yield procesador.finalizar()
+
     def decoder(self, señal, nombre_archivo_wav):
         """
         Decodificador: Convierte la señal procesada del campo N de vuelta
@@ -209,36 +533,44 @@ class LaboratorioN:
         wav.write(nombre_archivo_wav, self.tasa_muestreo, señal_int16)
         print("Archivo de audio guardado con éxito.")
 
+    def decoder_por_bloques(self, bloques, nombre_archivo_wav):
+        """
+        Decodificador en streaming: escribe los bloques de la contraonda en un .wav int16,
+        normalizados al pico global igual que decoder, sin tener la señal entera en memoria.
+        """
+        print(f"\n[3. DECODER] Guardando la señal procesada por bloques en \'{nombre_archivo_wav}\'...")
+        escribir_wav_por_bloques(nombre_archivo_wav, self.tasa_muestreo, bloques)
+        print("Archivo de audio guardado con éxito.")
+
     def visualizar_espectros(self, freqs, espectro_original, espectro_procesado, nombre_archivo):
         """
         Genera y guarda un gráfico comparando el espectro original y el procesado.
+        Solo se dibuja el rango visible (0-500 Hz), decimado a mínimo/máximo por píxel.
         """
         print("Generando visualización del análisis espectral...")
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
-
-        # Gráfico del espectro original
-        ax1.plot(freqs, np.abs(espectro_original))
-        ax1.set_title("Espectro de la Señal Original (Entrada)")
-        ax1.set_ylabel("Amplitud")
-        ax1.axvspan(BANDA_DEPRESION[0], BANDA_DEPRESION[1], color='blue', alpha=0.2, label=f'Banda Depresión ({BANDA_DEPRESION[0]}-{BANDA_DEPRESION[1]} Hz)')
-        ax1.axvspan(BANDA_ACTIVACION[0], BANDA_ACTIVACION[1], color='orange', alpha=0.3, label=f'Banda Activación ({BANDA_ACTIVACION[0]}-{BANDA_ACTIVACION[1]} Hz)')
-        ax1.legend()
-        ax1.grid(True, alpha=0.5)
-
-        # Gráfico del espectro de la contraonda
-        ax2.plot(freqs, np.abs(espectro_procesado))
-        ax2.set_title("Espectro de la Contraonda Espejo (Salida)")
-        ax2.set_xlabel("Frecuencia (Hz)")
-        ax2.set_ylabel("Amplitud")
-        ax2.axvspan(BANDA_ACTIVACION[0], BANDA_ACTIVACION[1], color='orange', alpha=0.3, label=f'Energía Concentrada en Activación')
-        ax2.legend()
-        ax2.grid(True, alpha=0.5)
-        
-        plt.xlim(0, 500) # Limita la vista a las frecuencias más relevantes para EEG/Audio bajo
-        plt.tight_layout()
-        plt.savefig(nombre_archivo)
+        dibujar_espectros(freqs, espectro_original, espectro_procesado, nombre_archivo,
+                          BANDA_DEPRESION, BANDA_ACTIVACION)
         print(f"Gráfico de análisis guardado como \'{nombre_archivo}\'.")
-        plt.close()
+
+    def visualizar_espectros_en_fondo(self, freqs, espectro_original, espectro_procesado, nombre_archivo):
+        """
+        Encola el gráfico de visualizar_espectros en el hilo de fondo y vuelve enseguida.
+        Solo se retiene una copia del tramo visible de los espectros, así que el llamador
+        puede reutilizar o modificar los suyos mientras se dibuja. Devuelve un Future.
+        """
+        if self.trazador is None:
+            self.trazador = TrazadorAsincrono()
+        visibles = [tramo.copy() for tramo in recortar_visible(freqs, espectro_original, espectro_procesado)]
+        print(f"Gráfico de análisis encolado para \'{nombre_archivo}\'.")
+        return self.trazador.encolar(dibujar_espectros, *visibles, nombre_archivo,
+                                     BANDA_DEPRESION, BANDA_ACTIVACION)
+
+    def esperar_graficos(self):
+        """
+        Bloquea hasta que todos los gráficos encolados estén guardados.
+        """
+        if self.trazador is not None:
+            self.trazador.esperar()
 
 # --- EJECUCIÓN DEL LABORATORIO ---
 if __name__ == "__main__":
@@ -261,6 +593,7 @@ if __name__ == "__main__":
         
         # 4. DECODER: Guardar la nueva señal
         lab.decoder(contraonda, nombre_archivo_salida)
+        lab.esperar_graficos()
         
         print(f"\n✅ Proceso completado. Escucha \'{nombre_archivo_salida}\' y revisa \'analisis_espectral_depresion.png\'.")
 
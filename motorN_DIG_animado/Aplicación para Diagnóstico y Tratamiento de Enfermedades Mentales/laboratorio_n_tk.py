@@ -2,20 +2,35 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
 import sys
+import time
 
 # Añadir el directorio del script al sys.path para imports locales
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 
-from laboratorio_n import LaboratorioN
+from laboratorio_n import LaboratorioN, TAMANO_CAMPO
 from guardar_output import guardar_resultados
+from instantanea_campo import EXTENSION_INSTANTANEA
+from trayectoria_campo import EXTENSION_TRAYECTORIA, LectorTrayectoria
+from render_campo import RenderizadorCampo
+from simulacion_fondo import SimulacionEnFondo, MedidorRitmo, Fotograma
+from metricas_campo import MotorMetricas
+from historial_metricas import HistorialMetricas, GraficoBlit
+from mapa_senal import MapeadorCampo, TAM_VENTANA_MAPA
+
+INTERVALO_UI_MS = 16          # Ritmo de refresco de la interfaz (~60 fps)
+INTERVALO_GRAFICOS_MS = 100   # Las gráficas de métricas se refrescan como mucho a este ritmo
 
 class LaboratorioNApp:
-    def __init__(self, root):
+    def __init__(self, root, grid_size=TAMANO_CAMPO, directorio_cache=None):
         self.root = root
         self.root.title("Laboratorio N - Procesamiento de Señales")
-        self.lab = LaboratorioN()
+        self.lab = LaboratorioN(grid_size=grid_size)
+        # Con una caché en disco (opcional, --cache), repetir "Analizar" sobre un archivo
+        # conocido lee el campo de la caché en lugar de recalcularlo
+        if directorio_cache:
+            self.lab.activar_cache(directorio_cache)
         self.resultados = None
 
         # --- Layout principal horizontal ---
@@ -23,11 +38,19 @@ class LaboratorioNApp:
         self.frame_principal.pack(fill=tk.BOTH, expand=True)
         # --- Canvas a la izquierda ---
         self.canvas_size = 400
-        self.grid_size = 50
-        self.cell_size = self.canvas_size // self.grid_size
+        self.grid_size = self.lab.grid_size
+        self.cell_size = max(1, self.canvas_size // self.grid_size)
         self.animando = False
+        # La simulación corre en su propio hilo; la interfaz recoge el último fotograma publicado
+        self.simulacion = SimulacionEnFondo(self.lab)
+        self.ritmo_ui = MedidorRitmo()
+        self._ultimo_grafico = 0.0
         self.canvas = tk.Canvas(self.frame_principal, width=self.canvas_size, height=self.canvas_size, bg='black')
         self.canvas.pack(side=tk.LEFT, padx=10, pady=10)
+        # El campo se dibuja como una sola imagen que se actualiza en su sitio (ver render_campo.py)
+        self.renderizador = None
+        self.imagen_campo = tk.PhotoImage(width=self.canvas_size, height=self.canvas_size)
+        self.item_imagen = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.imagen_campo)
         # --- Panel de métricas y gráfico a la derecha ---
         self.frame_metricas = tk.Frame(self.frame_principal)
         self.frame_metricas.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
@@ -37,7 +60,8 @@ class LaboratorioNApp:
         matplotlib.use('Agg')  # Evita conflictos de backend
         from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
         import matplotlib.pyplot as plt
-        self.metricas_hist = {'entropia': [], 'varianza': [], 'maximo': [], 'steps': []}
+        # Historial acotado y reducido por mínimo/máximo (ver historial_metricas.py)
+        self.historial = HistorialMetricas(('entropia', 'varianza', 'maximo'))
         # El gráfico y el label ahora están en frame_metricas (a la derecha)
         self.frame_grafico = tk.Frame(self.frame_metricas)
         self.frame_grafico.pack(pady=5)
@@ -51,8 +75,11 @@ class LaboratorioNApp:
         self.ax.legend()
         self.canvas_grafico = FigureCanvasTkAgg(self.fig, master=self.frame_grafico)
         self.canvas_grafico.get_tk_widget().pack()
+        self.grafico_metricas = GraficoBlit(self.canvas_grafico, self.ax, (self.linea_ent, self.linea_var, self.linea_max))
         self.label_metricas = tk.Label(self.frame_metricas, text="", font=("Arial", 12), pady=5)
         self.label_metricas.pack()
+        self.label_ritmos = tk.Label(self.frame_metricas, text="", font=("Arial", 9), fg="#555555")
+        self.label_ritmos.pack()
         # Box gráfico solo para la varianza
         from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
         import matplotlib.pyplot as plt
@@ -64,6 +91,7 @@ class LaboratorioNApp:
         self.ax_var.legend()
         self.canvas_varianza = FigureCanvasTkAgg(self.fig_var, master=self.frame_metricas)
         self.canvas_varianza.get_tk_widget().pack(pady=(5,10))
+        self.grafico_varianza = GraficoBlit(self.canvas_varianza, self.ax_var, (self.linea_varianza,))
 
 
         frame_controles = tk.Frame(root)
@@ -74,10 +102,14 @@ class LaboratorioNApp:
         self.btn_reset.pack(side=tk.LEFT, padx=5)
         self.btn_inyectar = tk.Button(frame_controles, text="💥 Inyectar Ansiedad", command=self.inyectar_patron_ansiedad, bg="#0a0", fg="white")
         self.btn_inyectar.pack(side=tk.LEFT, padx=5)
-        self.btn_exportar = tk.Button(frame_controles, text="⬇️ Exportar JSON", command=self.exportar_json, bg="#0080ff", fg="white")
+        self.btn_exportar = tk.Button(frame_controles, text="⬇️ Exportar estado", command=self.exportar_json, bg="#0080ff", fg="white")
         self.btn_exportar.pack(side=tk.LEFT, padx=5)
-        self.btn_importar = tk.Button(frame_controles, text="⬆️ Importar JSON", command=self.importar_json, bg="#ffbb00", fg="black")
+        self.btn_importar = tk.Button(frame_controles, text="⬆️ Importar estado", command=self.importar_json, bg="#ffbb00", fg="black")
         self.btn_importar.pack(side=tk.LEFT, padx=5)
+        self.btn_grabar = tk.Button(frame_controles, text="⏺️ Grabar", command=self.toggle_grabacion, bg="#990099", fg="white")
+        self.btn_grabar.pack(side=tk.LEFT, padx=5)
+        self.btn_trayectoria = tk.Button(frame_controles, text="🎞️ Trayectoria", command=self.abrir_trayectoria, bg="#666666", fg="white")
+        self.btn_trayectoria.pack(side=tk.LEFT, padx=5)
 
         # Widgets principales
         self.label = tk.Label(root, text="Selecciona un archivo .wav para analizar:")
@@ -103,118 +135,221 @@ class LaboratorioNApp:
 
         self.dibujar_campo()
 
-    def dibujar_campo(self):
-        self.canvas.delete("all")
-        campo = self.lab.get_campo()
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                valor = campo[i, j]
-                color = self.valor_a_color(valor)
-                x0 = j * self.cell_size
-                y0 = i * self.cell_size
-                x1 = x0 + self.cell_size
-                y1 = y0 + self.cell_size
-                self.canvas.create_rectangle(x0, y0, x1, y1, fill=color, outline="#222")
-        self.actualizar_metricas()
+    def dibujar_campo(self, fotograma=None, historial=True):
+        # Con un fotograma de la simulación se dibuja ese; si no, el estado actual del laboratorio.
+        # Con historial=False (pasos de una trayectoria) las métricas no van a las gráficas.
+        campo = fotograma.campo if fotograma is not None else self.lab.campo
+        if self.renderizador is None or not self.renderizador.admite(campo):
+            self.renderizador = RenderizadorCampo(campo.shape, self.canvas_size)
+        self.imagen_campo.configure(data=self.renderizador.ppm(campo), format='PPM',
+                                    width=self.renderizador.ancho, height=self.renderizador.alto)
+        self.actualizar_metricas(fotograma, historial)
 
     def valor_a_color(self, valor):
-        # Mapea el valor a un color tipo heatmap
-        from matplotlib import cm
-        import matplotlib.colors as mcolors
-        norm = mcolors.Normalize(vmin=0, vmax=1)
-        rgba = cm.inferno(norm(valor))
-        r, g, b, _ = [int(x*255) for x in rgba]
-        return f'#{r:02x}{g:02x}{b:02x}'
+        # Mapea el valor a un color tipo heatmap (misma tabla que la imagen del campo)
+        if self.renderizador is None:
+            self.renderizador = RenderizadorCampo(self.lab.campo.shape, self.canvas_size)
+        return self.renderizador.color(valor)
 
     def ciclo_animacion(self):
+        # Bucle de la interfaz: dibuja el último fotograma publicado, si hay uno nuevo;
+        # los que la simulación publicó entre medias se descartan.
         if not self.animando:
             return
-        self.lab.evolucionar_campo()
-        self.dibujar_campo()
-        self.root.after(60, self.ciclo_animacion)
+        if self.simulacion.error is not None:
+            error, self.simulacion.error = self.simulacion.error, None
+            self.toggle_animacion()
+            messagebox.showerror("Error en la simulación", str(error))
+            return
+        fotograma = self.simulacion.ultimo_fotograma()
+        if fotograma is not None:
+            self.dibujar_campo(fotograma)
+            self.ritmo_ui.marcar()
+        self.label_ritmos.config(
+            text=f"Simulación: {self.simulacion.ritmo_simulacion.ritmo:.0f} pasos/s    "
+                 f"Interfaz: {self.ritmo_ui.ritmo:.0f} fps    Descartados: {self.simulacion.descartados}")
+        self.root.after(INTERVALO_UI_MS, self.ciclo_animacion)
 
     def toggle_animacion(self):
         if self.animando:
             self.animando = False
+            self.simulacion.pausar()
             self.btn_play.config(text="▶️ Iniciar", bg="#ff6600")
+            self.dibujar_campo()
         else:
             self.animando = True
             self.btn_play.config(text="⏸️ Pausar", bg="#ff3300")
+            self.ritmo_ui.reiniciar()
+            self.simulacion.iniciar()
             self.ciclo_animacion()
 
     def resetear_campo(self):
         self.animando = False
+        self.simulacion.pausar()
         self.btn_play.config(text="▶️ Iniciar", bg="#ff6600")
-        self.lab.resetear_campo()
+        with self.simulacion.candado:
+            self.lab.resetear_campo()
+        self.reiniciar_graficos()
         self.dibujar_campo()
 
     def inyectar_patron_ansiedad(self):
         if hasattr(self.lab, 'inyectar_patron_ansiedad'):
-            self.lab.inyectar_patron_ansiedad()
-            self.dibujar_campo()
+            with self.simulacion.candado:
+                self.lab.inyectar_patron_ansiedad()
+            if not self.animando:
+                self.dibujar_campo()
         else:
             from tkinter import messagebox
             messagebox.showerror("No implementado", "El método inyectar_patron_ansiedad no está implementado en LaboratorioN.")
 
     def exportar_json(self):
         from tkinter import filedialog, messagebox
-        ruta = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("Archivos JSON", "*.json")])
+        ruta = filedialog.asksaveasfilename(defaultextension=EXTENSION_INSTANTANEA,
+                                            filetypes=[("Instantáneas del campo", f"*{EXTENSION_INSTANTANEA}"), ("Archivos JSON", "*.json")])
         if ruta:
             try:
-                self.lab.exportar_estado(ruta)
+                with self.simulacion.candado:
+                    self.lab.exportar_estado(ruta)
                 messagebox.showinfo("Exportación exitosa", f"Estado exportado a {ruta}")
             except Exception as e:
                 messagebox.showerror("Error al exportar", str(e))
 
     def importar_json(self):
         from tkinter import filedialog, messagebox
-        ruta = filedialog.askopenfilename(filetypes=[("Archivos JSON", "*.json")])
+        ruta = filedialog.askopenfilename(filetypes=[("Estados del campo", f"*{EXTENSION_INSTANTANEA} *.json"),
+                                                     ("Todos los archivos", "*.*")])
         if ruta:
             try:
-                self.lab.importar_estado(ruta)
-                self.dibujar_campo()
+                with self.simulacion.candado:
+                    self.lab.importar_estado(ruta)
+                self.reiniciar_graficos()
+                if not self.animando:
+                    self.dibujar_campo()
                 messagebox.showinfo("Importación exitosa", f"Estado importado de {ruta}")
             except Exception as e:
                 messagebox.showerror("Error al importar", str(e))
 
-    def actualizar_metricas(self):
-        metricas = self.lab.calcular_metricas() if hasattr(self.lab, 'calcular_metricas') else None
+    def toggle_grabacion(self):
+        from tkinter import filedialog, messagebox
+        if self.lab.grabador is None:
+            ruta = filedialog.asksaveasfilename(defaultextension=EXTENSION_TRAYECTORIA,
+                                                filetypes=[("Trayectorias del campo", f"*{EXTENSION_TRAYECTORIA}")])
+            if ruta:
+                with self.simulacion.candado:
+                    self.lab.iniciar_grabacion(ruta)
+                self.btn_grabar.config(text="⏹️ Detener", bg="#cc00cc")
+        else:
+            with self.simulacion.candado:
+                n_frames = self.lab.detener_grabacion()
+            self.btn_grabar.config(text="⏺️ Grabar", bg="#990099")
+            messagebox.showinfo("Grabación terminada", f"{n_frames} pasos grabados.")
+
+    def abrir_trayectoria(self):
+        """
+        Abre una trayectoria grabada y muestra una barra para recorrer sus pasos;
+        solo se lee del disco el bloque del paso mostrado. Los pasos se dibujan como
+        fotogramas sueltos: el campo del laboratorio no se toca.
+        """
+        from tkinter import filedialog, messagebox
+        ruta = filedialog.askopenfilename(filetypes=[("Trayectorias del campo", f"*{EXTENSION_TRAYECTORIA}")])
+        if not ruta:
+            return
+        try:
+            lector = LectorTrayectoria(ruta)
+        except Exception as e:
+            messagebox.showerror("Error al abrir la trayectoria", str(e))
+            return
+        if lector.forma != (self.grid_size, self.grid_size) or len(lector) == 0:
+            lector.cerrar()
+            messagebox.showerror("Trayectoria no compatible",
+                                 f"La trayectoria tiene forma {lector.forma} y {len(lector)} pasos; el campo es {self.grid_size}x{self.grid_size}.")
+            return
+        self.animando = False
+        self.simulacion.pausar()
+        self.btn_play.config(text="▶️ Iniciar", bg="#ff6600")
+
+        ventana = tk.Toplevel(self.root)
+        ventana.title(f"Trayectoria - {os.path.basename(ruta)}")
+        etiqueta = tk.Label(ventana, text="")
+        etiqueta.pack(padx=10, pady=(10, 0))
+
+        fotograma = Fotograma(lector.forma, self.lab.dtype)
+        motor_metricas = MotorMetricas(lector.forma)
+
+        def mostrar(valor):
+            i = int(float(valor))
+            fotograma.campo[...] = lector[i]
+            fotograma.paso = lector.paso(i)
+            motor_metricas.marcar_todo()
+            fotograma.metricas = motor_metricas.calcular(fotograma.campo)
+            etiqueta.config(text=f"Paso {fotograma.paso} ({i + 1}/{len(lector)})")
+            self.dibujar_campo(fotograma, historial=False)
+
+        def cerrar():
+            lector.cerrar()
+            ventana.destroy()
+            self.dibujar_campo()  # De vuelta al campo del laboratorio
+
+        barra = tk.Scale(ventana, from_=0, to=len(lector) - 1, orient=tk.HORIZONTAL, length=400,
+                         showvalue=False, command=mostrar)
+        barra.pack(padx=10, pady=10)
+        ventana.protocol("WM_DELETE_WINDOW", cerrar)
+        mostrar(0)
+
+    def actualizar_metricas(self, fotograma=None, historial=True):
+        if fotograma is not None:
+            metricas, paso = fotograma.metricas, fotograma.paso
+        else:
+            with self.simulacion.candado:
+                metricas = self.lab.calcular_metricas() if hasattr(self.lab, 'calcular_metricas') else None
+                paso = self.lab.pasos
         if metricas:
             texto = f"Entropía: {metricas['entropia']:.3f}    Máximo: {metricas['maximo']:.3f}"
-            # Actualiza historial de métricas
-            paso = len(self.metricas_hist['steps'])
-            self.metricas_hist['entropia'].append(metricas['entropia'])
-            self.metricas_hist['varianza'].append(metricas['varianza'])
-            self.metricas_hist['maximo'].append(metricas['maximo'])
-            self.metricas_hist['steps'].append(paso)
-            self.actualizar_grafico_metricas()
-            self.actualizar_grafico_varianza()
+            if historial:
+                # Actualiza historial de métricas; el eje X es el paso de la simulación
+                self.historial.agregar(metricas, paso)
+                # Durante la animación las gráficas se refrescan como mucho cada INTERVALO_GRAFICOS_MS
+                ahora = time.perf_counter()
+                if not self.animando or (ahora - self._ultimo_grafico) * 1000 >= INTERVALO_GRAFICOS_MS:
+                    self._ultimo_grafico = ahora
+                    self.actualizar_grafico_metricas()
+                    self.actualizar_grafico_varianza()
         else:
             texto = ""
         self.label_metricas.config(text=texto)
 
+    def reiniciar_graficos(self):
+        # El contador de pasos ha vuelto atrás (reset, importación): se empieza una serie nueva
+        self.historial.vaciar()
+        self.grafico_metricas.reiniciar_limites()
+        self.grafico_varianza.reiniciar_limites()
+
     def actualizar_grafico_varianza(self):
-        pasos = self.metricas_hist['steps']
-        self.linea_varianza.set_data(pasos, self.metricas_hist['varianza'])
-        self.ax_var.relim()
-        self.ax_var.autoscale_view()
-        self.canvas_varianza.draw()
+        pasos, series = self.historial.vista(('varianza',))
+        self.grafico_varianza.actualizar(pasos, (series['varianza'],))
 
     def actualizar_grafico_metricas(self):
-        pasos = self.metricas_hist['steps']
-        self.linea_ent.set_data(pasos, self.metricas_hist['entropia'])
-        self.linea_var.set_data(pasos, self.metricas_hist['varianza'])
-        self.linea_max.set_data(pasos, self.metricas_hist['maximo'])
-        self.ax.relim()
-        self.ax.autoscale_view()
-        self.canvas_grafico.draw()
+        pasos, series = self.historial.vista()
+        self.grafico_metricas.actualizar(pasos, (series['entropia'], series['varianza'], series['maximo']))
 
     def seleccionar_archivo(self):
-        archivo = filedialog.askopenfilename(filetypes=[("Archivos WAV, PNG o JSON", "*.wav *.png *.json"), ("Todos los archivos", "*.*")])
+        archivo = filedialog.askopenfilename(filetypes=[("Archivos WAV, EDF, PNG o JSON", "*.wav *.edf *.png *.json"), ("Todos los archivos", "*.*")])
         if archivo:
             self.archivo_var.set(archivo)
 
 
+    def campo_de_archivo(self, archivo):
+        # Campo grid_size x grid_size con toda la señal del archivo (bandas x tiempo, o canales x tiempo en EDF)
+        import numpy as np
+        forma = (self.grid_size, self.grid_size)
+        calcular = lambda: MapeadorCampo(forma).campo_archivo(archivo)
+        cache = self.lab.cache
+        if cache is None:
+            return calcular()
+        clave = cache.clave('campo', cache.huella_archivo(archivo), forma=forma, tam_ventana=TAM_VENTANA_MAPA)
+        # Copia: el campo se modifica en su sitio al evolucionar y lo guardado en caché es de solo lectura
+        return np.array(cache.memorizar(clave, calcular))
+
     def analizar(self):
         archivo = self.archivo_var.get()
         self.texto_resultado.config(state='normal')
@@ -222,16 +357,10 @@ class LaboratorioNApp:
         try:
             if archivo and os.path.isfile(archivo):
                 print(f"[1. ENCODER] Cargando señal desde '{archivo}'...")
-                resultado = self.lab.encoder(archivo)
-                # Adaptar resultado al campo si es posible
+                # El campo resume la señal entera (potencia por bandas y tiempo, ver mapa_senal.py);
+                # es también el resultado: no se vuelve a decodificar el archivo con el encoder
                 import numpy as np
-                arr = np.array(resultado)
-                if arr.size >= self.grid_size * self.grid_size:
-                    arr = arr[:self.grid_size * self.grid_size]
-                else:
-                    arr = np.pad(arr, (0, self.grid_size * self.grid_size - arr.size), mode='constant')
-                arr = arr.reshape((self.grid_size, self.grid_size))
-                arr = (arr - arr.min()) / (arr.max() - arr.min() + 1e-8)  # normaliza a [0,1]
+                arr = self.campo_de_archivo(archivo)
                 # Diagnóstico: chequeo de campo plano
                 if np.allclose(arr, arr.flat[0]):
                     messagebox.showwarning("Advertencia de campo plano", "Todos los valores del campo son iguales tras cargar el archivo. Puede que la imagen PNG sea completamente negra/blanca o que la normalización no tenga contraste.")
@@ -243,21 +372,24 @@ class LaboratorioNApp:
                     plt.xlabel("Valor")
                     plt.ylabel("Frecuencia")
                     plt.show()
-                self.lab.campo = arr
+                with self.simulacion.candado:
+                    self.lab.campo = arr
                 self.dibujar_campo()
-                self.resultados = resultado
+                self.resultados = arr
                 # Mostrar tipo de archivo procesado
-                if archivo.lower().endswith('.wav'):
-                    self.texto_resultado.insert(tk.END, f"[Archivo .wav] Resultado del encoder:\n{resultado}")
+                if archivo.lower().endswith(('.wav', '.edf')):
+                    self.texto_resultado.insert(tk.END, f"[Archivo {archivo[-4:].lower()}] Campo de la señal (bandas x tiempo):\n{arr}")
                 elif archivo.lower().endswith('.png'):
-                    self.texto_resultado.insert(tk.END, f"[Archivo .png] Resultado del encoder (imagen espectral):\n{resultado}")
+                    self.texto_resultado.insert(tk.END, f"[Archivo .png] Campo de la imagen espectral:\n{arr}")
                 else:
-                    self.texto_resultado.insert(tk.END, f"[Archivo] Resultado del encoder:\n{resultado}")
+                    self.texto_resultado.insert(tk.END, f"[Archivo] Campo del archivo:\n{arr}")
             else:
                 # Procesar el campo actual del autómata
                 print("[2. PROCESADOR] Analizando el campo actual del autómata...")
-                campo = self.lab.get_campo().flatten()
-                resultado = self.lab.procesador_entropico(campo)
+                with self.simulacion.candado:
+                    campo = self.lab.get_campo().flatten()
+                # El gráfico espectral se dibuja en segundo plano para no congelar la interfaz
+                resultado = self.lab.procesador_entropico(campo, grafico_asincrono=True)
                 self.resultados = resultado
                 self.texto_resultado.insert(tk.END, "[Campo Motor-N] Resultado del procesador_entropico (contraonda generada):\n")
                 self.texto_resultado.insert(tk.END, str(resultado))
@@ -275,7 +407,7 @@ class LaboratorioNApp:
         import matplotlib.pyplot as plt
         archivos = filedialog.askopenfilenames(
             title="Selecciona dos archivos para comparar\n(Si no puedes seleccionar dos archivos, mantén pulsada la tecla Ctrl (Windows/Linux) o Cmd (Mac) mientras seleccionas)",
-            filetypes=[("Archivos WAV, PNG o JSON", "*.wav *.png *.json"), ("Todos los archivos", "*.*")]
+            filetypes=[("Archivos WAV, EDF, PNG o JSON", "*.wav *.edf *.png *.json"), ("Todos los archivos", "*.*")]
         )
         if len(archivos) != 2:
             messagebox.showwarning(
@@ -283,19 +415,8 @@ class LaboratorioNApp:
                 "Debes seleccionar exactamente dos archivos.\n\nSi no puedes seleccionar dos archivos, mantén pulsada la tecla Ctrl (Windows/Linux) o Cmd (Mac) mientras seleccionas."
             )
             return
-        resultados = []
-        campos = []
-        for archivo in archivos:
-            resultado = self.lab.encoder(archivo)
-            arr = np.array(resultado)
-            if arr.size >= self.grid_size * self.grid_size:
-                arr = arr[:self.grid_size * self.grid_size]
-            else:
-                arr = np.pad(arr, (0, self.grid_size * self.grid_size - arr.size), mode='constant')
-            arr = arr.reshape((self.grid_size, self.grid_size))
-            arr = (arr - arr.min()) / (arr.max() - arr.min() + 1e-8)
-            campos.append(arr)
-            resultados.append(resultado)
+        # Solo hacen falta los campos: el mapeador ya lee cada archivo una vez (o sale de la caché)
+        campos = [self.campo_de_archivo(archivo) for archivo in archivos]
         # Mostrar ambos campos en ventanas emergentes usando matplotlib
         # Mostrar ambos campos y su diferencia en ventanas emergentes usando matplotlib
         import numpy as np
@@ -324,12 +445,14 @@ class LaboratorioNApp:
             "1: {}\n2: {}\n3: Diferencia (Campo 1 - Campo 2)".format(os.path.basename(archivos[0]), os.path.basename(archivos[1])),
             minvalue=1, maxvalue=3)
         if opcion in [1, 2]:
-            self.lab.campo = campos[opcion-1]
+            with self.simulacion.candado:
+                self.lab.campo = campos[opcion-1]
             self.dibujar_campo()
         elif opcion == 3:
             # Normalizar diferencia a [0,1] para visualización en el canvas
             diff_norm = (diff - diff.min()) / (diff.max() - diff.min() + 1e-8)
-            self.lab.campo = diff_norm
+            with self.simulacion.candado:
+                self.lab.campo = diff_norm
             self.dibujar_campo()
         else:
             messagebox.showinfo("Visualización", "No se seleccionó ningún campo para visualizar.")
@@ -340,6 +463,12 @@ class LaboratorioNApp:
             messagebox.showinfo("Guardado", "Resultados guardados exitosamente.")
 
 if __name__ == "__main__":
+    # Tamaño del campo opcional como primer argumento: python laboratorio_n_tk.py 128 [--cache DIR]
+    import argparse
+    parser = argparse.ArgumentParser(description="Laboratorio N con interfaz gráfica.")
+    parser.add_argument("grid_size", nargs="?", type=int, default=TAMANO_CAMPO, help="lado del campo")
+    parser.add_argument("--cache", default=None, help="directorio de la caché de resultados (por defecto, sin caché)")
+    args = parser.parse_args()
     root = tk.Tk()
-    app = LaboratorioNApp(root)
+    app = LaboratorioNApp(root, grid_size=args.grid_size, directorio_cache=args.cache)
     root.mainloop()
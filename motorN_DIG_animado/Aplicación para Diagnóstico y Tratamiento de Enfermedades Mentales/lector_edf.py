@@ -0,0 +1,326 @@
+import math
+import os
+import numpy as np
+
+# --- LECTOR DE EDF / EDF+ ---
+# Lee registros EEG en formato EDF (European Data Format) y EDF+ sin cargarlos
+# enteros: se interpreta la cabecera ASCII y los registros de datos (int16
+# little-endian) se mapean en memoria con np.memmap. Cada lectura copia solo las
+# muestras pedidas y las pasa a unidades físicas con la ganancia y el
+# desplazamiento de su canal:
+#
+#   físico = (digital - digital_min) * (fisico_max - fisico_min) / (digital_max - digital_min) + fisico_min
+#
+# Estructura del archivo: cabecera fija de 256 bytes, 256 bytes por canal
+# (campos guardados canal tras canal, ver CAMPOS_CANAL) y después los registros.
+# Cada registro dura `duracion_registro` segundos y contiene, seguidas, las
+# muestras de cada canal (cada uno con su propio número por registro, así que los
+# canales pueden tener tasas distintas).
+#
+# En EDF+ el canal "EDF Annotations" no es una señal: guarda listas de
+# anotaciones con tiempo (TAL) y el instante de inicio de cada registro, que en
+# EDF+D (discontinuo) puede no ser consecutivo. `escribir_edf` genera archivos
+# de prueba en el mismo formato.
+
+TAM_CABECERA = 256
+ETIQUETA_ANOTACIONES = "EDF Annotations"
+DTYPE_EDF = np.dtype('<i2')
+
+# (nombre, bytes) de los campos de la cabecera fija, en orden
+CAMPOS_CABECERA = (('version', 8), ('paciente', 80), ('registro', 80), ('fecha', 8), ('hora', 8),
+                   ('bytes_cabecera', 8), ('reservado', 44), ('n_registros', 8),
+                   ('duracion_registro', 8), ('n_canales', 4))
+# (nombre, bytes) de los campos de cada canal; cada campo aparece para todos los canales seguidos
+CAMPOS_CANAL = (('etiqueta', 16), ('transductor', 80), ('unidad', 8), ('fisico_min', 8),
+                ('fisico_max', 8), ('digital_min', 8), ('digital_max', 8), ('prefiltro', 80),
+                ('muestras_por_registro', 8), ('reservado', 32))
+
+
+class CanalEDF:
+    """
+    Descripción de un canal y su conversión de digital a unidades físicas.
+    """
+    def __init__(self, etiqueta, transductor, unidad, fisico_min, fisico_max, digital_min,
+                 digital_max, prefiltro, muestras_por_registro, columna, duracion_registro):
+        self.etiqueta = etiqueta
+        self.transductor = transductor
+        self.unidad = unidad
+        self.fisico_min, self.fisico_max = float(fisico_min), float(fisico_max)
+        self.digital_min, self.digital_max = int(digital_min), int(digital_max)
+        self.prefiltro = prefiltro
+        self.muestras_por_registro = int(muestras_por_registro)
+        self.columna = columna  # Primera muestra del canal dentro de cada registro
+        self.tasa = self.muestras_por_registro / duracion_registro if duracion_registro > 0 else 0.0
+        if self.digital_max == self.digital_min:
+            raise ValueError(f"Canal '{etiqueta}': digital_min y digital_max son iguales")
+        self.ganancia = (self.fisico_max - self.fisico_min) / (self.digital_max - self.digital_min)
+        self.desplazamiento = self.fisico_min - self.digital_min * self.ganancia
+
+    @property
+    def es_anotacion(self):
+        return self.etiqueta == ETIQUETA_ANOTACIONES
+
+    @property
+    def pico_fisico(self):
+        """
+        Mayor valor absoluto representable: sirve para normalizar sin recorrer la señal.
+        """
+        return max(abs(self.fisico_min), abs(self.fisico_max))
+
+    def __repr__(self):
+        return f"CanalEDF({self.etiqueta!r}, {self.tasa:g} Hz, {self.unidad!r})"
+
+
+def _leer_campos(bloque, campos, n=None):
+    # Corta `bloque` en los campos ASCII indicados. Con `n`, cada campo está repetido
+    # n veces seguidas (uno por canal) y se devuelve la lista.
+    valores, posicion = {}, 0
+    for nombre, ancho in campos:
+        trozos = [bloque[posicion + i * ancho:posicion + (i + 1) * ancho].decode('latin-1').strip()
+                  for i in range(n or 1)]
+        valores[nombre] = trozos if n is not None else trozos[0]
+        posicion += ancho * (n or 1)
+    return valores
+
+
+def _texto_numero(valor, ancho=8, redondeo=None):
+    # Número con el máximo de decimales que quepa en `ancho` caracteres; `redondeo`
+    # (math.floor / math.ceil) fija el sentido para que el rango físico no se estreche.
+    for decimales in range(ancho - 2, -1, -1):
+        escala = 10 ** decimales
+        v = valor if redondeo is None else redondeo(valor * escala) / escala
+        texto = f"{v:.{decimales}f}"
+        if len(texto) <= ancho:
+            return texto
+    raise ValueError(f"{valor} no cabe en {ancho} caracteres")
+
+
+class LectorEDF:
+    """
+    Acceso perezoso a un archivo EDF/EDF+. `lector.señales` son los canales de
+    datos (sin el de anotaciones); `leer` y `ventanas` devuelven float32 en
+    unidades físicas. Usar como gestor de contexto o llamar a `cerrar`.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            fija = f.read(TAM_CABECERA)
+            if len(fija) < TAM_CABECERA or not fija[:8].strip().isdigit():
+                raise ValueError(f"'{ruta}' no es un archivo EDF")
+            cabecera = _leer_campos(fija, CAMPOS_CABECERA)
+            n_canales = int(cabecera['n_canales'])
+            por_canal = _leer_campos(f.read(TAM_CABECERA * n_canales), CAMPOS_CANAL, n_canales)
+
+        self.paciente = cabecera['paciente']
+        self.registro = cabecera['registro']
+        self.fecha, self.hora = cabecera['fecha'], cabecera['hora']
+        self.bytes_cabecera = int(cabecera['bytes_cabecera'])
+        self.reservado = cabecera['reservado']
+        self.es_edf_plus = self.reservado.startswith('EDF+')
+        self.discontinuo = self.reservado.startswith('EDF+D')
+        self.duracion_registro = float(cabecera['duracion_registro'])
+
+        self.canales = []
+        columna = 0
+        for i in range(n_canales):
+            canal = CanalEDF(*(por_canal[nombre][i] for nombre, _ in CAMPOS_CANAL[:-1]),
+                             columna=columna, duracion_registro=self.duracion_registro)
+            self.canales.append(canal)
+            columna += canal.muestras_por_registro
+        self.muestras_por_registro = columna
+        self.señales = [canal for canal in self.canales if not canal.es_anotacion]
+
+        # n_registros = -1 mientras se graba: se deduce del tamaño (sin el registro a medias)
+        bytes_registro = self.muestras_por_registro * DTYPE_EDF.itemsize
+        disponibles = (os.path.getsize(ruta) - self.bytes_cabecera) // bytes_registro
+        declarados = int(cabecera['n_registros'])
+        self.n_registros = disponibles if declarados < 0 else min(declarados, disponibles)
+        if self.n_registros > 0:
+            self._datos = np.memmap(ruta, dtype=DTYPE_EDF, mode='r', offset=self.bytes_cabecera,
+                                    shape=(self.n_registros, self.muestras_por_registro))
+        else:
+            self._datos = np.zeros((0, self.muestras_por_registro), dtype=DTYPE_EDF)
+
+    @property
+    def duracion(self):
+        """
+        Segundos grabados (suma de registros; en EDF+D puede haber huecos entre ellos).
+        """
+        return self.n_registros * self.duracion_registro
+
+    def canal(self, canal):
+        """
+        CanalEDF por etiqueta, por índice dentro de `señales` o el propio CanalEDF.
+        """
+        if isinstance(canal, CanalEDF):
+            return canal
+        if isinstance(canal, str):
+            for c in self.canales:
+                if c.etiqueta == canal:
+                    return c
+            raise KeyError(f"No hay canal '{canal}' en '{self.ruta}'")
+        return self.señales[canal]
+
+    def n_muestras(self, canal):
+        return self.n_registros * self.canal(canal).muestras_por_registro
+
+    def digital(self, canal, inicio=0, fin=None):
+        """
+        Muestras int16 [inicio, fin) del canal, tal como están en el archivo.
+        """
+        canal = self.canal(canal)
+        n = canal.muestras_por_registro
+        total = self.n_registros * n
+        fin = total if fin is None else min(fin, total)
+        inicio = max(0, inicio)
+        if fin <= inicio:
+            return np.empty(0, dtype=DTYPE_EDF)
+        r0, r1 = inicio // n, -(-fin // n)
+        # Solo se tocan los registros [r0, r1); la copia contigua une sus trozos del canal
+        trozo = np.ascontiguousarray(self._datos[r0:r1, canal.columna:canal.columna + n]).ravel()
+        return trozo[inicio - r0 * n:fin - r0 * n]
+
+    def leer(self, canal, inicio=0, fin=None):
+        """
+        Muestras [inicio, fin) del canal en unidades físicas (float32).
+        """
+        canal = self.canal(canal)
+        muestras = self.digital(canal, inicio, fin).astype(np.float32)
+        muestras *= np.float32(canal.ganancia)
+        muestras += np.float32(canal.desplazamiento)
+        return muestras
+
+    def leer_segundos(self, canal, inicio, duracion):
+        """
+        Como `leer`, con el intervalo en segundos desde el inicio del archivo.
+        """
+        canal = self.canal(canal)
+        return self.leer(canal, int(round(inicio * canal.tasa)), int(round((inicio + duracion) * canal.tasa)))
+
+    def ventanas(self, canales=None, segundos=1.0, salto=None, completas=True):
+        """
+        Recorre la grabación por ventanas de `segundos` (avanzando `salto`, por
+        defecto sin solape). Para cada ventana genera (canal, t_inicio, muestras)
+        de cada canal pedido; solo hay en memoria la ventana actual.
+        Las ventanas se cuentan sobre las muestras grabadas; en EDF+D `t_inicio` es el
+        instante real de la primera muestra (según `inicios_registros`), y una ventana
+        que cruza un hueco une las muestras de ambos lados.
+        """
+        canales = [self.canal(c) for c in (self.señales if canales is None else canales)]
+        salto = segundos if salto is None else salto
+        inicios = self.inicios_registros() if self.discontinuo else None
+        t = 0.0
+        while t + (segundos if completas else 0.0) <= self.duracion + 1e-9 and t < self.duracion:
+            for canal in canales:
+                inicio = int(round(t * canal.tasa))
+                t_inicio = t
+                if inicios is not None:
+                    registro = min(inicio // canal.muestras_por_registro, self.n_registros - 1)
+                    t_inicio = float(inicios[registro]) + (inicio - registro * canal.muestras_por_registro) / canal.tasa
+                yield canal, t_inicio, self.leer(canal, inicio, inicio + int(round(segundos * canal.tasa)))
+            t += salto
+
+    def anotaciones(self):
+        """
+        Anotaciones EDF+ como lista de (inicio_s, duracion_s o None, texto). Las
+        marcas de tiempo de cada registro (TAL sin texto) no se incluyen; ver
+        `inicios_registros`.
+        """
+        return [a for a in self._recorrer_tal() if a[2]]
+
+    def inicios_registros(self):
+        """
+        Instante de inicio (s) de cada registro. En EDF+ sale de la primera TAL de cada
+        registro; en EDF y EDF+C sin anotaciones, de la duración de los registros.
+        """
+        canal = next((c for c in self.canales if c.es_anotacion), None)
+        if canal is None:
+            return np.arange(self.n_registros) * self.duracion_registro
+        inicios = np.empty(self.n_registros)
+        for i in range(self.n_registros):
+            texto = self._datos[i, canal.columna:canal.columna + canal.muestras_por_registro].tobytes()
+            inicios[i] = float(texto.split(b'\x14', 1)[0].decode('latin-1'))
+        return inicios
+
+    def _recorrer_tal(self):
+        canal = next((c for c in self.canales if c.es_anotacion), None)
+        if canal is None:
+            return
+        for i in range(self.n_registros):
+            texto = self._datos[i, canal.columna:canal.columna + canal.muestras_por_registro].tobytes()
+            for tal in texto.split(b'\x00'):
+                if not tal:
+                    continue
+                partes = tal.split(b'\x14')
+                tiempo, _, duracion = partes[0].decode('latin-1').partition('\x15')
+                for nota in partes[1:] or [b'']:
+                    yield float(tiempo), float(duracion) if duracion else None, nota.decode('utf-8')
+
+    def cerrar(self):
+        self._datos = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def escribir_edf(ruta, señales, tasas, etiquetas=None, unidad="uV", duracion_registro=1.0,
+                 rango_fisico=None, anotaciones=None, paciente="X X X X", registro="Startdate X X X X"):
+    """
+    Escribe un EDF (o EDF+C si hay `anotaciones`) de prueba. `señales` es una lista de
+    arrays 1D en unidades físicas y `tasas` sus tasas de muestreo (Hz); cada canal se
+    recorta a registros completos. `rango_fisico` (min, max) por defecto se ajusta a
+    cada señal. `anotaciones`: lista de (inicio_s, duracion_s o None, texto).
+    """
+    etiquetas = etiquetas or [f"EEG {i + 1}" for i in range(len(señales))]
+    por_registro = [int(round(tasa * duracion_registro)) for tasa in tasas]
+    n_registros = min(len(s) // n for s, n in zip(señales, por_registro))
+    digital_min, digital_max = -32768, 32767
+
+    canales, bloques = [], []
+    for señal, n, etiqueta in zip(señales, por_registro, etiquetas):
+        señal = np.asarray(señal, dtype=np.float64)[:n_registros * n]
+        fmin, fmax = rango_fisico or (float(señal.min()), float(señal.max()))
+        if fmax <= fmin:
+            fmax = fmin + 1.0
+        fmin = float(_texto_numero(fmin, redondeo=math.floor))
+        fmax = float(_texto_numero(fmax, redondeo=math.ceil))
+        escala = (digital_max - digital_min) / (fmax - fmin)
+        digital = np.clip(np.rint((señal - fmin) * escala + digital_min), digital_min, digital_max)
+        canales.append((etiqueta, "", unidad, fmin, fmax, digital_min, digital_max, "", n))
+        bloques.append(digital.astype(DTYPE_EDF).reshape(n_registros, n))
+
+    if anotaciones is not None:
+        # Cada registro lleva su TAL de tiempo; las anotaciones van en el registro en que empiezan
+        tals = [[f"+{i * duracion_registro:g}\x14\x14\x00".encode('latin-1')] for i in range(n_registros)]
+        for inicio, duracion, texto in anotaciones:
+            i = min(int(inicio // duracion_registro), n_registros - 1)
+            tiempo = f"+{inicio:g}" + (f"\x15{duracion:g}" if duracion is not None else "")
+            tals[i].append(tiempo.encode('latin-1') + b'\x14' + texto.encode('utf-8') + b'\x14\x00')
+        n_bytes = max(len(b''.join(t)) for t in tals)
+        n = -(-n_bytes // 2)
+        bloque = np.zeros((n_registros, n * 2), dtype=np.uint8)
+        for i, t in enumerate(tals):
+            datos = b''.join(t)
+            bloque[i, :len(datos)] = np.frombuffer(datos, dtype=np.uint8)
+        canales.append((ETIQUETA_ANOTACIONES, "", "", -1, 1, digital_min, digital_max, "", n))
+        bloques.append(bloque.view(DTYPE_EDF))
+
+    def campo(valor, ancho):
+        texto = _texto_numero(valor, ancho) if isinstance(valor, float) else str(valor)
+        return texto[:ancho].ljust(ancho).encode('latin-1')
+
+    n_canales = len(canales)
+    cabecera = b''.join((
+        campo(0, 8), campo(paciente, 80), campo(registro, 80), campo("01.01.00", 8), campo("00.00.00", 8),
+        campo(TAM_CABECERA * (n_canales + 1), 8), campo("EDF+C" if anotaciones is not None else "", 44),
+        campo(n_registros, 8), campo(float(duracion_registro), 8), campo(n_canales, 4)))
+    for k, (_, ancho) in enumerate(CAMPOS_CANAL):
+        cabecera += b''.join(campo(c[k] if k < len(c) else "", ancho) for c in canales)
+
+    with open(ruta, 'wb') as f:
+        f.write(cabecera)
+        f.write(np.concatenate(bloques, axis=1).astype(DTYPE_EDF, copy=False).tobytes())
+    return ruta
@@ -0,0 +1,260 @@
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from flujo_wav import abrir_wav, bloque_mono
+from lector_edf import LectorEDF
+
+# --- DE SEÑAL A CAMPO 2D ---
+# Antes, el resultado 1D del encoder se recortaba (o rellenaba con ceros) a
+# grid_size² muestras: de un WAV de 5 s solo quedaban las primeras 2.500 muestras
+# (57 ms). Aquí la señal entera se resume en potencia por bandas:
+#
+# - La grabación se divide en `columnas` franjas de tiempo consecutivas. Dentro de
+#   cada franja se toman ventanas de TAM_VENTANA_MAPA muestras (con ventana de
+#   Hann, avanzando `salto`), se calcula su espectro de potencia y se promedia.
+# - Las bandas de frecuencia se reparten en escala logarítmica entre la
+#   resolución de la ventana y Nyquist. Cada celda es log10 de la potencia media
+#   de una banda en una franja, y el campo se reescala a [0, 1].
+#
+# Todas las ventanas de un lote de franjas se extraen como vistas con
+# sliding_window_view y se transforman con una sola rfft. La señal se lee por
+# lotes de MUESTRAS_POR_LOTE, así que el coste es lineal en la duración y la
+# memoria no depende de ella.
+#
+# Disposiciones de varios canales (EDF):
+# - DISPOSICION_CANALES: filas = canales x bandas, columnas = tiempo.
+# - DISPOSICION_ELECTRODOS: mapa topográfico del sistema 10-20. Cada electrodo
+#   conocido aporta su potencia media en `banda_electrodos` en toda la
+#   grabación, interpolada al resto de la cabeza por distancia inversa.
+
+TAM_VENTANA_MAPA = 1024        # Muestras por ventana de FFT (se reduce si la señal es más corta)
+MUESTRAS_POR_LOTE = 1 << 21    # Muestras leídas y transformadas a la vez
+BANDA_ALFA = (8.0, 13.0)       # Hz, banda por defecto del mapa de electrodos
+POTENCIA_IDW = 2               # Exponente de la interpolación por distancia inversa
+
+DISPOSICION_CANALES = 'canales'
+DISPOSICION_ELECTRODOS = 'electrodos'
+
+# Posiciones (x, y) del sistema 10-20 sobre el círculo unidad (x: derecha, y: frente)
+POSICIONES_10_20 = {
+    'FP1': (-0.31, 0.95), 'FP2': (0.31, 0.95),
+    'F7': (-0.81, 0.59), 'F3': (-0.41, 0.55), 'FZ': (0.0, 0.5), 'F4': (0.41, 0.55), 'F8': (0.81, 0.59),
+    'T3': (-1.0, 0.0), 'C3': (-0.5, 0.0), 'CZ': (0.0, 0.0), 'C4': (0.5, 0.0), 'T4': (1.0, 0.0),
+    'T5': (-0.81, -0.59), 'P3': (-0.41, -0.55), 'PZ': (0.0, -0.5), 'P4': (0.41, -0.55), 'T6': (0.81, -0.59),
+    'O1': (-0.31, -0.95), 'O2': (0.31, -0.95),
+}
+# Nombres modernos de los mismos electrodos
+POSICIONES_10_20.update({'T7': POSICIONES_10_20['T3'], 'T8': POSICIONES_10_20['T4'],
+                         'P7': POSICIONES_10_20['T5'], 'P8': POSICIONES_10_20['T6']})
+
+
+def nombre_electrodo(etiqueta):
+    """
+    Normaliza una etiqueta de canal ('EEG Fp1-REF', 'FP1-LE'...) a la clave de POSICIONES_10_20.
+    """
+    nombre = etiqueta.upper().replace('EEG', '').strip()
+    return nombre.split('-')[0].strip()
+
+
+def bordes_bandas(n_bins, n_bandas):
+    """
+    Bordes (índices de bin de rfft) de `n_bandas` bandas logarítmicas entre el bin 1
+    y el último, con al menos un bin por banda. El bin 0 (continua) queda fuera.
+    """
+    if n_bins - 1 < n_bandas:
+        raise ValueError(f"La ventana da {n_bins - 1} bins útiles, menos que las {n_bandas} bandas pedidas")
+    base = np.round(np.geomspace(1, n_bins, n_bandas + 1)).astype(np.int64)
+    k = np.arange(n_bandas + 1)
+    # Bordes estrictamente crecientes (las bandas bajas pueden caer en el mismo bin)
+    bordes = np.maximum.accumulate(base - k) + k
+    return np.minimum(bordes, n_bins)
+
+
+def inicios_ventanas(inicios_franjas, longitudes, tam_ventana, salto):
+    """
+    Inicio de cada ventana y franja a la que pertenece. Una franja más corta que la
+    ventana aporta una única ventana desde su inicio.
+    """
+    cuantas = np.maximum(1, (longitudes - tam_ventana) // salto + 1)
+    franja = np.repeat(np.arange(len(cuantas)), cuantas)
+    dentro = np.arange(cuantas.sum()) - np.repeat(np.cumsum(cuantas) - cuantas, cuantas)
+    return inicios_franjas[franja] + dentro * salto, cuantas
+
+
+def potencia_por_franjas(leer, n_muestras, columnas, bordes, tam_ventana, salto=None):
+    """
+    Potencia media por banda (filas) y franja de tiempo (columnas) de una señal.
+    `leer(inicio, fin)` devuelve las muestras mono float32 de ese intervalo (puede
+    devolver menos al final); se llama por lotes, nunca para la señal entera.
+    """
+    salto = salto or tam_ventana
+    limites = np.round(np.linspace(0, n_muestras, columnas + 1)).astype(np.int64)
+    inicios, cuantas = inicios_ventanas(limites[:-1], np.diff(limites), tam_ventana, salto)
+    ventana_hann = np.hanning(tam_ventana).astype(np.float32)
+    resultado = np.empty((len(bordes) - 1, columnas))
+
+    # Lotes de franjas consecutivas con unas MUESTRAS_POR_LOTE muestras de ventanas
+    por_lote = max(1, MUESTRAS_POR_LOTE // tam_ventana)
+    fin_ventanas = np.cumsum(cuantas)
+    j0 = 0
+    while j0 < columnas:
+        j1 = int(np.searchsorted(fin_ventanas, fin_ventanas[j0] - cuantas[j0] + por_lote, side='right'))
+        j1 = min(max(j1, j0 + 1), columnas)
+        v0, v1 = fin_ventanas[j0] - cuantas[j0], fin_ventanas[j1 - 1]
+        base = inicios[v0]
+        necesario = inicios[v1 - 1] + tam_ventana - base
+        bloque = np.zeros(necesario, dtype=np.float32)
+        leido = leer(base, min(base + necesario, n_muestras))
+        bloque[:len(leido)] = leido  # Más allá del final de la señal, ceros
+
+        ventanas = sliding_window_view(bloque, tam_ventana)[inicios[v0:v1] - base] * ventana_hann
+        potencia = np.abs(np.fft.rfft(ventanas, axis=1)) ** 2
+        por_banda = np.add.reduceat(potencia, bordes[:-1], axis=1)[:, :len(bordes) - 1]
+        # Solo hasta el último borde: reduceat sumaría el resto en la última banda
+        por_banda[:, -1] -= potencia[:, bordes[-1]:].sum(axis=1)
+        sumas = np.add.reduceat(por_banda, (fin_ventanas[j0:j1] - cuantas[j0:j1]) - v0, axis=0)
+        resultado[:, j0:j1] = (sumas / cuantas[j0:j1, None]).T
+        j0 = j1
+    return resultado
+
+
+def a_unidad(potencia):
+    """
+    log10 de la potencia reescalado a [0, 1] (como la normalización min-max de antes).
+    """
+    logp = np.log10(potencia + np.finfo(np.float64).tiny)
+    return (logp - logp.min()) / (logp.max() - logp.min() + 1e-8)
+
+
+def reescalar_filas(matriz, filas):
+    """
+    Lleva la matriz a `filas` filas por vecino más próximo (repite o salta filas).
+    """
+    return matriz[(np.arange(filas) * matriz.shape[0]) // filas]
+
+
+def reescalar_imagen(imagen, forma):
+    """
+    Reduce (promedio por bloques) o amplía (vecino más próximo) una imagen 2D a `forma`.
+    """
+    filas = np.round(np.linspace(0, imagen.shape[0], forma[0] + 1)).astype(np.int64)
+    cols = np.round(np.linspace(0, imagen.shape[1], forma[1] + 1)).astype(np.int64)
+    if imagen.shape[0] >= forma[0] and imagen.shape[1] >= forma[1]:
+        sumas = np.add.reduceat(np.add.reduceat(imagen, filas[:-1], axis=0), cols[:-1], axis=1)
+        return sumas / np.outer(np.diff(filas), np.diff(cols))
+    indices_f = (np.arange(forma[0]) * imagen.shape[0]) // forma[0]
+    indices_c = (np.arange(forma[1]) * imagen.shape[1]) // forma[1]
+    return imagen[np.ix_(indices_f, indices_c)]
+
+
+class MapeadorCampo:
+    """
+    Convierte señales (mono o multicanal) y archivos en campos de `forma` (filas, columnas).
+    """
+    def __init__(self, forma, tam_ventana=TAM_VENTANA_MAPA, salto=None, disposicion=DISPOSICION_CANALES,
+                 banda_electrodos=BANDA_ALFA):
+        self.forma = tuple(forma)
+        self.tam_ventana = int(tam_ventana)
+        self.salto = salto
+        self.disposicion = disposicion
+        self.banda_electrodos = banda_electrodos
+
+    def _ventana_para(self, n_muestras, n_bandas):
+        # Ventana par que no supere la señal ni dé menos bins que bandas
+        tam = min(self.tam_ventana, max(n_muestras, 2))
+        return max(tam - tam % 2, 2 * n_bandas + 2)
+
+    def potencia(self, leer, n_muestras, n_bandas):
+        """
+        Matriz (n_bandas, columnas) de potencia media, de la banda más alta a la más baja.
+        """
+        tam = self._ventana_para(n_muestras, n_bandas)
+        bordes = bordes_bandas(tam // 2 + 1, n_bandas)
+        salto = self.salto or tam
+        return potencia_por_franjas(leer, n_muestras, self.forma[1], bordes, tam, salto)[::-1]
+
+    def campo_señal(self, señal):
+        """
+        Campo de una señal 1D (array o memmap): bandas x tiempo.
+        """
+        señal = np.asarray(señal)
+        return a_unidad(self.potencia(lambda i, f: señal[i:f].astype(np.float32), len(señal), self.forma[0]))
+
+    def campo_canales(self, canales):
+        """
+        Campo de varios canales, cada uno como (leer, n_muestras); filas = canales x bandas.
+        """
+        bandas = max(1, self.forma[0] // len(canales))
+        bloques = [self.potencia(leer, n, bandas) for leer, n in canales]
+        return a_unidad(reescalar_filas(np.concatenate(bloques, axis=0), self.forma[0]))
+
+    def campo_electrodos(self, lector):
+        """
+        Mapa topográfico 10-20 de la potencia en `banda_electrodos` de un LectorEDF.
+        """
+        valores, posiciones = [], []
+        for canal in lector.señales:
+            posicion = POSICIONES_10_20.get(nombre_electrodo(canal.etiqueta))
+            if posicion is None:
+                continue
+            tam = self._ventana_para(lector.n_muestras(canal), 1)
+            bins = np.fft.rfftfreq(tam, 1.0 / canal.tasa)
+            bordes = np.searchsorted(bins, self.banda_electrodos)
+            if bordes[1] <= bordes[0]:
+                bordes[1] = bordes[0] + 1
+            potencia = potencia_por_franjas(lambda i, f, c=canal: lector.leer(c, i, f),
+                                            lector.n_muestras(canal), 1, bordes, tam, self.salto or tam)
+            valores.append(np.log10(potencia[0, 0] + np.finfo(np.float64).tiny))
+            posiciones.append(posicion)
+        if not valores:
+            raise ValueError("Ningún canal tiene una etiqueta del sistema 10-20")
+
+        filas, cols = self.forma
+        y, x = np.mgrid[0:filas, 0:cols]
+        x = (x + 0.5) / cols * 2 - 1
+        y = 1 - (y + 0.5) / filas * 2
+        posiciones, valores = np.array(posiciones), np.array(valores)
+        distancias = np.hypot(x[..., None] - posiciones[:, 0], y[..., None] - posiciones[:, 1])
+        pesos = 1.0 / np.maximum(distancias, 1e-6) ** POTENCIA_IDW
+        mapa = (pesos * valores).sum(axis=-1) / pesos.sum(axis=-1)
+        mapa = (mapa - valores.min()) / (valores.max() - valores.min() + 1e-8)
+        mapa[np.hypot(x, y) > 1.0] = 0.0  # Fuera de la cabeza
+        return np.clip(mapa, 0.0, 1.0)
+
+    def campo_edf(self, ruta):
+        with LectorEDF(ruta) as lector:
+            if self.disposicion == DISPOSICION_ELECTRODOS:
+                return self.campo_electrodos(lector)
+            return self.campo_canales([(lambda i, f, c=canal: lector.leer(c, i, f), lector.n_muestras(canal))
+                                       for canal in lector.señales])
+
+    def campo_wav(self, ruta):
+        _, datos = abrir_wav(ruta)  # Mapeado en memoria: solo se leen los lotes
+        return a_unidad(self.potencia(lambda i, f: bloque_mono(datos, i, f), len(datos), self.forma[0]))
+
+    def campo_imagen(self, ruta):
+        import matplotlib.pyplot as plt
+        imagen = plt.imread(ruta)
+        if imagen.ndim == 3:
+            imagen = np.dot(imagen[..., :3], [0.2989, 0.5870, 0.1140])
+        imagen = reescalar_imagen(imagen.astype(np.float64), self.forma)
+        return (imagen - imagen.min()) / (imagen.max() - imagen.min() + 1e-8)
+
+    def campo_archivo(self, ruta):
+        """
+        Campo de un archivo .wav, .edf, .png o de un estado exportado (.json/.campon).
+        """
+        ext = os.path.splitext(ruta)[1].lower()
+        if ext == '.wav':
+            return self.campo_wav(ruta)
+        if ext == '.edf':
+            return self.campo_edf(ruta)
+        if ext == '.png':
+            return self.campo_imagen(ruta)
+        from instantanea_campo import leer_estado
+        campo, _ = leer_estado(ruta)
+        if campo is None:
+            raise ValueError(f"'{ruta}' no contiene un campo")
+        campo = reescalar_imagen(np.asarray(campo, dtype=np.float64), self.forma)
+        return (campo - campo.min()) / (campo.max() - campo.min() + 1e-8)
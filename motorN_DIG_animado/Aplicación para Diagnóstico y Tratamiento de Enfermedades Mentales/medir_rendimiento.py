@@ -0,0 +1,339 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from laboratorio_n import LaboratorioN
+from generador_sintetico import GeneradorSintetico, DEPRESION
+from instantanea_campo import EXTENSION_INSTANTANEA
+from render_campo import RenderizadorCampo
+from escritura_segura import escritura_atomica
+
+# diffuse_step y export_output viven en el script de patrones EDF, junto a esta aplicación
+DIRECTORIO_PATRONES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   "Aplicación para Diagnóstico y Tratamiento de Enfermedades")
+if DIRECTORIO_PATRONES not in sys.path:
+    sys.path.insert(0, DIRECTORIO_PATRONES)
+
+from convert_edf_to_pattern import diffuse_step, export_output
+
+# --- MEDICIÓN DE RENDIMIENTO ---
+# Mide los caminos calientes del laboratorio para varios tamaños de campo y
+# duraciones de señal, y los compara con una medición de referencia:
+#
+# - Cada caso se prepara fuera de la medición (fixtures con generador_sintetico),
+#   se ejecuta una vez para calentar (contextos FFT, motores, imports) y se
+#   repite hasta REPETICIONES veces y al menos TIEMPO_MINIMO segundos. Se guarda
+#   el mínimo (lo más estable para comparar) y la mediana.
+# - La memoria pico se mide con tracemalloc en una ejecución aparte, para que su
+#   coste no contamine los tiempos (numpy registra sus arrays en tracemalloc).
+# - El resultado es un JSON con los datos de la máquina. Con --base se compara
+#   con otro: un caso más lento que TOLERANCIA_TIEMPO o con más memoria que
+#   TOLERANCIA_MEMORIA es una regresión y el programa sale con código 1.
+# - El dibujo en Tk (dibujar_campo) necesita pantalla: se usa $DISPLAY o, si está
+#   instalado, pyvirtualdisplay (Xvfb). Sin ninguna, ese caso se marca como
+#   omitido; el renderizado a PPM que usa (render_campo) se mide siempre.
+
+TAMAÑOS_CAMPO = (50, 200, 500)     # Lados de campo medidos
+SEGUNDOS_SEÑAL = (1, 10, 60)       # Duraciones de señal medidas
+REPETICIONES = 5                   # Repeticiones mínimas por caso
+TIEMPO_MINIMO = 0.2                # Segundos mínimos midiendo cada caso
+MAX_REPETICIONES = 1000
+TOLERANCIA_TIEMPO = 0.25           # +25 % de tiempo mínimo es una regresión
+TOLERANCIA_MEMORIA = 0.10          # +10 % de memoria pico es una regresión
+MARGEN_TIEMPO = 0.0005             # Diferencias por debajo de 0.5 ms se consideran ruido
+MARGEN_MEMORIA = 64 * 1024         # ... y por debajo de 64 KiB
+RESULTADOS_POR_DEFECTO = "rendimiento.json"
+
+CORRECTO = 'correcto'
+OMITIDO = 'omitido'
+ERROR = 'error'
+
+
+def medir(funcion, repeticiones=REPETICIONES, tiempo_minimo=TIEMPO_MINIMO):
+    """
+    Tiempo (mínimo y mediana, en segundos) y memoria pico (bytes) de `funcion()`.
+    """
+    funcion()
+    tiempos = []
+    inicio = time.perf_counter()
+    while len(tiempos) < repeticiones or (time.perf_counter() - inicio < tiempo_minimo
+                                          and len(tiempos) < MAX_REPETICIONES):
+        t = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'estado': CORRECTO, 'segundos_min': min(tiempos), 'segundos_mediana': statistics.median(tiempos),
+            'repeticiones': len(tiempos), 'pico_bytes': pico}
+
+
+def _laboratorio(tam=50, semilla=0):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return LaboratorioN(grid_size=tam, semilla=semilla)
+
+
+def _fixtures(directorio, tamaños, segundos):
+    # Un .wav por duración y un .png por tamaño, siempre los mismos (semilla fija)
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    generador = GeneradorSintetico(DEPRESION, semilla=0)
+    wavs = {s: generador.escribir_wavs(os.path.join(directorio, f"wav_{s}s"), 1, s)[0] for s in segundos}
+    pngs = {}
+    for tam in tamaños:
+        pngs[tam] = os.path.join(directorio, f"campo_{tam}.png")
+        plt.imsave(pngs[tam], np.random.default_rng(tam).random((tam, tam)), cmap='viridis')
+    return wavs, pngs
+
+
+def _casos_campo(tam, directorio):
+    lab = _laboratorio(tam)
+    campo = lab.campo.copy()
+    yield "evolucionar_campo", lambda: lab.evolucionar_campo()
+    yield "evolve_10", lambda: lab.evolve(10)
+    yield "diffuse_step", lambda: diffuse_step(campo)
+    yield "export_output", lambda: export_output(campo, "bench")
+
+    metricas = _laboratorio(tam)
+    metricas.calcular_metricas()
+
+    def calcular_metricas():
+        metricas.motor_metricas.marcar_todo()  # Recorrido completo, no el incremental
+        metricas.calcular_metricas()
+
+    def metricas_tras_inyectar():
+        metricas.inyectar_patron_ansiedad()
+        metricas.calcular_metricas()
+
+    yield "calcular_metricas", calcular_metricas
+    yield "calcular_metricas_incremental", metricas_tras_inyectar
+
+    instantanea = os.path.join(directorio, f"estado_{tam}{EXTENSION_INSTANTANEA}")
+    json_estado = os.path.join(directorio, f"estado_{tam}.json")
+    yield "exportar_estado", lambda: lab.exportar_estado(instantanea)
+    yield "importar_estado", lambda: lab.importar_estado(instantanea)
+    yield "exportar_estado_json", lambda: lab.exportar_estado(json_estado)
+    yield "importar_estado_json", lambda: lab.importar_estado(json_estado)
+
+    renderizador = RenderizadorCampo(campo.shape, 400)
+    yield "render_campo_ppm", lambda: renderizador.ppm(campo)
+
+
+def _casos_señal(ruta_wav, directorio):
+    lab = _laboratorio()
+    with contextlib.redirect_stdout(io.StringIO()):
+        señal = lab.encoder(ruta_wav)
+        contraonda = lab.procesador_entropico(señal, nombre_grafico=None)
+    salida = os.path.join(directorio, "contraonda_bench.wav")
+    yield "encoder_wav", lambda: lab.encoder(ruta_wav)
+    yield "procesador_entropico", lambda: lab.procesador_entropico(señal, nombre_grafico=None)
+    yield "decoder", lambda: lab.decoder(contraonda, salida)
+
+
+def _pantalla():
+    """
+    Devuelve (pantalla virtual o None, motivo si no hay pantalla).
+    """
+    if os.environ.get('DISPLAY'):
+        return None, None
+    try:
+        from pyvirtualdisplay import Display
+    except ImportError:
+        return None, "sin $DISPLAY ni pyvirtualdisplay"
+    try:
+        pantalla = Display(visible=False, size=(1280, 800))
+        pantalla.start()
+    except Exception as e:
+        return None, f"no se pudo iniciar Xvfb: {e}"
+    return pantalla, None
+
+
+def _casos_tk(tam, raiz):
+    from laboratorio_n_tk import LaboratorioNApp
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = LaboratorioNApp(raiz, grid_size=tam)
+    raiz.update()
+
+    def dibujar():
+        app.dibujar_campo()
+        raiz.update_idletasks()
+
+    yield "tk_dibujar_campo", dibujar
+    app.frame_principal.destroy()
+
+
+def ejecutar(tamaños=TAMAÑOS_CAMPO, segundos=SEGUNDOS_SEÑAL, solo=None, repeticiones=REPETICIONES,
+             tiempo_minimo=TIEMPO_MINIMO, informar=print):
+    """
+    Mide todos los casos (o los que contienen `solo` en su identificador).
+    Devuelve {identificador: resultado}.
+    """
+    resultados = {}
+
+    def correr(identificador, funcion):
+        if solo and solo not in identificador:
+            return
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                resultado = medir(funcion, repeticiones, tiempo_minimo)
+        except Exception as e:
+            resultado = {'estado': ERROR, 'error': f"{type(e).__name__}: {e}"}
+        resultados[identificador] = resultado
+        informar(_linea(identificador, resultado))
+
+    directorio_original = os.getcwd()
+    with tempfile.TemporaryDirectory() as directorio:
+        # El laboratorio y la interfaz escriben archivos relativos (gráficos, caché): dentro del temporal
+        os.chdir(directorio)
+        try:
+            wavs, pngs = _fixtures(directorio, tamaños, segundos)
+            for tam in tamaños:
+                for nombre, funcion in _casos_campo(tam, directorio):
+                    correr(f"{nombre}[tam={tam}]", funcion)
+                lab = _laboratorio()
+                correr(f"encoder_png[tam={tam}]", lambda: lab.encoder(pngs[tam]))
+            for s in segundos:
+                for nombre, funcion in _casos_señal(wavs[s], directorio):
+                    correr(f"{nombre}[segundos={s}]", funcion)
+            _medir_tk(tamaños, correr, resultados, solo, informar)
+        finally:
+            os.chdir(directorio_original)
+    return resultados
+
+
+def _medir_tk(tamaños, correr, resultados, solo, informar):
+    identificadores = [f"tk_dibujar_campo[tam={tam}]" for tam in tamaños]
+    if solo and not any(solo in i for i in identificadores):
+        return
+    pantalla, motivo = _pantalla()
+    raiz = None
+    if motivo is None:
+        try:
+            import tkinter as tk
+            raiz = tk.Tk()
+            raiz.withdraw()
+        except Exception as e:
+            motivo = f"Tk no disponible: {e}"
+    try:
+        for tam, identificador in zip(tamaños, identificadores):
+            if raiz is None:
+                if not solo or solo in identificador:
+                    resultados[identificador] = {'estado': OMITIDO, 'motivo': motivo}
+                    informar(_linea(identificador, resultados[identificador]))
+                continue
+            for nombre, funcion in _casos_tk(tam, raiz):
+                correr(f"{nombre}[tam={tam}]", funcion)
+    finally:
+        if raiz is not None:
+            raiz.destroy()
+        if pantalla is not None:
+            pantalla.stop()
+
+
+def _bytes_legibles(n):
+    for unidad in ('B', 'KiB', 'MiB'):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unidad}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def _linea(identificador, resultado):
+    if resultado['estado'] == OMITIDO:
+        return f"⏭️ {identificador:<40} omitido ({resultado['motivo']})"
+    if resultado['estado'] == ERROR:
+        return f"❌ {identificador:<40} {resultado['error']}"
+    return (f"⏱️ {identificador:<40} {resultado['segundos_min'] * 1000:10.3f} ms  "
+            f"(mediana {resultado['segundos_mediana'] * 1000:.3f} ms, {resultado['repeticiones']} rep.)  "
+            f"pico {_bytes_legibles(resultado['pico_bytes'])}")
+
+
+def informe(resultados, tamaños, segundos):
+    """
+    Documento JSON con la máquina, los parámetros y los resultados.
+    """
+    import scipy
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'maquina': {'plataforma': platform.platform(), 'procesador': platform.processor(),
+                    'cpus': os.cpu_count(), 'python': platform.python_version(),
+                    'numpy': np.__version__, 'scipy': scipy.__version__},
+        'parametros': {'tamaños': list(tamaños), 'segundos': list(segundos)},
+        'resultados': resultados,
+    }
+
+
+def comparar(resultados, base, tolerancia_tiempo=TOLERANCIA_TIEMPO, tolerancia_memoria=TOLERANCIA_MEMORIA):
+    """
+    Regresiones de `resultados` frente a los resultados de `base`: lista de
+    (identificador, medida, valor de base, valor actual). Solo se comparan los
+    casos medidos correctamente en ambos.
+    """
+    regresiones = []
+    for identificador, actual in resultados.items():
+        anterior = base.get(identificador)
+        if actual['estado'] != CORRECTO or not anterior or anterior.get('estado') != CORRECTO:
+            continue
+        if (actual['segundos_min'] > anterior['segundos_min'] * (1 + tolerancia_tiempo)
+                and actual['segundos_min'] - anterior['segundos_min'] > MARGEN_TIEMPO):
+            regresiones.append((identificador, 'segundos_min', anterior['segundos_min'], actual['segundos_min']))
+        if (actual['pico_bytes'] > anterior['pico_bytes'] * (1 + tolerancia_memoria)
+                and actual['pico_bytes'] - anterior['pico_bytes'] > MARGEN_MEMORIA):
+            regresiones.append((identificador, 'pico_bytes', anterior['pico_bytes'], actual['pico_bytes']))
+    return regresiones
+
+
+def _lista(tipo):
+    return lambda texto: tuple(tipo(x) for x in texto.split(','))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide los caminos calientes del Laboratorio N y detecta regresiones.")
+    parser.add_argument("--tamaños", type=_lista(int), default=TAMAÑOS_CAMPO, help="lados del campo, p. ej. '50,200'")
+    parser.add_argument("--segundos", type=_lista(float), default=SEGUNDOS_SEÑAL, help="duraciones, p. ej. '1,10'")
+    parser.add_argument("--solo", default=None, help="medir solo los casos cuyo identificador contenga este texto")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--tiempo-minimo", type=float, default=TIEMPO_MINIMO, help="segundos mínimos por caso")
+    parser.add_argument("--salida", default=RESULTADOS_POR_DEFECTO, help="JSON de resultados")
+    parser.add_argument("--base", default=None, help="JSON de referencia con el que comparar")
+    parser.add_argument("--tolerancia-tiempo", type=float, default=TOLERANCIA_TIEMPO)
+    parser.add_argument("--tolerancia-memoria", type=float, default=TOLERANCIA_MEMORIA)
+    args = parser.parse_args()
+
+    segundos = tuple(int(s) if float(s).is_integer() else s for s in args.segundos)
+    resultados = ejecutar(args.tamaños, segundos, args.solo, args.repeticiones, args.tiempo_minimo)
+    documento = informe(resultados, args.tamaños, segundos)
+    salida = os.path.abspath(args.salida)
+    with escritura_atomica(salida) as temporal:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Resultados guardados en {salida}")
+
+    errores = [i for i, r in resultados.items() if r['estado'] == ERROR]
+    regresiones = []
+    if args.base:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)['resultados']
+        regresiones = comparar(resultados, base, args.tolerancia_tiempo, args.tolerancia_memoria)
+        for identificador, medida, anterior, actual in regresiones:
+            formato = (lambda v: f"{v * 1000:.3f} ms") if medida == 'segundos_min' else _bytes_legibles
+            print(f"📉 {identificador}: {medida} {formato(anterior)} -> {formato(actual)} "
+                  f"({(actual / anterior - 1) * 100:+.0f} %)")
+        nuevos = sorted(set(resultados) - set(base))
+        print(f"--- {len(regresiones)} regresiones frente a {args.base}"
+              + (f", {len(nuevos)} casos sin referencia" if nuevos else "") + " ---")
+    sys.exit(1 if regresiones or errores else 0)
@@ -0,0 +1,347 @@
+import numpy as np
+from scipy import ndimage
+
+# --- MÉTRICAS LOCALES DEL CAMPO N ---
+# La "entropía local" de una celda es la varianza de su vecindario (2*radio+1)^2,
+# recortado en los bordes igual que en la regla de difusión. En lugar de recorrer
+# las celdas, se calculan las sumas de x y x^2 de todas las ventanas a la vez con
+# imágenes integrales: cada ventana cuesta cuatro lecturas, sea cual sea su tamaño.
+
+N_PUNTOS_CALIENTES = 5   # Cuántos máximos locales se reportan por defecto
+
+
+def _limites_ventana(n, radio):
+    """
+    Inicio y fin (exclusivo) de la ventana recortada de cada posición de un eje.
+    """
+    posiciones = np.arange(n)
+    return np.maximum(posiciones - radio, 0), np.minimum(posiciones + radio + 1, n)
+
+
+def imagen_integral(campo, margen=0):
+    """
+    Imagen integral de `campo` con una fila y columna de ceros al principio,
+    extendida `margen` posiciones por cada lado repitiendo el borde.
+    La acumulación por filas se hace fila a fila: sobre arrays C-contiguos es
+    bastante más rápida que np.cumsum(axis=0).
+    """
+    filas, columnas = campo.shape
+    integral = np.empty((filas + 1 + 2 * margen, columnas + 1 + 2 * margen), dtype=np.float64)
+    centro = integral[margen:margen + filas + 1, margen:margen + columnas + 1]
+    centro[0, :] = 0
+    centro[:, 0] = 0
+    np.cumsum(campo, axis=1, dtype=np.float64, out=centro[1:, 1:])
+    for f in range(2, filas + 1):
+        np.add(centro[f], centro[f - 1], out=centro[f])
+    if margen:
+        integral[:margen, margen:margen + columnas + 1] = centro[0]
+        integral[margen + filas + 1:, margen:margen + columnas + 1] = centro[-1]
+        integral[:, :margen] = integral[:, margen:margen + 1]
+        integral[:, margen + columnas + 1:] = integral[:, margen + columnas:margen + columnas + 1]
+    return integral
+
+
+def sumas_ventana(campo, radio=1):
+    """
+    Devuelve la suma de cada ventana (2*radio+1)^2 recortada, usando una imagen integral.
+    La integral se extiende `radio` posiciones por cada lado repitiendo el borde, de modo
+    que las ventanas recortadas se leen con cuatro cortes del array, sin indexado disperso.
+    """
+    filas, columnas = campo.shape
+    lado = 2 * radio + 1
+    integral = imagen_integral(campo, radio)
+    suma = integral[lado:lado + filas, lado:lado + columnas] - integral[:filas, lado:lado + columnas]
+    suma -= integral[lado:lado + filas, :columnas]
+    suma += integral[:filas, :columnas]
+    return suma
+
+
+def conteo_ventana(forma, radio=1):
+    """
+    Número de celdas de cada ventana recortada.
+    """
+    return np.outer(*_conteo_ejes(forma, radio))
+
+
+def _conteo_ejes(forma, radio):
+    r0, r1 = _limites_ventana(forma[0], radio)
+    c0, c1 = _limites_ventana(forma[1], radio)
+    return (r1 - r0).astype(np.float64), (c1 - c0).astype(np.float64)
+
+
+def mapa_varianza_local(campo, radio=1):
+    """
+    Varianza local de cada celda en una sola pasada vectorizada: E[x^2] - E[x]^2
+    sobre su ventana recortada. El campo se centra en su media antes de integrar
+    para que las sumas acumuladas de campos grandes no pierdan precisión.
+    """
+    centrado = np.asarray(campo, dtype=np.float64) - np.mean(campo)
+    n_filas, n_columnas = _conteo_ejes(centrado.shape, radio)
+    # El conteo de cada ventana es separable: se divide por filas y por columnas con broadcasting.
+    inv_filas, inv_columnas = (1.0 / n_filas)[:, None], 1.0 / n_columnas
+    media = sumas_ventana(centrado, radio)
+    media *= inv_filas
+    media *= inv_columnas
+    np.multiply(centrado, centrado, out=centrado)
+    varianza = sumas_ventana(centrado, radio)
+    varianza *= inv_filas
+    varianza *= inv_columnas
+    media *= media
+    varianza -= media
+    np.maximum(varianza, 0, out=varianza)
+    return varianza
+
+
+def puntos_calientes(mapa, k=N_PUNTOS_CALIENTES):
+    """
+    Devuelve las k celdas de mayor valor como lista de (valor, fila, columna), de mayor a menor.
+    """
+    plano = mapa.ravel()
+    k = min(k, plano.size)
+    if k <= 0:
+        return []
+    umbral = plano[np.argpartition(plano, plano.size - k)[plano.size - k]]
+    # argpartition elige cualquiera de los empatados con el k-ésimo valor; se toman los
+    # primeros en orden fila a fila (flatnonzero va en orden), como el recorrido original.
+    mayores = np.flatnonzero(plano > umbral)
+    candidatos = np.concatenate((mayores, np.flatnonzero(plano == umbral)[:k - mayores.size]))
+    # Orden descendente por valor y, a igualdad, por posición (ordenación estable).
+    candidatos = candidatos[np.argsort(-plano[candidatos], kind='stable')]
+    filas, columnas = np.unravel_index(candidatos, mapa.shape)
+    return [(float(plano[i]), int(f), int(c)) for i, f, c in zip(candidatos, filas, columnas)]
+
+
+def regiones_sobre_umbral(mapa, umbral):
+    """
+    Cuenta las celdas que superan `umbral` y las regiones conexas (vecindad 8) que forman.
+    """
+    mascara = mapa > umbral
+    _, n_regiones = ndimage.label(mascara, structure=np.ones((3, 3), dtype=bool))
+    return {'celdas': int(np.count_nonzero(mascara)), 'regiones': int(n_regiones)}
+
+
+# --- MOTOR DE MÉTRICAS INCREMENTAL ---
+# calcular_metricas necesita el histograma de 20 bins en [0, 1], la varianza y el
+# máximo del campo. En lugar de tres recorridos independientes (np.histogram,
+# np.var, np.max), el motor calcula en un mismo recorrido, por teselas, el
+# histograma, las sumas de x y x^2 (centradas en el medio del rango, para no
+# perder precisión) y el máximo de cada tesela, y guarda esos parciales. Las
+# métricas globales salen de sumar los parciales de todas las teselas.
+#
+# Cuando solo cambia una región (una inyección, un paso del modo incremental),
+# basta marcarla: en el siguiente cálculo solo se recorren las teselas marcadas.
+# Se pueden registrar métricas adicionales que reutilizan los parciales del mismo
+# recorrido (ver entropia_espacial) o que reciben el campo (percentiles de la
+# varianza local).
+
+BINS_HISTOGRAMA = 20          # Bins del histograma de calcular_metricas
+RANGO_HISTOGRAMA = (0.0, 1.0)
+TAM_TESELA_METRICAS = 32      # Lado de las teselas de parciales (en celdas)
+PERCENTILES_VARIANZA = (50, 90, 99)
+
+
+class MotorMetricas:
+    """
+    Métricas del campo (entropía del histograma, varianza, máximo) mantenidas por
+    teselas. `calcular(campo)` recorre solo las teselas marcadas como modificadas
+    desde el cálculo anterior (todas la primera vez) y devuelve el diccionario de
+    métricas, incluidas las registradas con `registrar_metrica`.
+    """
+    def __init__(self, forma, tam_tesela=TAM_TESELA_METRICAS, bins=BINS_HISTOGRAMA, rango=RANGO_HISTOGRAMA):
+        self.forma = tuple(forma)
+        self.tam_tesela = int(tam_tesela)
+        self.bins = int(bins)
+        self.rango = (float(rango[0]), float(rango[1]))
+        filas, columnas = self.forma
+        self.n_teselas = (-(-filas // self.tam_tesela), -(-columnas // self.tam_tesela))
+
+        # Mismos bordes que np.histogram(bins, range) para asignar cada valor al mismo bin.
+        self._bordes = np.linspace(self.rango[0], self.rango[1], self.bins + 1)
+        self._norma = self.bins / (self.rango[1] - self.rango[0])
+        self._centro = 0.5 * (self.rango[0] + self.rango[1])
+
+        # Parciales por tesela; el último bin del histograma recoge los valores fuera de rango.
+        self.histogramas_teselas = np.zeros(self.n_teselas + (self.bins + 1,), dtype=np.int64)
+        self.sumas_teselas = np.zeros(self.n_teselas)
+        self.sumas_cuadrado_teselas = np.zeros(self.n_teselas)
+        self.maximos_teselas = np.full(self.n_teselas, -np.inf)
+        self.celdas_teselas = np.outer(*(np.diff(np.append(np.arange(0, n, self.tam_tesela), n))
+                                         for n in self.forma)).astype(np.float64)
+        self.sucias = np.ones(self.n_teselas, dtype=bool)
+
+        # Buffers reutilizados entre cálculos (se usan sus vistas para regiones menores).
+        self._indices = np.empty(self.forma, dtype=np.intp)
+        self._tmp = np.empty(self.forma)
+        self._cache_desplazamientos = {}
+        self._extra = {}
+        self.metricas = None
+
+    def admite(self, campo):
+        """
+        Indica si el motor sirve para un campo de esta forma.
+        """
+        return campo.shape == self.forma
+
+    def registrar_metrica(self, nombre, funcion):
+        """
+        Añade una métrica calculada tras cada recorrido: `funcion(motor, campo)` puede
+        usar los parciales del motor (histograma, sumas por tesela...) y devuelve un
+        valor serializable a JSON.
+        """
+        self._extra[nombre] = funcion
+
+    def quitar_metrica(self, nombre):
+        self._extra.pop(nombre, None)
+
+    def marcar_todo(self):
+        """
+        Marca todas las teselas para recalcular (campo sustituido o evolucionado entero).
+        """
+        self.sucias[...] = True
+
+    def marcar_region(self, r0, r1, c0, c1):
+        """
+        Marca las teselas que tocan la región [r0, r1) x [c0, c1).
+        """
+        filas, columnas = self.forma
+        r0, c0 = max(r0, 0), max(c0, 0)
+        r1, c1 = min(r1, filas), min(c1, columnas)
+        if r0 >= r1 or c0 >= c1:
+            return
+        t = self.tam_tesela
+        self.sucias[r0 // t:(r1 - 1) // t + 1, c0 // t:(c1 - 1) // t + 1] = True
+
+    def marcar_teselas(self, mascara, tam_tesela):
+        """
+        Marca las regiones de las teselas True de `mascara`, de lado `tam_tesela`
+        (p. ej. las escritas por DifusionPorTeselas, aunque su teselado sea otro).
+        """
+        if tam_tesela == self.tam_tesela and mascara.shape == self.sucias.shape:
+            self.sucias |= mascara
+            return
+        for ti, tj in np.argwhere(mascara):
+            self.marcar_region(ti * tam_tesela, (ti + 1) * tam_tesela, tj * tam_tesela, (tj + 1) * tam_tesela)
+
+    def _reducir_teselas(self, ufunc, x, inicio_filas, inicio_columnas):
+        # Reducción por teselas; primero a lo largo de las filas (eje contiguo), que es lo rápido.
+        return ufunc.reduceat(ufunc.reduceat(x, inicio_columnas, axis=1), inicio_filas, axis=0)
+
+    def _desplazamientos(self, forma, n_tc):
+        # Índice de tesela de cada celda, multiplicado por el número de bins (se reutiliza).
+        clave = (forma, n_tc)
+        if clave not in self._cache_desplazamientos:
+            t = self.tam_tesela
+            id_tesela = (np.arange(forma[0]) // t)[:, None] * n_tc + (np.arange(forma[1]) // t)[None, :]
+            self._cache_desplazamientos = {clave: id_tesela * (self.bins + 1)}
+        return self._cache_desplazamientos[clave]
+
+    def _recorrer(self, campo, tr0, tr1, tc0, tc1):
+        # Recalcula los parciales de las teselas [tr0, tr1) x [tc0, tc1) en un solo recorrido.
+        t = self.tam_tesela
+        r0, r1 = tr0 * t, min(tr1 * t, self.forma[0])
+        c0, c1 = tc0 * t, min(tc1 * t, self.forma[1])
+        x = campo[r0:r1, c0:c1]
+        forma = x.shape
+        inicio_filas, inicio_columnas = np.arange(0, forma[0], t), np.arange(0, forma[1], t)
+        n_tf, n_tc = tr1 - tr0, tc1 - tc0
+
+        maximos = self._reducir_teselas(np.maximum, x, inicio_filas, inicio_columnas)
+        self.maximos_teselas[tr0:tr1, tc0:tc1] = maximos
+        # La máscara de valores fuera de rango (o NaN) solo se construye si hace falta.
+        fuera = None
+        if not (x.min() >= self.rango[0] and maximos.max() <= self.rango[1]):
+            fuera = ~((x >= self.rango[0]) & (x <= self.rango[1]))
+
+        # Bin de cada celda: truncando (x - inicio) * bins / ancho, y corrigiendo como
+        # np.histogram las celdas que caen a menos de un redondeo de un borde.
+        f = self._tmp[:forma[0], :forma[1]]
+        idx = self._indices[:forma[0], :forma[1]]
+        np.subtract(x, self.rango[0], out=f)
+        f *= self._norma
+        if fuera is not None:
+            f[fuera] = 0
+        idx[...] = f
+        np.minimum(idx, self.bins - 1, out=idx)
+        np.subtract(f, idx, out=f)
+        dudosas = np.flatnonzero((f < 1e-9) | (f > 1 - 1e-9))
+        if dudosas.size:
+            filas, columnas = np.divmod(dudosas, forma[1])
+            xd, i = x[filas, columnas], idx[filas, columnas]
+            i -= xd < self._bordes[i]
+            i += (xd >= self._bordes[i + 1]) & (i != self.bins - 1)
+            idx[filas, columnas] = i
+        if fuera is not None:
+            idx[fuera] = self.bins
+
+        # Histograma de todas las teselas de la región con un solo bincount.
+        idx += self._desplazamientos(forma, n_tc)
+        conteos = np.bincount(idx.ravel(), minlength=n_tf * n_tc * (self.bins + 1))
+        self.histogramas_teselas[tr0:tr1, tc0:tc1] = conteos.reshape(n_tf, n_tc, self.bins + 1)
+
+        np.subtract(x, self._centro, out=f)
+        self.sumas_teselas[tr0:tr1, tc0:tc1] = self._reducir_teselas(np.add, f, inicio_filas, inicio_columnas)
+        f *= f
+        self.sumas_cuadrado_teselas[tr0:tr1, tc0:tc1] = self._reducir_teselas(np.add, f, inicio_filas, inicio_columnas)
+
+    def calcular(self, campo):
+        """
+        Actualiza los parciales de las teselas marcadas y devuelve las métricas:
+        entropía (del histograma de densidad, como calcular_metricas), varianza,
+        máximo y las métricas registradas.
+        """
+        if not self.admite(campo):
+            raise ValueError(f"El campo tiene forma {campo.shape}, se esperaba {self.forma}.")
+        if self.sucias.any():
+            # Se recorre el rectángulo que cubre las teselas marcadas: un solo recorrido vectorizado.
+            filas_sucias = np.flatnonzero(self.sucias.any(axis=1))
+            columnas_sucias = np.flatnonzero(self.sucias.any(axis=0))
+            self._recorrer(campo, filas_sucias[0], filas_sucias[-1] + 1,
+                           columnas_sucias[0], columnas_sucias[-1] + 1)
+            self.sucias[...] = False
+
+        n = campo.size
+        self.histograma = self.histogramas_teselas[..., :self.bins].sum(axis=(0, 1))
+        media_centrada = self.sumas_teselas.sum() / n
+        self.media = self._centro + media_centrada
+        self.varianza = max(self.sumas_cuadrado_teselas.sum() / n - media_centrada ** 2, 0.0)
+        self.maximo = float(self.maximos_teselas.max())
+
+        en_rango = self.histograma.sum()
+        densidad = self.histograma / (en_rango * (self._bordes[1] - self._bordes[0])) if en_rango else self.histograma
+        densidad = densidad[densidad > 0]
+        entropia = -np.sum(densidad * np.log2(densidad)) if len(densidad) > 0 else 0.0
+
+        self.metricas = {
+            'entropia': float(entropia),
+            'varianza': float(self.varianza),
+            'maximo': self.maximo
+        }
+        for nombre, funcion in self._extra.items():
+            self.metricas[nombre] = funcion(self, campo)
+        return self.metricas
+
+
+def entropia_espacial(motor, campo=None):
+    """
+    Entropía de Shannon (normalizada a [0, 1]) del reparto de la "masa" del campo
+    entre teselas. Usa solo los parciales del motor: no recorre el campo.
+    1 significa masa repartida por igual; valores bajos, masa concentrada.
+    """
+    masas = motor.sumas_teselas + motor._centro * motor.celdas_teselas
+    masas = np.clip(masas, 0, None).ravel()
+    total = masas.sum()
+    if total <= 0 or masas.size < 2:
+        return 0.0
+    p = masas[masas > 0] / total
+    return float(-np.sum(p * np.log2(p)) / np.log2(masas.size))
+
+
+def percentiles_varianza_local(percentiles=PERCENTILES_VARIANZA, radio=1):
+    """
+    Devuelve una métrica registrable con los percentiles del mapa de varianza local.
+    Necesita el mapa completo, así que recorre el campo aunque solo cambie una región.
+    """
+    def metrica(motor, campo):
+        valores = np.percentile(mapa_varianza_local(campo, radio), percentiles)
+        return {f"p{p:g}": float(v) for p, v in zip(percentiles, valores)}
+    return metrica
@@ -0,0 +1,211 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from laboratorio_n import LaboratorioN, TASA_MUESTREO, PRECISION_DOBLE, PRECISION_SIMPLE
+from escritura_segura import escritura_atomica
+
+# --- PROCESAMIENTO POR LOTES ---
+# Ejecuta la cadena encoder -> procesador_entropico -> decoder sobre todos los
+# .wav/.png de uno o varios directorios o patrones glob. Cada proceso del pool
+# crea un único LaboratorioN y lo reutiliza para todos sus archivos.
+#
+# - Las salidas se escriben primero en un temporal del directorio de destino y
+#   se renombran con os.replace, así que nunca queda un .wav a medio escribir.
+# - Una salida más reciente que su entrada se da por buena y se omite: volver a
+#   lanzar el lote solo procesa lo nuevo o lo modificado (salvo con --forzar).
+# - El manifiesto JSON registra, por archivo, el estado, los tiempos de cada
+#   etapa y el error si lo hubo.
+# - Con --cache, los resultados del encoder y del procesador se guardan en una
+#   caché en disco compartida por todos los procesos (ver cache_resultados.py):
+#   con --forzar, lo que no haya cambiado se lee de ella en vez de recalcularse.
+
+EXTENSIONES_ENTRADA = ('.wav', '.png')
+DIRECTORIO_SALIDA = "contraondas"
+SUFIJO_SALIDA = "_contraonda.wav"
+SUFIJO_GRAFICO = "_espectro.png"
+NOMBRE_MANIFIESTO = "manifiesto_lote.json"
+
+# Estados de cada archivo en el manifiesto
+PROCESADO = 'procesado'
+OMITIDO = 'omitido'
+ERROR = 'error'
+
+_laboratorio = None  # Un LaboratorioN por proceso del pool
+
+
+def buscar_entradas(rutas, excluir=None, extensiones=EXTENSIONES_ENTRADA):
+    """
+    Expande directorios y patrones glob a la lista ordenada de archivos con alguna
+    de las `extensiones` (por defecto .wav/.png).
+    Se ignoran los archivos del directorio `excluir` (el de salida, para no
+    reprocesar contraondas si está dentro de una entrada).
+    """
+    excluir = os.path.abspath(excluir) if excluir else None
+    encontradas = set()
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            candidatas = (os.path.join(ruta, nombre) for nombre in os.listdir(ruta))
+        else:
+            candidatas = glob.glob(ruta)
+        for candidata in candidatas:
+            if os.path.isfile(candidata) and os.path.splitext(candidata)[1].lower() in extensiones:
+                candidata = os.path.abspath(candidata)
+                if excluir is None or os.path.dirname(candidata) != excluir:
+                    encontradas.add(candidata)
+    return sorted(encontradas)
+
+
+def rutas_salida(entrada, directorio_salida):
+    """
+    Nombres de la contraonda y del gráfico espectral de una entrada.
+    """
+    base, ext = os.path.splitext(os.path.basename(entrada))
+    # La extensión forma parte del nombre para que 'x.wav' y 'x.png' no choquen.
+    base = f"{base}_{ext[1:].lower()}"
+    return (os.path.join(directorio_salida, base + SUFIJO_SALIDA),
+            os.path.join(directorio_salida, base + SUFIJO_GRAFICO))
+
+
+def esta_actualizada(entrada, *salidas):
+    """
+    True si todas las salidas existen y son más recientes que la entrada.
+    """
+    try:
+        fecha_entrada = os.path.getmtime(entrada)
+        return all(os.path.getmtime(salida) >= fecha_entrada for salida in salidas)
+    except OSError:
+        return False
+
+
+def _iniciar_trabajador(tasa_muestreo=TASA_MUESTREO, directorio_cache=None, dtype=PRECISION_DOBLE):
+    global _laboratorio
+    with contextlib.redirect_stdout(io.StringIO()):
+        _laboratorio = LaboratorioN(tasa_muestreo, dtype=dtype)
+    if directorio_cache:
+        _laboratorio.activar_cache(directorio_cache)
+
+
+def procesar_archivo(entrada, directorio_salida, graficos=False, detallado=False):
+    """
+    Pasa un archivo por encoder -> procesador -> decoder con el LaboratorioN del proceso.
+    Devuelve la entrada del manifiesto (nunca lanza: los errores quedan registrados).
+    """
+    salida, grafico = rutas_salida(entrada, directorio_salida)
+    registro = {'entrada': entrada, 'salida': salida, 'grafico': grafico if graficos else None,
+                'estado': PROCESADO, 'segundos': {}, 'error': None}
+    inicio = time.perf_counter()
+    mensajes = io.StringIO()
+    try:
+        with contextlib.nullcontext() if detallado else contextlib.redirect_stdout(mensajes):
+            t = time.perf_counter()
+            señal = _laboratorio.encoder(entrada)
+            registro['segundos']['encoder'] = time.perf_counter() - t
+            if señal is None:
+                raise ValueError(f"El encoder no pudo leer el archivo: {mensajes.getvalue().strip()}")
+
+            t = time.perf_counter()
+            if graficos:
+                with escritura_atomica(grafico) as temporal:
+                    contraonda = _laboratorio.procesador_entropico(señal, temporal, grafico_asincrono=False)
+            else:
+                contraonda = _laboratorio.procesador_entropico(señal, nombre_grafico=None)
+            registro['segundos']['procesador'] = time.perf_counter() - t
+
+            t = time.perf_counter()
+            with escritura_atomica(salida) as temporal:
+                _laboratorio.decoder(contraonda, temporal)
+            registro['segundos']['decoder'] = time.perf_counter() - t
+    except Exception as e:
+        registro['estado'] = ERROR
+        registro['error'] = f"{type(e).__name__}: {e}"
+    registro['segundos']['total'] = time.perf_counter() - inicio
+    return registro
+
+
+def procesar_lote(rutas, directorio_salida=DIRECTORIO_SALIDA, trabajadores=None, graficos=False,
+                  forzar=False, manifiesto=None, tasa_muestreo=TASA_MUESTREO, detallado=False,
+                  directorio_cache=None, dtype=PRECISION_DOBLE):
+    """
+    Procesa todas las entradas de `rutas` en un pool de procesos y escribe el manifiesto.
+    Devuelve el manifiesto como diccionario.
+    """
+    os.makedirs(directorio_salida, exist_ok=True)
+    manifiesto = manifiesto or os.path.join(directorio_salida, NOMBRE_MANIFIESTO)
+    argumentos_lab = (tasa_muestreo or TASA_MUESTREO, directorio_cache, dtype)
+    inicio = time.time()
+
+    registros = []
+    pendientes = []
+    for entrada in buscar_entradas(rutas, excluir=directorio_salida):
+        salida, grafico = rutas_salida(entrada, directorio_salida)
+        # Con --graficos, una entrada sin gráfico (o con uno antiguo) se vuelve a procesar
+        if not forzar and esta_actualizada(entrada, salida, *([grafico] if graficos else [])):
+            registros.append({'entrada': entrada, 'salida': salida, 'grafico': grafico if graficos else None,
+                              'estado': OMITIDO, 'segundos': {}, 'error': None})
+        else:
+            pendientes.append(entrada)
+
+    trabajadores = max(1, min(trabajadores or os.cpu_count() or 1, len(pendientes) or 1))
+    if trabajadores == 1:
+        _iniciar_trabajador(*argumentos_lab)
+        for entrada in pendientes:
+            registros.append(procesar_archivo(entrada, directorio_salida, graficos, detallado))
+            _informar(registros[-1])
+    elif pendientes:
+        with ProcessPoolExecutor(max_workers=trabajadores, initializer=_iniciar_trabajador,
+                                 initargs=argumentos_lab) as pool:
+            futuros = [pool.submit(procesar_archivo, entrada, directorio_salida, graficos, detallado)
+                       for entrada in pendientes]
+            for futuro in as_completed(futuros):
+                registros.append(futuro.result())
+                _informar(registros[-1])
+
+    registros.sort(key=lambda registro: registro['entrada'])
+    resultado = {
+        'inicio': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(inicio)),
+        'segundos_totales': time.time() - inicio,
+        'trabajadores': trabajadores,
+        'directorio_salida': os.path.abspath(directorio_salida),
+        'resumen': {estado: sum(r['estado'] == estado for r in registros) for estado in (PROCESADO, OMITIDO, ERROR)},
+        'archivos': registros,
+    }
+    with escritura_atomica(manifiesto) as temporal:
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+    return resultado
+
+
+def _informar(registro):
+    nombre = os.path.basename(registro['entrada'])
+    if registro['estado'] == ERROR:
+        print(f"❌ {nombre}: {registro['error']}")
+    else:
+        print(f"✅ {nombre} -> {os.path.basename(registro['salida'])} ({registro['segundos']['total']:.2f} s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa por lotes archivos .wav/.png con el Laboratorio N.")
+    parser.add_argument("entradas", nargs="+", help="directorios, archivos o patrones glob (p. ej. 'datos/*.wav')")
+    parser.add_argument("--salida", default=DIRECTORIO_SALIDA, help="directorio de las contraondas")
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--graficos", action="store_true", help="guardar también el gráfico espectral de cada archivo")
+    parser.add_argument("--forzar", action="store_true", help="reprocesar aunque la salida esté al día")
+    parser.add_argument("--manifiesto", default=None, help=f"ruta del manifiesto (por defecto, <salida>/{NOMBRE_MANIFIESTO})")
+    parser.add_argument("--tasa", type=int, default=TASA_MUESTREO, help="tasa de muestreo esperada (Hz)")
+    parser.add_argument("--detallado", action="store_true", help="mostrar los mensajes del laboratorio")
+    parser.add_argument("--cache", default=None, help="directorio de la caché de resultados (por defecto, sin caché)")
+    parser.add_argument("--float32", action="store_true", help="procesar en precisión simple (mitad de memoria)")
+    args = parser.parse_args()
+
+    resultado = procesar_lote(args.entradas, args.salida, args.workers, args.graficos, args.forzar,
+                              args.manifiesto, args.tasa, args.detallado, args.cache,
+                              PRECISION_SIMPLE if args.float32 else PRECISION_DOBLE)
+    resumen = resultado['resumen']
+    print(f"\n--- {resumen[PROCESADO]} procesados, {resumen[OMITIDO]} omitidos, {resumen[ERROR]} con error "
+          f"en {resultado['segundos_totales']:.1f} s ---")
@@ -0,0 +1,96 @@
+import numpy as np
+
+# --- RENDERIZADO DEL CAMPO COMO IMAGEN ---
+# En lugar de un rectángulo del canvas por celda, el campo se convierte entero en
+# una imagen RGB: cada valor se cuantiza a un índice de una tabla de colores de
+# TAM_LUT entradas (precalculada una vez a partir del mapa de matplotlib) y se
+# escala al tamaño del canvas repitiendo o saltando celdas (vecino más próximo).
+# La imagen se entrega a Tk como PPM binario, que PhotoImage carga sin conversión.
+# Nada de esto depende de Tk, así que también sirve para exportar fotogramas.
+
+TAM_LUT = 256               # Entradas de la tabla de colores
+MAPA_COLORES = 'inferno'    # Mismo mapa que usaba valor_a_color
+
+
+def construir_lut(mapa=MAPA_COLORES, n=TAM_LUT):
+    """
+    Tabla (n, 3) uint8 con los colores del mapa de matplotlib remuestreado a n entradas.
+    Con índices enteros el mapa devuelve sus entradas tal cual, sin interpolar.
+    """
+    from matplotlib import colormaps
+    rgba = colormaps[mapa].resampled(n)(np.arange(n))
+    return (rgba[:, :3] * 255).astype(np.uint8)
+
+
+def indices_escalado(n_celdas, n_pixeles):
+    """
+    Celda que corresponde a cada píxel de un eje (vecino más próximo), tanto para
+    ampliar (n_pixeles > n_celdas) como para reducir.
+    """
+    return (np.arange(n_pixeles) * n_celdas) // n_pixeles
+
+
+def lado_imagen(n_celdas, lado_maximo):
+    """
+    Lado en píxeles de la imagen de un eje de `n_celdas`: un múltiplo entero del número
+    de celdas si caben (celdas cuadradas iguales) o `lado_maximo` si no.
+    """
+    if n_celdas <= lado_maximo:
+        return (lado_maximo // n_celdas) * n_celdas
+    return lado_maximo
+
+
+class RenderizadorCampo:
+    """
+    Convierte campos de una forma dada en imágenes RGB del tamaño indicado,
+    reutilizando la tabla de colores, los índices de escalado y los buffers.
+    """
+    def __init__(self, forma, lado_maximo, vmin=0.0, vmax=1.0, mapa=MAPA_COLORES):
+        self.forma = tuple(forma)
+        self.vmin, self.vmax = float(vmin), float(vmax)
+        self.lut = construir_lut(mapa)
+        self.alto = lado_imagen(self.forma[0], lado_maximo)
+        self.ancho = lado_imagen(self.forma[1], lado_maximo)
+        self._filas = indices_escalado(self.forma[0], self.alto)
+        self._columnas = indices_escalado(self.forma[1], self.ancho)
+        self._escala = np.float32(TAM_LUT / (self.vmax - self.vmin))
+        self._normalizado = np.empty(self.forma, dtype=np.float32)
+        self._indices = np.empty(self.forma, dtype=np.uint8)
+        self._cabecera_ppm = f"P6 {self.ancho} {self.alto} 255\n".encode('ascii')
+
+    def admite(self, campo):
+        return campo.shape == self.forma
+
+    def indices_color(self, campo):
+        """
+        Índice de la tabla de colores de cada celda (valores fuera de [vmin, vmax] recortados).
+        """
+        n = self._normalizado
+        np.subtract(campo, self.vmin, out=n, casting='unsafe')
+        n *= self._escala
+        np.clip(n, 0, TAM_LUT - 1, out=n)
+        self._indices[...] = n  # Truncado, como matplotlib al indexar su tabla
+        return self._indices
+
+    def rgb(self, campo):
+        """
+        Imagen (alto, ancho, 3) uint8 del campo.
+        """
+        # Se escalan primero los índices (1 byte por píxel) y después se aplica la tabla.
+        indices = self.indices_color(campo)
+        escalados = indices.take(self._filas, axis=0).take(self._columnas, axis=1)
+        return self.lut[escalados]
+
+    def ppm(self, campo):
+        """
+        Imagen del campo como PPM binario (P6), lista para PhotoImage(data=...).
+        """
+        return self._cabecera_ppm + self.rgb(campo).tobytes()
+
+    def color(self, valor):
+        """
+        Color '#rrggbb' de un valor suelto, con la misma tabla.
+        """
+        indice = int(np.clip((valor - self.vmin) * self._escala, 0, TAM_LUT - 1))
+        r, g, b = self.lut[indice]
+        return f'#{r:02x}{g:02x}{b:02x}'
@@ -0,0 +1,536 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from laboratorio_n import LaboratorioN, TAMANO_CAMPO
+from instantanea_campo import serializar_instantanea
+
+# --- SERVIDOR DEL CAMPO N ---
+# Un único motor (LaboratorioN) servido sin interfaz, con asyncio y solo la
+# biblioteca estándar, para que la página HTML y la aplicación Tk no tengan que
+# reimplementar el campo cada una en su proceso.
+#
+# - Sesiones con nombre, cada una con su LaboratorioN. Las operaciones de una
+#   sesión se serializan con su candado y se ejecutan en un pool de hilos
+#   compartido por todas (numpy libera el GIL en los cálculos del campo).
+# - API HTTP/JSON (ver RUTAS) para paso, inyección, reset, métricas e instantánea.
+# - /sesiones/<nombre>/stream es un WebSocket que envía el campo como fotogramas
+#   binarios (CABECERA_FOTOGRAMA + datos) a cualquier número de visores. Cada
+#   fotograma se codifica una vez y se comparte; cada visor tiene una cola de un
+#   solo hueco, así que un visor lento se salta fotogramas sin frenar a los demás.
+#
+# Solo escucha en localhost: no hay autenticación.
+
+HOST = '127.0.0.1'
+PUERTO = 8765
+SESION_INICIAL = 'principal'
+FPS_STREAM = 30                  # Máximo de fotogramas por segundo enviados a los visores
+PASOS_POR_SEGUNDO = 60           # Ritmo por defecto de una sesión animada
+MAX_PASOS_PETICION = 10000       # Pasos máximos en una sola petición /paso
+MAX_CUERPO = 1 << 20             # Bytes máximos del cuerpo de una petición
+GUID_WEBSOCKET = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # RFC 6455
+
+# Fotograma del stream: MAGIA | paso (uint64) | alto, ancho (uint32) | dtype ('u1'/'f4') | relleno
+MAGIA_FOTOGRAMA = b"CNF\x01"
+CABECERA_FOTOGRAMA = struct.Struct('<4sQII2s2x')
+FORMATOS_FOTOGRAMA = ('u1', 'f4')  # 'u1': campo en [0, 1] cuantizado a 0-255; 'f4': float32 tal cual
+
+# Códigos de operación WebSocket
+OP_TEXTO, OP_BINARIO, OP_CIERRE, OP_PING, OP_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+ESTADOS_HTTP = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+                500: 'Internal Server Error'}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# --- Protocolo WebSocket (RFC 6455, lo justo para este servidor y su cliente) ---
+
+def aceptacion_websocket(clave):
+    """
+    Valor de Sec-WebSocket-Accept para la Sec-WebSocket-Key del cliente.
+    """
+    return base64.b64encode(hashlib.sha1((clave + GUID_WEBSOCKET).encode('ascii')).digest()).decode('ascii')
+
+
+def codificar_trama(opcode, datos, enmascarar=False):
+    """
+    Trama WebSocket final (FIN) con `datos`. Los clientes deben enmascarar; el servidor no.
+    """
+    n = len(datos)
+    cabecera = bytearray([0x80 | opcode])
+    bit_mascara = 0x80 if enmascarar else 0
+    if n < 126:
+        cabecera.append(bit_mascara | n)
+    elif n < 1 << 16:
+        cabecera.append(bit_mascara | 126)
+        cabecera += struct.pack('>H', n)
+    else:
+        cabecera.append(bit_mascara | 127)
+        cabecera += struct.pack('>Q', n)
+    if enmascarar:
+        mascara = os.urandom(4)
+        cabecera += mascara
+        datos = _aplicar_mascara(datos, mascara)
+    return bytes(cabecera) + bytes(datos)
+
+
+def _aplicar_mascara(datos, mascara):
+    datos = np.frombuffer(bytes(datos), dtype=np.uint8)
+    return (datos ^ np.resize(np.frombuffer(mascara, dtype=np.uint8), datos.size)).tobytes()
+
+
+async def leer_trama(reader):
+    """
+    Lee un mensaje WebSocket completo (uniendo fragmentos). Devuelve (opcode, datos).
+    """
+    opcode_mensaje, partes = None, []
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        opcode = b0 & 0x0F
+        n = b1 & 0x7F
+        if n == 126:
+            n = struct.unpack('>H', await reader.readexactly(2))[0]
+        elif n == 127:
+            n = struct.unpack('>Q', await reader.readexactly(8))[0]
+        mascara = await reader.readexactly(4) if b1 & 0x80 else None
+        datos = await reader.readexactly(n)
+        if mascara is not None:
+            datos = _aplicar_mascara(datos, mascara)
+        if opcode >= OP_CIERRE:  # Los mensajes de control pueden llegar entre fragmentos
+            return opcode, datos
+        if opcode_mensaje is None:
+            opcode_mensaje = opcode
+        partes.append(datos)
+        if b0 & 0x80:
+            return opcode_mensaje, b''.join(partes)
+
+
+def codificar_fotograma(campo, paso, formato='u1'):
+    """
+    Mensaje binario del stream con el campo en el formato indicado.
+    """
+    if formato == 'u1':
+        datos = np.empty(campo.shape, dtype=np.uint8)
+        datos[...] = np.clip(campo, 0.0, 1.0) * 255 + 0.5
+    elif formato == 'f4':
+        datos = np.ascontiguousarray(campo, dtype='<f4')
+    else:
+        raise ValueError(f"Formato de fotograma no soportado: {formato!r}")
+    alto, ancho = campo.shape
+    return CABECERA_FOTOGRAMA.pack(MAGIA_FOTOGRAMA, int(paso), alto, ancho, formato.encode('ascii')) + datos.tobytes()
+
+
+def decodificar_fotograma(mensaje):
+    """
+    Devuelve (paso, campo) de un mensaje del stream; en formato 'u1' el campo se
+    devuelve como uint8 (0-255).
+    """
+    magia, paso, alto, ancho, formato = CABECERA_FOTOGRAMA.unpack_from(mensaje)
+    if magia != MAGIA_FOTOGRAMA:
+        raise ValueError("Mensaje que no es un fotograma del campo N")
+    dtype = np.uint8 if formato == b'u1' else np.dtype('<f4')
+    campo = np.frombuffer(mensaje, dtype=dtype, offset=CABECERA_FOTOGRAMA.size, count=alto * ancho)
+    return paso, campo.reshape(alto, ancho)
+
+
+# --- Sesiones ---
+
+class Visor:
+    """
+    Un cliente del stream: cola de un solo hueco con el último fotograma pendiente.
+    """
+    def __init__(self, formato):
+        self.formato = formato
+        self.pendiente = None
+        self.hay_nuevo = asyncio.Event()
+        self.enviados = 0
+        self.descartados = 0
+
+    def ofrecer(self, mensaje):
+        if self.pendiente is not None:
+            self.descartados += 1
+        self.pendiente = mensaje
+        self.hay_nuevo.set()
+
+    async def siguiente(self):
+        await self.hay_nuevo.wait()
+        self.hay_nuevo.clear()
+        mensaje, self.pendiente = self.pendiente, None
+        return mensaje
+
+
+class Sesion:
+    """
+    Un LaboratorioN con su candado, sus visores y, si está animada, su tarea de evolución.
+    """
+    def __init__(self, nombre, pool, grid_size=TAMANO_CAMPO, semilla=None, alpha=0.05):
+        self.nombre = nombre
+        self.pool = pool
+        self.lab = LaboratorioN(grid_size=grid_size, semilla=semilla)
+        self.alpha = alpha
+        self.candado = asyncio.Lock()
+        self.visores = set()
+        self.tarea = None
+        self.pasos_por_segundo = PASOS_POR_SEGUNDO
+        self._ultimo_envio = 0.0
+
+    async def ejecutar(self, funcion, *args):
+        """
+        Ejecuta funcion(*args) sobre el laboratorio en el pool, en exclusiva.
+        Si la tarea que espera se cancela (pausar, borrar la sesión), el candado no se
+        suelta hasta que el hilo termina: la siguiente orden nunca se solapa con él.
+        """
+        async with self.candado:
+            futuro = asyncio.get_running_loop().run_in_executor(self.pool, funcion, *args)
+            try:
+                return await asyncio.shield(futuro)
+            except asyncio.CancelledError:
+                await asyncio.wait([futuro])
+                raise
+
+    def _pasos(self, n, alpha):
+        for _ in range(n):
+            self.lab.evolucionar_campo(alpha)
+        return self.lab.calcular_metricas()
+
+    async def paso(self, n=1, alpha=None):
+        metricas = await self.ejecutar(self._pasos, n, self.alpha if alpha is None else alpha)
+        await self.difundir(forzar=True)
+        return metricas
+
+    async def difundir(self, forzar=False):
+        """
+        Envía el campo actual a los visores (como mucho FPS_STREAM veces por segundo,
+        salvo `forzar`). Cada formato se codifica una sola vez.
+        """
+        if not self.visores:
+            return
+        ahora = time.perf_counter()
+        if not forzar and ahora - self._ultimo_envio < 1.0 / FPS_STREAM:
+            return
+        self._ultimo_envio = ahora
+        # Los visores que se conecten mientras se codifica reciben el siguiente fotograma
+        visores = list(self.visores)
+        formatos = {visor.formato for visor in visores}
+        mensajes = await self.ejecutar(
+            lambda: {f: codificar_fotograma(self.lab.campo, self.lab.pasos, f) for f in formatos})
+        for visor in visores:
+            visor.ofrecer(mensajes[visor.formato])
+
+    def animar(self, pasos_por_segundo=None):
+        if pasos_por_segundo:
+            self.pasos_por_segundo = pasos_por_segundo
+        if self.tarea is None or self.tarea.done():
+            self.tarea = asyncio.create_task(self._bucle())
+
+    def pausar(self):
+        if self.tarea is not None:
+            self.tarea.cancel()
+            self.tarea = None
+
+    async def _bucle(self):
+        siguiente = time.perf_counter()
+        while True:
+            await self.ejecutar(self.lab.evolucionar_campo, self.alpha)
+            await self.difundir()
+            siguiente = max(siguiente + 1.0 / self.pasos_por_segundo, time.perf_counter() - 0.1)
+            await asyncio.sleep(max(0.0, siguiente - time.perf_counter()))
+
+    def estado(self):
+        return {
+            'nombre': self.nombre,
+            'grid_size': self.lab.grid_size,
+            'paso': self.lab.pasos,
+            'semilla': self.lab.semilla,
+            'animada': self.tarea is not None and not self.tarea.done(),
+            'pasos_por_segundo': self.pasos_por_segundo,
+            'visores': len(self.visores),
+        }
+
+
+class ServidorCampo:
+    """
+    Servidor HTTP + WebSocket de las sesiones del campo N.
+    """
+    def __init__(self, host=HOST, puerto=PUERTO, trabajadores=None, grid_size=TAMANO_CAMPO):
+        self.host = host
+        self.puerto = puerto
+        self.grid_size = grid_size
+        self.pool = ThreadPoolExecutor(max_workers=trabajadores or os.cpu_count() or 1,
+                                       thread_name_prefix="campo")
+        self.sesiones = {}
+        self._servidor = None
+
+    async def iniciar(self):
+        self.crear_sesion(SESION_INICIAL, self.grid_size)
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]  # Por si se pidió el puerto 0
+        return self
+
+    async def servir(self):
+        await self.iniciar()
+        print(f"🌐 Servidor del campo N en http://{self.host}:{self.puerto}")
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def cerrar(self):
+        for sesion in self.sesiones.values():
+            sesion.pausar()
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self.pool.shutdown(wait=True)
+
+    def crear_sesion(self, nombre, grid_size=None, semilla=None, alpha=0.05):
+        if nombre in self.sesiones:
+            raise ErrorHTTP(409, f"La sesión '{nombre}' ya existe")
+        self.sesiones[nombre] = Sesion(nombre, self.pool, grid_size or self.grid_size, semilla, alpha)
+        return self.sesiones[nombre]
+
+    def _sesion(self, nombre):
+        try:
+            return self.sesiones[nombre]
+        except KeyError:
+            raise ErrorHTTP(404, f"No existe la sesión '{nombre}'") from None
+
+    # --- HTTP ---
+
+    async def _atender(self, reader, writer):
+        try:
+            metodo, ruta, consulta, cabeceras, cuerpo = await self._leer_peticion(reader)
+            partes = [p for p in ruta.split('/') if p]
+            if (len(partes) == 3 and partes[0] == 'sesiones' and partes[2] == 'stream'
+                    and cabeceras.get('upgrade', '').lower() == 'websocket'):
+                await self._stream(self._sesion(partes[1]), consulta, cabeceras, reader, writer)
+                return
+            estado, tipo, datos = await self._enrutar(metodo, partes, consulta, cuerpo)
+        except ErrorHTTP as e:
+            estado, tipo, datos = e.estado, 'application/json', {'error': str(e)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            estado, tipo, datos = 500, 'application/json', {'error': f"{type(e).__name__}: {e}"}
+        if tipo == 'application/json':
+            datos = json.dumps(datos, ensure_ascii=False).encode('utf-8')
+        writer.write(f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}\r\n"
+                     f"Content-Type: {tipo}\r\nContent-Length: {len(datos)}\r\n"
+                     f"Connection: close\r\n\r\n".encode('latin-1') + datos)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _leer_peticion(self, reader):
+        linea = (await reader.readuntil(b'\r\n')).decode('latin-1').strip()
+        try:
+            metodo, objetivo, _ = linea.split(' ', 2)
+        except ValueError:
+            raise ErrorHTTP(400, f"Línea de petición no válida: {linea!r}") from None
+        cabeceras = {}
+        while True:
+            linea = (await reader.readuntil(b'\r\n')).decode('latin-1')
+            if linea == '\r\n':
+                break
+            nombre, _, valor = linea.partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip()
+        longitud = cabeceras.get('content-length', '0')
+        # Solo dígitos ASCII (RFC 9110): int() aceptaría también '-5', '+5' o '1_0'
+        if not (longitud.isascii() and longitud.isdigit()):
+            raise ErrorHTTP(400, f"Content-Length no válido: {longitud!r}")
+        longitud = int(longitud)
+        if longitud > MAX_CUERPO:
+            raise ErrorHTTP(413, "Cuerpo demasiado grande")
+        cuerpo = await reader.readexactly(longitud) if longitud else b''
+        url = urlsplit(objetivo)
+        consulta = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+        return metodo.upper(), url.path, consulta, cabeceras, cuerpo
+
+    async def _enrutar(self, metodo, partes, consulta, cuerpo):
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+        except json.JSONDecodeError as e:
+            raise ErrorHTTP(400, f"JSON no válido: {e}") from None
+        if not isinstance(datos, dict):
+            raise ErrorHTTP(400, "El cuerpo debe ser un objeto JSON")
+
+        if partes == ['sesiones']:
+            if metodo != 'GET':
+                raise ErrorHTTP(405, "Usa GET")
+            return 200, 'application/json', [s.estado() for s in self.sesiones.values()]
+        if len(partes) < 2 or partes[0] != 'sesiones':
+            raise ErrorHTTP(404, "Ruta desconocida; ver RUTAS en servidor_campo.py")
+
+        nombre = partes[1]
+        accion = partes[2] if len(partes) > 2 else None
+        if accion is None:
+            if metodo == 'POST':
+                sesion = self.crear_sesion(nombre, _numero(datos, 'grid_size', int, minimo=1),
+                                           _numero(datos, 'semilla', int, minimo=0),
+                                           _numero(datos, 'alpha', float, 0.05, minimo=0.0))
+                return 201, 'application/json', sesion.estado()
+            if metodo == 'DELETE':
+                sesion = self._sesion(nombre)
+                sesion.pausar()
+                del self.sesiones[nombre]
+                return 200, 'application/json', {'borrada': nombre}
+            if metodo == 'GET':
+                return 200, 'application/json', self._sesion(nombre).estado()
+            raise ErrorHTTP(405, "Usa GET, POST o DELETE")
+
+        sesion = self._sesion(nombre)
+        manejador = RUTAS.get((metodo, accion))
+        if manejador is None:
+            raise ErrorHTTP(404 if accion not in {a for _, a in RUTAS} else 405,
+                            f"{metodo} /sesiones/<nombre>/{accion} no existe")
+        return await manejador(self, sesion, datos, consulta)
+
+    # --- WebSocket ---
+
+    async def _stream(self, sesion, consulta, cabeceras, reader, writer):
+        formato = consulta.get('formato', 'u1')
+        if formato not in FORMATOS_FOTOGRAMA or 'sec-websocket-key' not in cabeceras:
+            raise ErrorHTTP(400, f"Se necesita Sec-WebSocket-Key y formato en {FORMATOS_FOTOGRAMA}")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {aceptacion_websocket(cabeceras['sec-websocket-key'])}\r\n\r\n")
+                     .encode('latin-1'))
+        await writer.drain()
+
+        visor = Visor(formato)
+        sesion.visores.add(visor)
+        await sesion.difundir(forzar=True)  # El visor recibe el estado actual de inmediato
+
+        async def enviar():
+            while True:
+                mensaje = await visor.siguiente()
+                writer.write(codificar_trama(OP_BINARIO, mensaje))
+                await writer.drain()
+                visor.enviados += 1
+
+        emisor = asyncio.create_task(enviar())
+        try:
+            while True:
+                opcode, datos = await leer_trama(reader)
+                if opcode == OP_CIERRE:
+                    writer.write(codificar_trama(OP_CIERRE, datos[:2]))
+                    break
+                if opcode == OP_PING:
+                    writer.write(codificar_trama(OP_PONG, datos))
+                # Los mensajes de los visores se ignoran: las órdenes van por HTTP
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            emisor.cancel()
+            sesion.visores.discard(visor)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+
+# --- Manejadores: (servidor, sesion, cuerpo JSON, consulta) -> (estado, tipo, datos) ---
+
+def _numero(datos, clave, tipo, defecto=None, minimo=None, maximo=None):
+    """
+    datos[clave] convertido a `tipo` (o `defecto` si falta o es null); un valor que no
+    se puede convertir o fuera de [minimo, maximo] es un error 400, no un 500.
+    """
+    valor = datos.get(clave)
+    if valor is None:
+        return defecto
+    try:
+        if isinstance(valor, bool) or (tipo is int and isinstance(valor, float) and not valor.is_integer()):
+            raise ValueError
+        valor = tipo(valor)
+    except (ValueError, TypeError, OverflowError):
+        raise ErrorHTTP(400, f"'{clave}' debe ser un número ({tipo.__name__}): {valor!r}") from None
+    if minimo is not None and valor < minimo:
+        raise ErrorHTTP(400, f"'{clave}' debe ser como mínimo {minimo}")
+    if maximo is not None and valor > maximo:
+        raise ErrorHTTP(400, f"'{clave}' debe ser como máximo {maximo}")
+    return valor
+
+
+async def _paso(servidor, sesion, datos, consulta):
+    n = _numero(datos, 'n', int, 1, minimo=1, maximo=MAX_PASOS_PETICION)
+    metricas = await sesion.paso(n, _numero(datos, 'alpha', float, minimo=0.0))
+    return 200, 'application/json', {'paso': sesion.lab.pasos, 'metricas': metricas}
+
+
+async def _inyectar(servidor, sesion, datos, consulta):
+    await sesion.ejecutar(sesion.lab.inyectar_patron_ansiedad)
+    await sesion.difundir(forzar=True)
+    return 200, 'application/json', sesion.estado()
+
+
+async def _reset(servidor, sesion, datos, consulta):
+    await sesion.ejecutar(sesion.lab.resetear_campo, _numero(datos, 'semilla', int, minimo=0))
+    await sesion.difundir(forzar=True)
+    return 200, 'application/json', sesion.estado()
+
+
+async def _metricas(servidor, sesion, datos, consulta):
+    metricas = await sesion.ejecutar(sesion.lab.calcular_metricas)
+    return 200, 'application/json', {'paso': sesion.lab.pasos, 'metricas': metricas}
+
+
+async def _instantanea(servidor, sesion, datos, consulta):
+    comprimir = consulta.get('comprimir', '0') not in ('0', 'false', '')
+
+    def serializar():
+        lab = sesion.lab
+        return serializar_instantanea(lab.campo, lab.calcular_metricas(), lab.pasos, lab.semilla, comprimir)
+
+    return 200, 'application/octet-stream', await sesion.ejecutar(serializar)
+
+
+async def _animar(servidor, sesion, datos, consulta):
+    sesion.animar(_numero(datos, 'pasos_por_segundo', float, minimo=0.0))
+    return 200, 'application/json', sesion.estado()
+
+
+async def _pausar(servidor, sesion, datos, consulta):
+    sesion.pausar()
+    return 200, 'application/json', sesion.estado()
+
+
+# (método, acción) -> manejador, para /sesiones/<nombre>/<acción>.
+# Además: GET /sesiones, GET|POST|DELETE /sesiones/<nombre> y el WebSocket
+# /sesiones/<nombre>/stream?formato=u1|f4.
+RUTAS = {
+    ('POST', 'paso'): _paso,                # {"n": 1, "alpha": 0.05} -> paso y métricas
+    ('POST', 'inyectar'): _inyectar,        # Patrón de ansiedad en el centro
+    ('POST', 'reset'): _reset,              # {"semilla": 123} (opcional)
+    ('GET', 'metricas'): _metricas,
+    ('GET', 'instantanea'): _instantanea,   # Instantánea binaria (instantanea_campo.py); ?comprimir=1
+    ('POST', 'animar'): _animar,            # {"pasos_por_segundo": 60} (opcional)
+    ('POST', 'pausar'): _pausar,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local (HTTP + WebSocket) del campo N.")
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--trabajadores", type=int, default=None, help="hilos del pool compartido (por defecto, uno por CPU)")
+    parser.add_argument("--tam", type=int, default=TAMANO_CAMPO, help="lado del campo de las sesiones nuevas")
+    args = parser.parse_args()
+    try:
+        asyncio.run(ServidorCampo(HOST, args.puerto, args.trabajadores, args.tam).servir())
+    except KeyboardInterrupt:
+        print("\n👋 Servidor detenido.")
@@ -0,0 +1,189 @@
+import threading
+import time
+import numpy as np
+
+# --- SIMULACIÓN EN SEGUNDO PLANO ---
+# La evolución del campo corre en un hilo propio y publica el último fotograma
+# (campo + métricas + paso) en un doble buffer; la interfaz lo recoge a su propio
+# ritmo. Si la interfaz no da abasto, los fotogramas intermedios se sobrescriben
+# sin mostrarse: los pasos por segundo de la simulación no dependen del coste de
+# dibujar, y ninguno de los dos lados espera al otro más allá de un intercambio
+# de índices.
+#
+# El doble buffer lleva un tercer hueco para el lector: el hilo escribe siempre
+# en el hueco libre y lo intercambia con el "listo"; el lector intercambia el
+# "listo" con el suyo solo cuando hay uno nuevo. Así el fotograma que se está
+# dibujando nunca se sobrescribe.
+#
+# Cualquier cambio del laboratorio desde fuera del hilo (inyectar, resetear,
+# importar...) debe hacerse dentro de `with simulacion.candado:`.
+
+PASOS_POR_SEGUNDO = 60      # Ritmo objetivo de la simulación (None: tan rápido como pueda)
+SUAVIZADO_RITMO = 0.9       # Peso del valor anterior en la media móvil de los ritmos
+
+
+class Fotograma:
+    """
+    Hueco del buffer: copia del campo y sus métricas en un paso dado.
+    """
+    def __init__(self, forma, dtype):
+        self.campo = np.empty(forma, dtype=dtype)
+        self.metricas = None
+        self.paso = -1
+        self.secuencia = -1
+
+
+class MedidorRitmo:
+    """
+    Eventos por segundo, suavizados con una media móvil exponencial.
+    """
+    def __init__(self, suavizado=SUAVIZADO_RITMO):
+        self.suavizado = suavizado
+        self.ritmo = 0.0
+        self._ultimo = None
+
+    def marcar(self, n=1):
+        ahora = time.perf_counter()
+        if self._ultimo is not None and ahora > self._ultimo:
+            instantaneo = n / (ahora - self._ultimo)
+            self.ritmo = instantaneo if self.ritmo == 0.0 else (
+                self.suavizado * self.ritmo + (1 - self.suavizado) * instantaneo)
+        self._ultimo = ahora
+
+    def reiniciar(self):
+        self.ritmo = 0.0
+        self._ultimo = None
+
+
+class SimulacionEnFondo:
+    """
+    Hilo que evoluciona `lab` con evolucionar_campo(alpha) y publica cada fotograma.
+    `ultimo_fotograma()` devuelve el más reciente (o None si no hay uno nuevo).
+    """
+    def __init__(self, lab, alpha=0.05, pasos_por_segundo=PASOS_POR_SEGUNDO):
+        self.lab = lab
+        self.alpha = alpha
+        self.pasos_por_segundo = pasos_por_segundo
+        self.candado = threading.RLock()      # Protege al laboratorio
+        self._intercambio = threading.Lock()  # Protege los índices del buffer
+        self._huecos = None
+        self._escritura, self._listo, self._lectura = 0, 1, 2
+        self._hay_nuevo = False
+        self._secuencia = 0
+        self._hilo = None
+        self._activa = threading.Event()
+        self._detener = threading.Event()
+        self.ritmo_simulacion = MedidorRitmo()
+        self.publicados = 0
+        self.recogidos = 0
+        self.error = None
+
+    # --- Lado de la simulación ---
+
+    def _preparar_huecos(self, campo):
+        if self._huecos is None or self._huecos[0].campo.shape != campo.shape or self._huecos[0].campo.dtype != campo.dtype:
+            self._huecos = [Fotograma(campo.shape, campo.dtype) for _ in range(3)]
+
+    def publicar(self):
+        """
+        Copia el estado actual del laboratorio al hueco de escritura y lo publica.
+        Se llama desde el hilo (o desde fuera con el candado tomado).
+        """
+        with self.candado:
+            campo = self.lab.campo
+            with self._intercambio:
+                self._preparar_huecos(campo)
+                hueco = self._huecos[self._escritura]
+            np.copyto(hueco.campo, campo)
+            hueco.metricas = dict(self.lab.calcular_metricas())
+            hueco.paso = self.lab.pasos
+        with self._intercambio:
+            if self._huecos[self._escritura] is hueco:
+                self._secuencia += 1
+                hueco.secuencia = self._secuencia
+                self._escritura, self._listo = self._listo, self._escritura
+                self._hay_nuevo = True
+                self.publicados += 1
+
+    def _bucle(self):
+        siguiente = time.perf_counter()
+        try:
+            while not self._detener.is_set():
+                if not self._activa.wait(timeout=0.1):
+                    continue
+                with self.candado:
+                    # pausar() pudo llegar mientras se esperaba el candado: ese paso ya no se da
+                    if not self._activa.is_set() or self._detener.is_set():
+                        continue
+                    self.lab.evolucionar_campo(self.alpha)
+                    self.publicar()
+                self.ritmo_simulacion.marcar()
+                if self.pasos_por_segundo:
+                    siguiente = max(siguiente + 1.0 / self.pasos_por_segundo, time.perf_counter() - 0.1)
+                    espera = siguiente - time.perf_counter()
+                    if espera > 0:
+                        time.sleep(espera)
+                else:
+                    time.sleep(0)  # Cede el GIL a la interfaz entre pasos
+        except Exception as e:
+            self.error = e
+            self._activa.clear()
+
+    # --- Control ---
+
+    def iniciar(self):
+        """
+        Arranca (o reanuda) la simulación.
+        """
+        self.error = None
+        self.ritmo_simulacion.reiniciar()
+        self._activa.set()
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="simulacion", daemon=True)
+            self._hilo.start()
+
+    def pausar(self):
+        """
+        Pausa la simulación; al volver, el paso en curso ya ha terminado.
+        """
+        self._activa.clear()
+        with self.candado:
+            pass
+
+    def detener(self):
+        """
+        Termina el hilo.
+        """
+        self._detener.set()
+        self._activa.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+        self._activa.clear()
+
+    @property
+    def activa(self):
+        return self._activa.is_set()
+
+    # --- Lado de la interfaz ---
+
+    def ultimo_fotograma(self):
+        """
+        Devuelve el fotograma publicado más reciente si hay uno que no se haya recogido
+        todavía, o None. El fotograma devuelto no se modifica hasta la siguiente llamada.
+        """
+        with self._intercambio:
+            if not self._hay_nuevo:
+                return None
+            self._lectura, self._listo = self._listo, self._lectura
+            self._hay_nuevo = False
+            self.recogidos += 1
+            return self._huecos[self._lectura]
+
+    @property
+    def descartados(self):
+        """
+        Fotogramas publicados que nunca llegaron a recogerse.
+        """
+        return max(self.publicados - self.recogidos - int(self._hay_nuevo), 0)
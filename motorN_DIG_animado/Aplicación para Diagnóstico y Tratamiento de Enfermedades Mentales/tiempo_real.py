@@ -0,0 +1,352 @@
+import numpy as np
+import json
+import threading
+import time
+import wave
+from scipy import signal
+
+from laboratorio_n import (TASA_MUESTREO, BANDA_ACTIVACION, GANANCIA_ACTIVACION,
+                           FREQ_TONO_AUDIBLE, GANANCIA_TONO)
+from flujo_wav import PICO_ACUMULADO, abrir_wav, bloques_normalizados
+
+# --- CONTRAONDA EN TIEMPO REAL ---
+# Cadena encoder -> procesador -> decoder para señales en vivo:
+#
+#   fuente --> [buffer circular de entrada] --> hilo de proceso --> [buffer circular de salida] --> sumidero
+#
+# El hilo de proceso toma bloques de tamaño fijo y aplica la contraonda con un filtro
+# precalculado: una cascada de biquads IIR (Butterworth pasa-banda sobre BANDA_ACTIVACION,
+# con GANANCIA_ACTIVACION) cuyo estado se conserva entre bloques, más un oscilador de
+# 440 Hz con fase continua. No hay FFT por bloque, así que el coste es O(tam_bloque).
+#
+# La latencia de cada bloque se mide desde que su última muestra entra en el buffer de
+# entrada hasta que el bloque procesado está disponible en el de salida. A eso se suma
+# la latencia de acumular el bloque (tam_bloque / tasa) y el retardo de grupo del filtro.
+
+ORDEN_FILTRO = 4              # Orden del prototipo Butterworth (el pasa-banda tiene el doble)
+TAMANOS_BLOQUE = (64, 128, 256, 512, 1024, 2048)
+DURACION_PRUEBA = 2.0         # Segundos de señal por tamaño de bloque en el informe
+CAIDA_PICO = 0.9999           # Decaimiento por muestra del seguidor de pico del tono
+
+
+class BufferCircular:
+    """
+    Buffer circular sin bloqueos para un productor y un consumidor (SPSC).
+
+    El productor solo modifica `_escrito` y el consumidor solo `_leido`; ambos son
+    contadores monótonos y cada uno se publica con una única asignación de atributo
+    (atómica en CPython) después de copiar los datos, así que ningún hilo ve datos a medias.
+    """
+    def __init__(self, capacidad, dtype=np.float32):
+        self.capacidad = 1 << (int(capacidad) - 1).bit_length()
+        self._mascara = self.capacidad - 1
+        self._datos = np.zeros(self.capacidad, dtype=dtype)
+        self._escrito = 0
+        self._leido = 0
+
+    def disponible(self):
+        """
+        Muestras listas para leer.
+        """
+        return self._escrito - self._leido
+
+    def libre(self):
+        """
+        Huecos libres para escribir.
+        """
+        return self.capacidad - (self._escrito - self._leido)
+
+    def escribir(self, bloque):
+        """
+        Escribe tantas muestras de `bloque` como quepan y devuelve cuántas escribió.
+        """
+        n = min(len(bloque), self.libre())
+        inicio = self._escrito & self._mascara
+        primero = min(n, self.capacidad - inicio)
+        self._datos[inicio:inicio + primero] = bloque[:primero]
+        self._datos[:n - primero] = bloque[primero:n]
+        self._escrito += n
+        return n
+
+    def leer(self, n, salida=None):
+        """
+        Lee hasta `n` muestras (en `salida` si se da) y devuelve el array leído.
+        """
+        n = min(n, self.disponible())
+        if salida is None:
+            salida = np.empty(n, dtype=self._datos.dtype)
+        inicio = self._leido & self._mascara
+        primero = min(n, self.capacidad - inicio)
+        salida[:primero] = self._datos[inicio:inicio + primero]
+        salida[primero:n] = self._datos[:n - primero]
+        self._leido += n
+        return salida[:n]
+
+
+class FiltroContraonda:
+    """
+    Contraonda muestra a muestra: pasa-banda IIR (biquads en cascada) con ganancia y
+    un tono de fase continua. La amplitud del tono es fija si se indica `amplitud_tono`;
+    si no, es GANANCIA_TONO veces un seguidor de pico de la entrada.
+    """
+    def __init__(self, tasa_muestreo=TASA_MUESTREO, banda=BANDA_ACTIVACION, ganancia=GANANCIA_ACTIVACION,
+                 freq_tono=FREQ_TONO_AUDIBLE, ganancia_tono=GANANCIA_TONO, amplitud_tono=None,
+                 orden=ORDEN_FILTRO, dtype=np.float32):
+        self.tasa_muestreo = tasa_muestreo
+        self.dtype = np.dtype(dtype)
+        sos = signal.butter(orden, banda, btype='bandpass', output='sos', fs=tasa_muestreo)
+        sos[0, :3] *= ganancia
+        self.sos = sos
+        self._zi = np.zeros((sos.shape[0], 2))
+        self.ganancia_tono = ganancia_tono
+        self.amplitud_fija = amplitud_tono
+        self._pico = 0.0
+        self._incremento_fase = 2 * np.pi * freq_tono / tasa_muestreo
+        self._fase = 0.0
+
+    def retardo_grupo(self, freq):
+        """
+        Retardo de grupo del filtro (en segundos) a la frecuencia `freq`.
+        """
+        retardo = 0.0
+        for seccion in self.sos:
+            _, gd = signal.group_delay((seccion[:3], seccion[3:]), w=[freq], fs=self.tasa_muestreo)
+            retardo += gd[0]
+        return retardo / self.tasa_muestreo
+
+    def procesar(self, bloque):
+        """
+        Devuelve la contraonda del bloque, conservando el estado para el siguiente.
+        """
+        salida, self._zi = signal.sosfilt(self.sos, bloque, zi=self._zi)
+        if self.amplitud_fija is not None:
+            amplitud = self.amplitud_fija
+        else:
+            self._pico = max(self._pico * CAIDA_PICO ** len(bloque), float(np.max(np.abs(bloque))) if len(bloque) else 0.0)
+            amplitud = self.ganancia_tono * self._pico
+        fases = self._fase + self._incremento_fase * np.arange(len(bloque))
+        salida += amplitud * np.cos(fases)
+        self._fase = (self._fase + self._incremento_fase * len(bloque)) % (2 * np.pi)
+        return salida.astype(self.dtype, copy=False)
+
+
+class MotorTiempoReal:
+    """
+    Motor de contraonda en tiempo real: un hilo productor (la fuente), un hilo de proceso
+    y un hilo consumidor (el sumidero), comunicados por dos buffers circulares SPSC.
+    """
+    def __init__(self, tasa_muestreo=TASA_MUESTREO, tam_bloque=256, capacidad=None, amplitud_tono=None):
+        self.tasa_muestreo = tasa_muestreo
+        self.tam_bloque = int(tam_bloque)
+        capacidad = capacidad or 32 * self.tam_bloque
+        self.entrada = BufferCircular(capacidad)
+        self.salida = BufferCircular(capacidad)
+        self.filtro = FiltroContraonda(tasa_muestreo, amplitud_tono=amplitud_tono)
+        self._reiniciar_medidas()
+        self._fin_fuente = False
+        self._fin_proceso = False
+
+    def _reiniciar_medidas(self):
+        self.latencias = []
+        self.tiempos_proceso = []
+        self.desbordes = 0
+        self.latencias_perdidas = 0   # Bloques procesados sin instante de llegada registrado
+        self._llegadas = {}
+
+    def _productor(self, fuente, tiempo_real):
+        inicio = time.perf_counter()
+        enviadas = 0
+        completos = 0
+        for bloque in fuente:
+            bloque = np.asarray(bloque, dtype=np.float32)
+            if tiempo_real:
+                # Simula el reloj del dispositivo: el bloque está completo cuando llega su última muestra.
+                espera = inicio + (enviadas + len(bloque)) / self.tasa_muestreo - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+            escritas = 0
+            while escritas < len(bloque):
+                # Se escribe como mucho hasta el final del bloque de proceso en curso, y su
+                # instante de llegada se anota ANTES de publicarlo: el hilo de proceso no
+                # puede leer el bloque sin encontrar ya su entrada en _llegadas.
+                falta = (completos + 1) * self.tam_bloque - enviadas
+                tramo = bloque[escritas:escritas + falta]
+                if len(tramo) == falta:
+                    self._llegadas[completos] = time.perf_counter()
+                n = self.entrada.escribir(tramo)
+                if n == 0:
+                    self.desbordes += 1
+                    time.sleep(self.tam_bloque / self.tasa_muestreo / 4)
+                escritas += n
+                enviadas += n
+                if n == falta:
+                    completos += 1
+        self._fin_fuente = True
+
+    def _proceso(self):
+        bloque = np.empty(self.tam_bloque, dtype=np.float32)
+        indice = 0
+        espera = self.tam_bloque / self.tasa_muestreo / 8
+        while True:
+            disponible = self.entrada.disponible()
+            if disponible < self.tam_bloque:
+                if self._fin_fuente and self.entrada.disponible() < self.tam_bloque:
+                    # Último bloque incompleto: se procesa tal cual.
+                    resto = self.entrada.leer(self.tam_bloque, bloque)
+                    if len(resto):
+                        self._escribir_salida(self.filtro.procesar(resto))
+                    break
+                time.sleep(espera)
+                continue
+            t0 = time.perf_counter()
+            contraonda = self.filtro.procesar(self.entrada.leer(self.tam_bloque, bloque))
+            t1 = time.perf_counter()
+            self._escribir_salida(contraonda)
+            self.tiempos_proceso.append(t1 - t0)
+            llegada = self._llegadas.pop(indice, None)
+            if llegada is not None:
+                self.latencias.append(time.perf_counter() - llegada)
+            else:
+                self.latencias_perdidas += 1
+            indice += 1
+        self._fin_proceso = True
+
+    def _escribir_salida(self, contraonda):
+        escritas = 0
+        while escritas < len(contraonda):
+            n = self.salida.escribir(contraonda[escritas:])
+            if n == 0:
+                time.sleep(self.tam_bloque / self.tasa_muestreo / 8)
+            escritas += n
+
+    def _consumidor(self, sumidero):
+        espera = self.tam_bloque / self.tasa_muestreo / 8
+        while True:
+            if self.salida.disponible():
+                sumidero(self.salida.leer(self.salida.disponible()))
+            elif self._fin_proceso:
+                break
+            else:
+                time.sleep(espera)
+
+    def ejecutar(self, fuente, sumidero, tiempo_real=True):
+        """
+        Ejecuta la cadena completa hasta agotar la fuente. `fuente` es un iterable de bloques
+        (de cualquier tamaño) y `sumidero` una función que recibe los bloques de salida.
+        Con `tiempo_real`, la fuente entrega las muestras al ritmo de la tasa de muestreo.
+        Las medidas (latencias, tiempos, desbordes) empiezan de cero en cada ejecución.
+        """
+        self._reiniciar_medidas()
+        self._fin_fuente = False
+        self._fin_proceso = False
+        hilos = [threading.Thread(target=self._productor, args=(fuente, tiempo_real), daemon=True),
+                 threading.Thread(target=self._proceso, daemon=True),
+                 threading.Thread(target=self._consumidor, args=(sumidero,), daemon=True)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    def resumen(self):
+        """
+        Latencia y rendimiento medidos en la última ejecución.
+        """
+        tiempos = np.array(self.tiempos_proceso) if self.tiempos_proceso else np.zeros(1)
+        latencias = np.array(self.latencias) if self.latencias else np.zeros(1)
+        acumulacion = self.tam_bloque / self.tasa_muestreo
+        centro_banda = np.sqrt(BANDA_ACTIVACION[0] * BANDA_ACTIVACION[1])
+        return {
+            'tam_bloque': self.tam_bloque,
+            'bloques': len(self.tiempos_proceso),
+            'acumulacion_ms': 1000 * acumulacion,
+            'proceso_medio_ms': 1000 * float(tiempos.mean()),
+            'proceso_p99_ms': 1000 * float(np.percentile(tiempos, 99)),
+            'latencia_media_ms': 1000 * float(latencias.mean()),
+            'latencia_p99_ms': 1000 * float(np.percentile(latencias, 99)),
+            'latencia_max_ms': 1000 * float(latencias.max()),
+            'latencia_total_p99_ms': 1000 * (acumulacion + float(np.percentile(latencias, 99))),
+            'retardo_grupo_filtro_ms': 1000 * self.filtro.retardo_grupo(centro_banda),
+            'x_tiempo_real': acumulacion / float(tiempos.mean()) if tiempos.mean() > 0 else float('inf'),
+            'desbordes': self.desbordes,
+            'latencias_perdidas': self.latencias_perdidas,
+        }
+
+
+# --- FUENTES Y SUMIDEROS DE PRUEBA ---
+
+def fuente_sintetica(tasa_muestreo=TASA_MUESTREO, duracion=DURACION_PRUEBA, tam_bloque=1024, semilla=0):
+    """
+    Señal tipo 'depresión' (3 y 6 Hz más ruido) generada bloque a bloque.
+    """
+    rng = np.random.default_rng(semilla)
+    total = int(duracion * tasa_muestreo)
+    for inicio in range(0, total, tam_bloque):
+        t = np.arange(inicio, min(inicio + tam_bloque, total)) / tasa_muestreo
+        bloque = 0.7 * np.sin(2 * np.pi * 3 * t) + 0.5 * np.sin(2 * np.pi * 6 * t)
+        bloque += 0.1 * rng.standard_normal(t.size)
+        yield (bloque / 1.3).astype(np.float32)
+
+
+def fuente_archivo(ruta, tam_bloque=1024):
+    """
+    Lee un .wav por bloques con normalización de pico acumulado (una sola pasada, como un dispositivo).
+    """
+    _, datos = abrir_wav(ruta)
+    yield from bloques_normalizados(datos, tam_bloque, PICO_ACUMULADO)
+
+
+class SumideroWav:
+    """
+    Escribe los bloques de salida en un .wav int16 a medida que llegan. Como en vivo no se
+    conoce el pico global, la señal se multiplica por `escala` y se recorta a [-1, 1].
+    """
+    def __init__(self, ruta, tasa_muestreo=TASA_MUESTREO, escala=0.25):
+        self.escala = escala
+        self._wav = wave.open(ruta, 'wb')
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(int(tasa_muestreo))
+
+    def __call__(self, bloque):
+        datos = np.clip(bloque * self.escala, -1, 1)
+        self._wav.writeframes((datos * np.iinfo(np.int16).max).astype('<i2').tobytes())
+
+    def cerrar(self):
+        self._wav.close()
+
+
+def informe_latencia(tamanos_bloque=TAMANOS_BLOQUE, duracion=DURACION_PRUEBA, tasa_muestreo=TASA_MUESTREO,
+                     tiempo_real=True):
+    """
+    Ejecuta el motor con una fuente sintética para cada tamaño de bloque y devuelve
+    la latencia y el rendimiento medidos.
+    """
+    filas = []
+    for tam_bloque in tamanos_bloque:
+        motor = MotorTiempoReal(tasa_muestreo, tam_bloque)
+        motor.ejecutar(fuente_sintetica(tasa_muestreo, duracion, tam_bloque), lambda bloque: None, tiempo_real)
+        filas.append(motor.resumen())
+    return filas
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Latencia y rendimiento de la contraonda en tiempo real.")
+    parser.add_argument("--bloques", nargs="+", type=int, default=list(TAMANOS_BLOQUE), help="tamaños de bloque")
+    parser.add_argument("--duracion", type=float, default=DURACION_PRUEBA, help="segundos de señal por tamaño")
+    parser.add_argument("--sin-reloj", action="store_true", help="alimentar tan rápido como sea posible (rendimiento)")
+    parser.add_argument("--json", help="guardar el informe en este archivo")
+    args = parser.parse_args()
+
+    filas = informe_latencia(args.bloques, args.duracion, tiempo_real=not args.sin_reloj)
+    print(f"\n⏱️  Contraonda en tiempo real ({'sin reloj' if args.sin_reloj else 'ritmo real'}, {args.duracion} s por bloque)\n")
+    print(f"{'bloque':>7} {'acum. ms':>9} {'proc. ms':>9} {'lat. p99 ms':>12} {'total p99 ms':>13} {'x t. real':>10} {'desbordes':>10}")
+    for fila in filas:
+        print(f"{fila['tam_bloque']:>7} {fila['acumulacion_ms']:>9.2f} {fila['proceso_medio_ms']:>9.3f} "
+              f"{fila['latencia_p99_ms']:>12.3f} {fila['latencia_total_p99_ms']:>13.2f} "
+              f"{fila['x_tiempo_real']:>10.1f} {fila['desbordes']:>10}")
+    print(f"\nRetardo de grupo del filtro en el centro de la banda: {filas[0]['retardo_grupo_filtro_ms']:.1f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(filas, f, indent=2)
+        print(f"Informe guardado en '{args.json}'.")
@@ -0,0 +1,224 @@
+import json
+import os
+import zlib
+import numpy as np
+
+# --- TRAYECTORIAS DEL CAMPO N ---
+# Graba cada paso de una evolución larga en disco, solo añadiendo al final, y
+# permite leer cualquier paso sin cargar el resto. Se usan dos archivos:
+#
+# - datos (.tray): MAGIA | longitud de la cabecera (uint32) | cabecera JSON |
+#   bloques. Cada bloque agrupa hasta FRAMES_POR_BLOQUE pasos cuantizados a
+#   uint16 sobre `rango`: el primero completo y los demás como diferencia con el
+#   anterior (módulo 2^16, sin pérdida adicional), todo comprimido con zlib. Los
+#   pasos de una difusión cambian poco, así que las diferencias comprimen mucho.
+# - índice (.tray.idx): un registro fijo de INDICE_CAMPOS uint64 por bloque
+#   (desplazamiento, bytes, primer paso, número de pasos). Con registros de
+#   tamaño fijo y bloques llenos salvo el último, el bloque de un paso se calcula
+#   directamente: ir a cualquier paso cuesta leer un registro y un bloque.
+#
+# El índice se escribe después de cada bloque, así que una trayectoria que se
+# está grabando ya se puede leer hasta su último bloque completo.
+# La cuantización tiene un error máximo de (rango[1] - rango[0]) / 131070 por
+# celda (~7.6e-6 para [0, 1]); los valores fuera de `rango` se recortan.
+
+MAGIA_TRAYECTORIA = b"CAMPONT\x01"   # Identificador del formato (último byte: versión 1)
+EXTENSION_TRAYECTORIA = ".tray"
+EXTENSION_INDICE = ".idx"
+FRAMES_POR_BLOQUE = 64               # Pasos por bloque comprimido
+NIVEL_ZLIB = 6
+RANGO_CAMPO = (0.0, 1.0)             # Rango de valores cuantizado
+INDICE_CAMPOS = 4                    # uint64 por registro del índice
+NIVELES = np.iinfo(np.uint16).max
+
+
+def ruta_indice(ruta):
+    """
+    Ruta del índice asociado a un archivo de trayectoria.
+    """
+    return ruta + EXTENSION_INDICE
+
+
+class EscritorTrayectoria:
+    """
+    Añade pasos del campo a una trayectoria nueva. Usar como gestor de contexto
+    o llamar a `cerrar` para volcar el último bloque.
+    """
+    def __init__(self, ruta, forma, frames_por_bloque=FRAMES_POR_BLOQUE, rango=RANGO_CAMPO,
+                 paso_inicial=0, semilla=None, nivel=NIVEL_ZLIB):
+        self.ruta = ruta
+        self.forma = tuple(forma)
+        self.frames_por_bloque = int(frames_por_bloque)
+        self.rango = (float(rango[0]), float(rango[1]))
+        self.nivel = nivel
+        self.n_frames = 0
+        self._escala = NIVELES / (self.rango[1] - self.rango[0])
+        self._pendientes = np.empty((self.frames_por_bloque,) + self.forma, dtype=np.uint16)
+        self._n_pendientes = 0
+
+        cabecera = {
+            'forma': list(self.forma),
+            'frames_por_bloque': self.frames_por_bloque,
+            'rango': list(self.rango),
+            'paso_inicial': int(paso_inicial),
+            'semilla': semilla,
+        }
+        texto = json.dumps(cabecera).encode('utf-8')
+        self._datos = open(ruta, 'wb')
+        self._datos.write(MAGIA_TRAYECTORIA)
+        self._datos.write(np.array(len(texto), dtype='<u4').tobytes())
+        self._datos.write(texto)
+        self._datos.flush()
+        self._indice = open(ruta_indice(ruta), 'wb')
+
+    def cuantizar(self, campo):
+        """
+        Convierte un campo a uint16 sobre el rango de la trayectoria.
+        """
+        q = (np.asarray(campo, dtype=np.float32) - np.float32(self.rango[0])) * np.float32(self._escala)
+        np.clip(q, 0, NIVELES, out=q)
+        return np.rint(q, out=q).astype(np.uint16)
+
+    def agregar(self, campo):
+        """
+        Añade un paso. Devuelve su índice dentro de la trayectoria.
+        """
+        if campo.shape != self.forma:
+            raise ValueError(f"El campo tiene forma {campo.shape}, la trayectoria {self.forma}")
+        self._pendientes[self._n_pendientes] = self.cuantizar(campo)
+        self._n_pendientes += 1
+        self.n_frames += 1
+        if self._n_pendientes == self.frames_por_bloque:
+            self._volcar()
+        return self.n_frames - 1
+
+    def _volcar(self):
+        n = self._n_pendientes
+        if n == 0:
+            return
+        frames = self._pendientes[:n]
+        # Diferencias con el paso anterior; en uint16 la resta se envuelve módulo 2^16.
+        deltas = np.empty_like(frames)
+        deltas[0] = frames[0]
+        np.subtract(frames[1:], frames[:-1], out=deltas[1:])
+        carga = zlib.compress(deltas.astype('<u2', copy=False).tobytes(), self.nivel)
+        desplazamiento = self._datos.tell()
+        self._datos.write(carga)
+        self._datos.flush()
+        registro = np.array([desplazamiento, len(carga), self.n_frames - n, n], dtype='<u8')
+        self._indice.write(registro.tobytes())
+        self._indice.flush()
+        self._n_pendientes = 0
+
+    def cerrar(self):
+        """
+        Vuelca el bloque incompleto y cierra los archivos.
+        """
+        if self._datos.closed:
+            return
+        self._volcar()
+        self._datos.close()
+        self._indice.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class LectorTrayectoria:
+    """
+    Acceso aleatorio y perezoso a una trayectoria: `lector[i]` devuelve el paso i
+    como float32 descomprimiendo solo su bloque (se conserva el último bloque
+    leído para recorridos secuenciales). `len(lector)` es el número de pasos.
+    """
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._datos = open(ruta, 'rb')
+        if self._datos.read(len(MAGIA_TRAYECTORIA)) != MAGIA_TRAYECTORIA:
+            self._datos.close()
+            raise ValueError(f"'{ruta}' no es una trayectoria del campo N")
+        longitud = int(np.frombuffer(self._datos.read(4), dtype='<u4')[0])
+        cabecera = json.loads(self._datos.read(longitud).decode('utf-8'))
+        self.cabecera = cabecera
+        self.forma = tuple(cabecera['forma'])
+        self.frames_por_bloque = cabecera['frames_por_bloque']
+        self.rango = tuple(cabecera['rango'])
+        self.paso_inicial = cabecera['paso_inicial']
+        self._paso_cuantizado = np.float32((self.rango[1] - self.rango[0]) / NIVELES)
+        self._bloque_en_cache = None
+        self._frames_en_cache = None
+        self._deltas = None
+        self._reconstruidos = 0
+        self.actualizar()
+
+    def actualizar(self):
+        """
+        Vuelve a leer el índice (para seguir una trayectoria que aún se está grabando).
+        """
+        tam_registro = INDICE_CAMPOS * 8
+        n_registros = os.path.getsize(ruta_indice(self.ruta)) // tam_registro
+        if n_registros:
+            self._indice = np.memmap(ruta_indice(self.ruta), dtype='<u8', mode='r',
+                                     shape=(n_registros, INDICE_CAMPOS))
+        else:
+            self._indice = np.zeros((0, INDICE_CAMPOS), dtype='<u8')
+        self.n_frames = int(self._indice[-1, 2] + self._indice[-1, 3]) if n_registros else 0
+
+    def __len__(self):
+        return self.n_frames
+
+    def _frame_cuantizado(self, i_bloque, dentro):
+        # Reconstruye los pasos del bloque sumando diferencias, solo hasta `dentro`;
+        # lo ya reconstruido se conserva para los siguientes pasos del mismo bloque.
+        if i_bloque != self._bloque_en_cache:
+            desplazamiento, n_bytes, _, n = (int(v) for v in self._indice[i_bloque])
+            self._datos.seek(desplazamiento)
+            deltas = np.frombuffer(zlib.decompress(self._datos.read(n_bytes)), dtype='<u2')
+            self._deltas = deltas.reshape((n,) + self.forma)
+            self._frames_en_cache = np.empty(self._deltas.shape, dtype=np.uint16)
+            self._frames_en_cache[0] = self._deltas[0]
+            self._reconstruidos = 1
+            self._bloque_en_cache = i_bloque
+        frames = self._frames_en_cache
+        # Paso a paso: más rápido que np.cumsum(axis=0) sobre arrays C-contiguos.
+        for k in range(self._reconstruidos, dentro + 1):
+            np.add(frames[k - 1], self._deltas[k], out=frames[k])
+        self._reconstruidos = max(self._reconstruidos, dentro + 1)
+        return frames[dentro]
+
+    def cuantizado(self, i):
+        """
+        Paso i como uint16 (sin convertir a float).
+        """
+        if i < 0:
+            i += self.n_frames
+        if not 0 <= i < self.n_frames:
+            raise IndexError(f"Paso {i} fuera de la trayectoria (0-{self.n_frames - 1})")
+        i_bloque, dentro = divmod(i, self.frames_por_bloque)
+        return self._frame_cuantizado(i_bloque, dentro)
+
+    def __getitem__(self, i):
+        q = self.cuantizado(i)
+        return q.astype(np.float32) * self._paso_cuantizado + np.float32(self.rango[0])
+
+    def __iter__(self):
+        for i in range(self.n_frames):
+            yield self[i]
+
+    def paso(self, i):
+        """
+        Número de paso de simulación del frame i.
+        """
+        return self.paso_inicial + i
+
+    def cerrar(self):
+        self._datos.close()
+        self._indice = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
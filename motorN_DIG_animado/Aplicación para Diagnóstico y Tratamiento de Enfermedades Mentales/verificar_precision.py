@@ -0,0 +1,143 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import scipy.io.wavfile as wav
+
+from laboratorio_n import LaboratorioN, TASA_MUESTREO, PRECISION_DOBLE, PRECISION_SIMPLE
+from instantanea_campo import EXTENSION_INSTANTANEA
+
+# --- VERIFICACIÓN DE LA PRECISIÓN SIMPLE ---
+# Ejecuta las mismas operaciones con dos LaboratorioN, uno en float64 y otro en
+# float32, y comprueba que:
+#
+# - en float32 no hay subidas de precisión: campo, señales y contraonda salen en
+#   float32 (y los espectros en complex64, porque la contraonda vuelve en float32);
+# - la diferencia con float64 está por debajo de las COTAS de cada etapa;
+# - en float64 tampoco se baja: una instantánea (float32 en disco) o una ventana
+#   float32 como las de encoder_edf pasan a float64 (espectros en complex128).
+#
+# Sale con código 1 si alguna comprobación falla, así que sirve para lanzarla a
+# mano tras tocar el encoder, el procesador o el motor de difusión.
+
+COTAS = {
+    'campo': 1e-5,        # Máx. |diferencia| del campo tras evolucionar (valores en [0, 1])
+    'metricas': 1e-4,     # Diferencia relativa de entropía y varianza
+    'encoder': 1e-6,      # Máx. |diferencia| de las señales normalizadas a [-1, 1]
+    'contraonda': 1e-4,   # Máx. |diferencia| relativa al pico de la contraonda float64
+}
+PASOS_CAMPO = 200
+SEGUNDOS_SEÑAL = 5
+SEMILLA = 1234
+
+
+def _silencioso(funcion, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return funcion(*args, **kwargs)
+
+
+def _desviacion_relativa(a, b):
+    return float(np.max(np.abs(a.astype(np.float64) - b)) / max(float(np.max(np.abs(b))), 1e-12))
+
+
+def _fixtures(directorio, segundos, tasa):
+    # Un .wav estéreo int16 (ruido + seno, con el mínimo -32768) y un .png RGBA
+    rng = np.random.default_rng(SEMILLA)
+    t = np.arange(int(segundos * tasa)) / tasa
+    mono = 0.6 * np.sin(2 * np.pi * 6 * t) + 0.3 * np.sin(2 * np.pi * 30 * t) + 0.1 * rng.standard_normal(t.size)
+    estereo = np.stack((mono, 0.8 * mono[::-1]), axis=1)
+    estereo = (estereo / np.max(np.abs(estereo)) * 32767).astype(np.int16)
+    estereo[0, 0] = -32768
+    ruta_wav = os.path.join(directorio, "precision.wav")
+    wav.write(ruta_wav, tasa, estereo)
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    ruta_png = os.path.join(directorio, "precision.png")
+    plt.imsave(ruta_png, rng.random((64, 96)), cmap='viridis')
+    return ruta_wav, ruta_png
+
+
+def verificar(pasos=PASOS_CAMPO, segundos=SEGUNDOS_SEÑAL, tam=64, tasa=TASA_MUESTREO):
+    """
+    Compara float32 con float64 en cada etapa. Devuelve una lista de
+    (etapa, desviación, cota, dtype obtenido, dtype esperado, correcto).
+    """
+    doble = _silencioso(LaboratorioN, tasa, tam, SEMILLA, dtype=PRECISION_DOBLE)
+    simple = _silencioso(LaboratorioN, tasa, tam, SEMILLA, dtype=PRECISION_SIMPLE)
+    filas = []
+
+    def anotar(etapa, desviacion, cota, obtenido, esperado=PRECISION_SIMPLE):
+        correcto = desviacion <= cota and np.dtype(obtenido) == np.dtype(esperado)
+        filas.append((etapa, desviacion, cota, np.dtype(obtenido), np.dtype(esperado), correcto))
+
+    # Campo: misma semilla, misma inyección y los mismos pasos de difusión
+    anotar('campo inicial', float(np.max(np.abs(simple.campo - doble.campo))), COTAS['campo'], simple.campo.dtype)
+    for lab in (doble, simple):
+        lab.inyectar_patron_ansiedad()
+        lab.evolve(pasos)
+    anotar('campo evolucionado', float(np.max(np.abs(simple.campo - doble.campo))), COTAS['campo'],
+           simple.campo.dtype)
+    m_doble, m_simple = doble.calcular_metricas(), simple.calcular_metricas()
+    for nombre in ('entropia', 'varianza'):
+        desviacion = abs(m_simple[nombre] - m_doble[nombre]) / max(abs(m_doble[nombre]), 1e-12)
+        anotar(f"métrica {nombre}", desviacion, COTAS['metricas'], simple.campo.dtype)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_wav, ruta_png = _fixtures(directorio, segundos, tasa)
+
+        # Encoder
+        s_doble, s_simple = _silencioso(doble.encoder, ruta_wav), _silencioso(simple.encoder, ruta_wav)
+        anotar('encoder .wav', float(np.max(np.abs(s_simple - s_doble))), COTAS['encoder'], s_simple.dtype)
+        i_doble, i_simple = _silencioso(doble.encoder, ruta_png), _silencioso(simple.encoder, ruta_png)
+        anotar('encoder .png', float(np.max(np.abs(i_simple - i_doble))), COTAS['encoder'], i_simple.dtype)
+
+        # Procesador entrópico: FFT, banda de activación, tono e inversa
+        c_doble = _silencioso(doble.procesador_entropico, s_doble, nombre_grafico=None)
+        c_simple = _silencioso(simple.procesador_entropico, s_simple, nombre_grafico=None)
+        anotar('contraonda', _desviacion_relativa(c_simple, c_doble), COTAS['contraonda'], c_simple.dtype)
+
+        # Instantánea binaria: vuelve exactamente en float32
+        ruta = os.path.join(directorio, "precision" + EXTENSION_INSTANTANEA)
+        _silencioso(simple.exportar_estado, ruta)
+        copia = _silencioso(LaboratorioN, tasa, tam, dtype=PRECISION_SIMPLE)
+        copia.importar_estado(ruta)
+        anotar('instantánea', float(np.max(np.abs(copia.campo - simple.campo))), 0.0, copia.campo.dtype)
+
+        # En float64 nada cambia de tipo...
+        anotar('float64 sin cambios', 0.0, 0.0, np.result_type(doble.campo, s_doble, c_doble), PRECISION_DOBLE)
+
+        # ...aunque lo que entre sea float32: una instantánea binaria...
+        _silencioso(doble.exportar_estado, ruta)
+        copia = _silencioso(LaboratorioN, tasa, tam, dtype=PRECISION_DOBLE)
+        copia.importar_estado(ruta)
+        desviacion = float(np.max(np.abs(copia.campo - doble.campo.astype(np.float32))))
+        copia.evolucionar_campo()
+        anotar('instantánea en float64', desviacion, 0.0, copia.campo.dtype, PRECISION_DOBLE)
+
+        # ...o una ventana float32 (encoder_edf): la FFT es complex128 y la contraonda float64
+        c_ventana = _silencioso(doble.procesador_entropico, s_doble.astype(np.float32), nombre_grafico=None)
+        anotar('ventana float32 en float64', _desviacion_relativa(c_ventana, c_doble), COTAS['contraonda'],
+               c_ventana.dtype, PRECISION_DOBLE)
+    return filas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el modo float32 del laboratorio con float64.")
+    parser.add_argument("--pasos", type=int, default=PASOS_CAMPO, help="pasos de difusión del campo")
+    parser.add_argument("--segundos", type=float, default=SEGUNDOS_SEÑAL, help="duración de la señal de prueba")
+    parser.add_argument("--tam", type=int, default=64, help="lado del campo")
+    args = parser.parse_args()
+
+    filas = verificar(args.pasos, args.segundos, args.tam)
+    for etapa, desviacion, cota, obtenido, esperado, correcto in filas:
+        tipo = str(obtenido) if obtenido == esperado else f"{obtenido} (se esperaba {esperado})"
+        print(f"{'✅' if correcto else '❌'} {etapa:<22} desviación {desviacion:.2e}  (cota {cota:.0e})  {tipo}")
+    fallos = sum(not fila[-1] for fila in filas)
+    print(f"\n--- {len(filas) - fallos} correctas, {fallos} fallidas ---")
+    sys.exit(1 if fallos else 0)
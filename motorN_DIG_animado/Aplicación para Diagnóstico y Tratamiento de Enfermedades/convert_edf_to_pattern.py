@@ -1,54 +1,105 @@
 import numpy as np
 import json
+import os
+import sys
+import argparse
+import functools
 from datetime import datetime
 
+# The diffusion engine lives next to the Motor N lab application.
+MOTOR_N_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Aplicación para Diagnóstico y Tratamiento de Enfermedades Mentales")
+if MOTOR_N_DIR not in sys.path:
+    sys.path.insert(0, MOTOR_N_DIR)
+
+from motor_difusion import MotorDifusion
+from metricas_campo import mapa_varianza_local, puntos_calientes, regiones_sobre_umbral
+from lector_edf import LectorEDF
+
 DIM = 50
 CYCLE_COUNT = 0
+HOTSPOT_COUNT = 5
+REGION_THRESHOLD = 0.006  # local variance above which a cell counts as a high-entropy region
+PATTERN_SIZE = 7          # side of the injected pattern (cells)
 
 
 def calculate_entropy(field, r, c):
-    sub = field[max(0, r - 1):min(DIM, r + 2), max(0, c - 1):min(DIM, c + 2)]
+    rows, cols = field.shape
+    sub = field[max(0, r - 1):min(rows, r + 2), max(0, c - 1):min(cols, c + 2)]
     avg = np.mean(sub)
     variance = np.mean((sub - avg) ** 2)
     return variance
 
 
-def diffuse_step(field, alpha=0.05):
-    next_field = np.copy(field)
-    for r in range(DIM):
-        for c in range(DIM):
-            sub = field[max(0, r - 1):min(DIM, r + 2), max(0, c - 1):min(DIM, c + 2)]
-            avg = np.mean(sub)
-            next_field[r, c] += alpha * (avg - field[r, c])
-    return next_field
+@functools.lru_cache(maxsize=8)
+def diffusion_engine(shape, dtype):
+    """
+    Shared MotorDifusion for fields of this shape and dtype, so repeated steps
+    reuse its buffers instead of allocating a new engine each time.
+    """
+    return MotorDifusion(shape, dtype)
+
 
+def diffuse_step(field, alpha=0.05, tiles=None):
+    """
+    One diffusion step towards the clamped 3x3 neighbourhood mean, clipped to [0, 1]
+    like the tile path and the lab. Returns a new array unless `tiles` (a
+    motor_difusion.DifusionPorTeselas) is given: then only the active tiles are
+    recomputed and `field` is updated in place.
+    """
+    if tiles is not None:
+        tiles.paso(field, alpha)
+        return field
+    return diffusion_engine(field.shape, field.dtype).paso(field, alpha, salida=np.empty_like(field))
 
-def inject_pattern(field, pattern, x=21, y=21):
+
+def inject_pattern(field, pattern, x=21, y=21, tiles=None):
     h, w = pattern.shape
     field[y:y+h, x:x+w] = pattern
+    if tiles is not None:
+        tiles.marcar_region(y, y + h, x, x + w)
     return field
 
 
-def generate_anxiety_pattern():
-    return np.random.rand(7, 7)
-
-
-def generate_calm_pattern():
-    return np.array([[0.5 + 0.1 * np.sin((r + c) / 2) for c in range(7)] for r in range(7)])
-
-
-def export_output(field, last_pattern="none"):
-    flat = field.flatten()
-    avg = np.mean(flat)
-    varianza = np.var(flat)
-    max_entropia = -1
-    pos_max = (0, 0)
-    for r in range(DIM):
-        for c in range(DIM):
-            e = calculate_entropy(field, r, c)
-            if e > max_entropia:
-                max_entropia = e
-                pos_max = (r, c)
+def generate_anxiety_pattern(rng=None):
+    if rng is None:
+        return np.random.rand(7, 7)
+    return rng.random((7, 7))
+
+
+def generate_calm_pattern(rng=None):
+    # Smooth diagonal ripple 0.5 + 0.1 sin((row + col) / 2), built from an outer sum
+    return 0.5 + 0.1 * np.sin(np.add.outer(np.arange(7), np.arange(7)) / 2)
+
+
+def load_edf_pattern(path, channels=None, size=PATTERN_SIZE):
+    """
+    Builds a size x size pattern from a real EDF/EDF+ recording: row i is a channel
+    (channels are spread over the rows by nearest index) and column j the RMS of
+    that channel over the j-th of `size` equal time slices, scaled to [0, 1].
+    The file is memory-mapped and read one slice at a time.
+    """
+    with LectorEDF(path) as reader:
+        chosen = [reader.canal(c) for c in (reader.señales if channels is None else channels)]
+        rms = np.empty((len(chosen), size))
+        for i, channel in enumerate(chosen):
+            edges = np.linspace(0, reader.n_muestras(channel), size + 1).astype(np.int64)
+            for j in range(size):
+                window = reader.leer(channel, edges[j], edges[j + 1])
+                rms[i, j] = np.sqrt(np.mean(np.square(window, dtype=np.float64))) if window.size else 0.0
+    rows = rms[(np.arange(size) * len(chosen)) // size]
+    span = rows.max() - rows.min()
+    return (rows - rows.min()) / span if span > 0 else np.zeros_like(rows)
+
+
+def export_output(field, last_pattern="none", dissolution_steps=None, settled=True):
+    avg = np.mean(field)
+    varianza = np.var(field)
+    # Local variance of every cell in one pass (same values as calculate_entropy).
+    entropy_map = mapa_varianza_local(field)
+    hotspots = puntos_calientes(entropy_map, HOTSPOT_COUNT)
+    max_entropia, pos_max = hotspots[0][0], hotspots[0][1:]
+    regions = regiones_sobre_umbral(entropy_map, REGION_THRESHOLD)
 
     output = {
         "timestamp": datetime.utcnow().isoformat(),
@@ -60,8 +111,12 @@ def export_output(field, last_pattern="none"):
             "valor": float(max_entropia),
             "posicion": {"x": pos_max[1], "y": pos_max[0]}
         },
+        "puntos_calientes": [
+            {"valor": valor, "posicion": {"x": c, "y": r}} for valor, r, c in hotspots
+        ],
+        "regiones_alta_entropia": {"umbral": REGION_THRESHOLD, **regions},
         "promedio_global": float(avg),
-        "tiempo_disolucion_estimado": f"{max(10, 25 - int(varianza * 10000))} ciclos",
+        "tiempo_disolucion_estimado": dissolution_time(varianza, dissolution_steps, settled),
         "resonancia_detectada": bool(varianza > 0.006),
         "exportado_como_audio": "no",
         "notas": f"Respuesta al patrón '{last_pattern}'."
@@ -69,23 +124,60 @@ def export_output(field, last_pattern="none"):
     return output
 
 
-def run_simulation(pattern_func, label, steps=25):
-    field = np.random.uniform(0.4, 0.6, (DIM, DIM))
+def dissolution_time(varianza, dissolution_steps=None, settled=True):
+    """
+    Dissolution time in cycles. `dissolution_steps` is the step count measured by an
+    early-stopped evolution (`settled` is False if it hit the step cap first).
+    Without it, falls back to the variance heuristic.
+    """
+    if dissolution_steps is None:
+        return f"{max(10, 25 - int(varianza * 10000))} ciclos"
+    if not settled:
+        return f"más de {dissolution_steps} ciclos"
+    return f"{dissolution_steps} ciclos"
+
+
+def run_simulation(pattern_func, label, steps=25, dim=DIM, alpha=0.05, tol=None):
+    """
+    Injects a pattern into a noisy field and lets it diffuse for `steps` cycles.
+    With `tol`, `steps` is a cap: the run stops once the per-step change falls
+    below `tol` and the reported dissolution time is the measured step count.
+    """
+    field = np.random.uniform(0.4, 0.6, (dim, dim))
     pattern = pattern_func()
     field = inject_pattern(field, pattern)
-    for _ in range(steps):
-        field = diffuse_step(field)
-    return export_output(field, last_pattern=label)
+    engine = diffusion_engine(field.shape, field.dtype)
+    field, steps_run = engine.evolucionar(field, steps, alpha, tol)
+    if tol is None:
+        return export_output(field, last_pattern=label)
+    # With no step run there is no measured change: the field has not been shown to settle
+    settled = steps_run > 0 and bool(np.all(engine.cambio_maximo < tol))
+    return export_output(field, last_pattern=label, dissolution_steps=steps_run, settled=settled)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparativa de patrones en el campo N.")
+    parser.add_argument("--dim", type=int, default=DIM, help="lado del campo (celdas)")
+    parser.add_argument("--steps", type=int, default=25, help="ciclos de difusión (máximo si se usa --tol)")
+    parser.add_argument("--tol", type=float, default=None,
+                        help="cambio por ciclo bajo el que el patrón se considera disuelto")
+    parser.add_argument("--edf", default=None, help="archivo EDF/EDF+ del que sacar un patrón real")
+    args = parser.parse_args()
+
     print("\n--- Comparativa de patrones: Ansiedad vs. Calma ---\n")
 
-    result_anxiety = run_simulation(generate_anxiety_pattern, "ansiedad")
-    result_calm = run_simulation(generate_calm_pattern, "calma")
+    result_anxiety = run_simulation(generate_anxiety_pattern, "ansiedad", steps=args.steps, dim=args.dim, tol=args.tol)
+    result_calm = run_simulation(generate_calm_pattern, "calma", steps=args.steps, dim=args.dim, tol=args.tol)
 
     print("\n--- Resultado: Ansiedad ---")
     print(json.dumps(result_anxiety, indent=2))
 
     print("\n--- Resultado: Calma ---")
     print(json.dumps(result_calm, indent=2))
+
+    if args.edf:
+        edf_pattern = load_edf_pattern(args.edf)
+        result_edf = run_simulation(lambda: edf_pattern, os.path.basename(args.edf), steps=args.steps,
+                                    dim=args.dim, tol=args.tol)
+        print(f"\n--- Resultado: {os.path.basename(args.edf)} ---")
+        print(json.dumps(result_edf, indent=2))
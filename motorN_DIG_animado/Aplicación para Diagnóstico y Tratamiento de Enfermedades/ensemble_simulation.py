@@ -0,0 +1,151 @@
+import numpy as np
+import json
+import os
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from convert_edf_to_pattern import (DIM, MotorDifusion, inject_pattern, export_output,
+                                    generate_anxiety_pattern, generate_calm_pattern)
+
+# Ensemble runs of the pattern comparison: every member is one (seed, pattern, alpha)
+# combination. Members are stacked into a (batch, dim, dim) array so one vectorized
+# diffusion step advances the whole shard, and shards are spread over a process pool.
+# Each member draws from its own generator, seeded from (base_seed, seed index), so
+# results do not depend on how members are grouped into shards or workers, and the
+# patterns and alphas of one seed are compared on the same background noise.
+
+PATTERNS = {
+    "ansiedad": generate_anxiety_pattern,
+    "calma": generate_calm_pattern,
+}
+SHARD_SIZE = 64
+
+
+def ensemble_members(n_seeds, patterns, alphas):
+    """
+    Lists the ensemble members (seed index x pattern x alpha) with a stable global index.
+    """
+    members = []
+    for index, (seed, pattern, alpha) in enumerate(itertools.product(range(n_seeds), patterns, alphas)):
+        members.append({"indice": index, "semilla": seed, "patron": pattern, "alpha": float(alpha)})
+    return members
+
+
+def member_rng(base_seed, member):
+    """
+    Deterministic random generator for one member.
+    """
+    return np.random.default_rng(np.random.SeedSequence([base_seed, member["semilla"]]))
+
+
+def run_shard(members, base_seed, steps=25, dim=DIM, tol=None):
+    """
+    Simulates a shard of members as one stacked batch and returns their export_output
+    dicts, each extended with the member description.
+    With `tol`, a member that settles is frozen (its alpha is set to 0) while the
+    rest of the batch keeps evolving, so each member matches a single early-stopped run.
+    """
+    batch = len(members)
+    fields = np.empty((batch, dim, dim))
+    for field, member in zip(fields, members):
+        rng = member_rng(base_seed, member)
+        field[...] = rng.uniform(0.4, 0.6, (dim, dim))
+        inject_pattern(field, PATTERNS[member["patron"]](rng))
+
+    alphas = np.array([member["alpha"] for member in members])[:, None, None]
+    engine = MotorDifusion(fields.shape, fields.dtype)
+    clip_always = not np.all((alphas >= 0) & (alphas <= 1))
+    dissolution = np.full(batch, steps)
+    settled = np.zeros(batch, dtype=bool)
+    for step in range(1, steps + 1):
+        fields = engine.paso(fields, alphas, recortar=clip_always or step == 1, medir_cambio=tol is not None)
+        if tol is None:
+            continue
+        newly_settled = ~settled & (engine.cambio_maximo < tol)
+        dissolution[newly_settled] = step
+        settled |= newly_settled
+        alphas[newly_settled] = 0.0
+        if settled.all():
+            break
+    np.clip(fields, 0, 1, out=fields)
+
+    results = []
+    for i, member in enumerate(members):
+        if tol is None:
+            output = export_output(fields[i], last_pattern=member["patron"])
+        else:
+            output = export_output(fields[i], last_pattern=member["patron"],
+                                   dissolution_steps=int(dissolution[i]), settled=bool(settled[i]))
+        output["miembro"] = dict(member, semilla_base=base_seed)
+        results.append(output)
+    return results
+
+
+def run_ensemble(output_path, n_seeds=100, patterns=tuple(PATTERNS), alphas=(0.05,), steps=25,
+                 dim=DIM, tol=None, base_seed=0, workers=None, shard_size=SHARD_SIZE):
+    """
+    Runs the whole ensemble, streaming one JSON line per member to `output_path`
+    as each shard finishes. Returns the number of members written.
+    """
+    members = ensemble_members(n_seeds, patterns, alphas)
+    shards = [members[i:i + shard_size] for i in range(0, len(members), shard_size)]
+    workers = workers or os.cpu_count() or 1
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        def write(results):
+            for result in results:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            return len(results)
+
+        if workers == 1:
+            for shard in shards:
+                written += write(run_shard(shard, base_seed, steps, dim, tol))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_shard, shard, base_seed, steps, dim, tol) for shard in shards]
+                for future in as_completed(futures):
+                    written += write(future.result())
+    return written
+
+
+def summarize(output_path):
+    """
+    Mean and standard deviation of the main metrics per (pattern, alpha) group.
+    """
+    groups = {}
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            key = (result["miembro"]["patron"], result["miembro"]["alpha"])
+            groups.setdefault(key, []).append((result["entropia_global"], result["max_entropia"]["valor"]))
+    summary = {}
+    for (pattern, alpha), values in sorted(groups.items()):
+        values = np.array(values)
+        summary[f"{pattern} (alpha={alpha})"] = {
+            "miembros": len(values),
+            "entropia_global": {"media": float(values[:, 0].mean()), "desviacion": float(values[:, 0].std())},
+            "max_entropia": {"media": float(values[:, 1].mean()), "desviacion": float(values[:, 1].std())},
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ensamble de simulaciones: semillas x patrones x alphas.")
+    parser.add_argument("--seeds", type=int, default=100, help="número de semillas")
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS), choices=list(PATTERNS))
+    parser.add_argument("--alphas", nargs="+", type=float, default=[0.05])
+    parser.add_argument("--steps", type=int, default=25, help="ciclos de difusión (máximo si se usa --tol)")
+    parser.add_argument("--tol", type=float, default=None, help="cambio por ciclo bajo el que el patrón se considera disuelto")
+    parser.add_argument("--dim", type=int, default=DIM, help="lado del campo (celdas)")
+    parser.add_argument("--base-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="procesos (por defecto, uno por CPU)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="miembros por lote vectorizado")
+    parser.add_argument("--output", default="ensemble_resultados.jsonl")
+    args = parser.parse_args()
+
+    n = run_ensemble(args.output, args.seeds, args.patterns, args.alphas, args.steps, args.dim,
+                     args.tol, args.base_seed, args.workers, args.shard_size)
+    print(f"\n--- {n} miembros simulados, resultados en '{args.output}' ---\n")
+    print(json.dumps(summarize(args.output), indent=2, ensure_ascii=False))